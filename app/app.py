@@ -9,6 +9,7 @@ from app.main.config.jinja_config import configure_jinja
 from app.main.config.limiter_config import configure_limiter
 from app.main.config.logging_config import configure_logging
 from app.main.config.routes_config import configure_routes
+from app.main.migrations.migrate import migrate
 from app.main.models import db
 from app.main.repositories.owner_repository import get_owner_repository
 from app.main.services.asset_service import get_asset_service
@@ -28,7 +29,7 @@ def create_app(is_rate_limit_enabled=True) -> Flask:
     app.config["SQLALCHEMY_DATABASE_URI"] = app_config.postgres.sql_alchemy_database_url
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        migrate(db.engine)
 
     configure_routes(app)
     configure_error_handlers(app)
@@ -68,3 +69,5 @@ def create_stub_data(app):
 
         cla_public = asset_service.add_asset("cla_public", asset_type)
         asset_service.create_relationship(cla_public, laa, admin_access)
+
+        asset_service.refresh_authoritative_ownership()
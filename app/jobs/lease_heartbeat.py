@@ -0,0 +1,36 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseHeartbeat:
+    """
+    Calls renew every interval_seconds on a background thread while a claimed batch is worked
+    on, so a batch held through a long wait, such as a sleep until the GitHub rate limit
+    resets, keeps its lease rather than being claimed by another worker.
+    """
+
+    def __init__(self, renew: Callable[[], None], interval_seconds: float):
+        self.renew = renew
+        self.interval_seconds = interval_seconds
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__stopped.set()
+        self.__thread.join()
+
+    def __run(self):
+        while not self.__stopped.wait(self.interval_seconds):
+            try:
+                self.renew()
+            except Exception:
+                logger.exception("Failed to renew lease")
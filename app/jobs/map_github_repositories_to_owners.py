@@ -1,161 +1,847 @@
-from app.main.repositories.asset_repository import AssetRepository
+import argparse
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator
+from flask import current_app
+from app.main.models import Owner
+from app.main.repositories.asset_repository import AssetRepository, RelationshipPlan
+from app.main.repositories.checkpoint_repository import CheckpointRepository
+from app.main.repositories.data_generation_repository import (
+    OWNERSHIP_GENERATION_NAME,
+    DataGenerationRepository,
+)
 from app.main.repositories.owner_repository import OwnerRepository
+from app.main.repositories.sync_state_repository import SyncStateRepository
+from app.main.repositories.team_repository import TeamRepository
+from app.main.repositories.work_queue_repository import (
+    CLAIMED,
+    DONE,
+    FAILED,
+    PENDING,
+    WorkQueueRepository,
+)
 import logging
 from app.main.config.app_config import app_config
 from app.main.config.logging_config import configure_logging
-from app.main.services.github_service import GithubService
+from app.main.services.github_service import (
+    GithubService,
+    get_asset_name,
+    get_organisation_name_of_asset,
+)
+from app.main.services.github_graphql_service import GithubGraphqlService
+from app.main.services.github_response_cache import GithubResponseCache
+from app.main.services.github_snapshot import read_snapshot, write_snapshot
+from app.main.services.github_token_pool import (
+    GithubAppInstallationCredential,
+    GithubCredential,
+    GithubTokenCredential,
+    find_app_installation_id,
+)
 from app.main.services.asset_service import AssetService
+from app.main.services.job_metrics import JobMetrics
+from app.jobs.owner_rules import (
+    DEFAULT_OWNER_RULES_PATH,
+    OwnerMatcher,
+    load_owner_rules,
+)
+from app.jobs.lease_heartbeat import LeaseHeartbeat
+from app.jobs.repository_pipeline import RepositoryPipeline, iter_concurrently
+from app.main.services.github_webhook_service import REMOVE
 from app.app import create_app
 
 logger = logging.getLogger(__name__)
 
+SYNC_CURSOR_NAME = "map_github_repositories_to_owners"
 
-def contains_one_or_more(values: list[str], lists_to_check: list[list[str]]) -> bool:
-    found = False
 
-    for value in values:
-        for list_to_check in lists_to_check:
-            if value in list_to_check:
-                found = True
+def classify_repository(
+    repository: dict, owner_matcher: OwnerMatcher
+) -> dict[str, str]:
+    matches = owner_matcher.match_repository(repository)
+    for owner_name, (relationship_type, rule) in matches.items():
+        logger.info(
+            f"Repository [ {repository['name']} ] matched Owner [ {owner_name} ] with [ {relationship_type} ] by rule [ {rule} ]"
+        )
+    return {
+        owner_name: relationship_type
+        for owner_name, (relationship_type, _) in matches.items()
+    }
 
-    return found
 
+def get_owners(owners: list[dict] | None) -> list[dict]:
+    if owners is not None:
+        return owners
+    return load_owner_rules(app_config.owner_rules.path or DEFAULT_OWNER_RULES_PATH)
 
-def main(
-    owners=[
-        {
-            "name": "HMPPS",
-            "teams": ["HMPPS Developers"],
-            "prefix": "hmpps-",
-        },
-        {
-            "name": "LAA",
-            "teams": [
-                "LAA Admins",
-                "LAA Technical Architects",
-                "LAA Developers",
-                "LAA Crime Apps team",
-                "LAA Crime Apply",
-                "laa-eligibility-platform",
-                "LAA Get Access",
-                "LAA Payments and Billing",
-            ],
-            "prefix": "laa-",
-        },
-        {
-            "name": "OPG",
-            "teams": ["OPG"],
-            "prefix": "opg-",
-        },
-        {
-            "name": "CICA",
-            "teams": ["CICA"],
-            "prefix": "cica-",
-        },
-        {
-            "name": "Central Digital",
-            "teams": [
-                "Central Digital Product Team",
-                "tactical-products",
-                # Data Platforms
-                "analytical-platform",
-                "data-engineering",
-                "analytics-hq",
-                "data-catalogue",
-                "data-platform",
-                "data-and-analytics-engineering",
-                "observability-platform",
-                # Publishing Platforms
-                "Form Builder",
-                "Hale platform",
-                "JOTW Content Devs",
-            ],
-            "prefix": "bichard7",
-        },
-        {
-            "name": "CTO Office",
-            "teams": [
-                # Hosting Platforms
-                "modernisation-platform",
-                "operations-engineering",
-                "aws-root-account-admin-team",
-                "WebOps",  # Cloud Platform
-                "Studio Webops",  # Digital Studio Operations (DSO)
-            ],
-        },
-        {
-            "name": "Tech Services",
-            "teams": ["nvvs-devops-admins", "moj-official-techops"],
-        },
-        {
-            "name": "Operations Engineering",
-            "teams": ["operations-engineering"],
-            "prefix": "operations-engineering-",
-        },
+
+def get_organisation_values(
+    values_by_organisation: dict[str | None, list[str]], organisation_name: str
+) -> list[str]:
+    values = list(values_by_organisation.get(organisation_name, []))
+    if organisation_name == app_config.github.organisations[0]:
+        values += values_by_organisation.get(None, [])
+    return values
+
+
+def get_app_installation_id(organisation_name: str) -> int | None:
+    installation_ids = get_organisation_values(
+        app_config.github.app_installation_ids, organisation_name
+    )
+    # An app is installed once on an organisation, and every token minted for that
+    # installation shares the same rate limit
+    if len(installation_ids) > 1:
+        raise ValueError(
+            f"Only one app installation can be configured for organisation [ {organisation_name} ], found [ {len(installation_ids)} ]"
+        )
+    if installation_ids:
+        return int(installation_ids[0])
+    installation_id = find_app_installation_id(
+        app_config.github.app_id,
+        app_config.github.app_private_key,
+        organisation_name,
+        app_config.github.api_url,
+    )
+    if installation_id is None:
+        logger.warning(
+            f"GitHub App is not installed on organisation [ {organisation_name} ]"
+        )
+    return installation_id
+
+
+def get_additional_github_credentials(
+    organisation_name: str,
+) -> list[GithubCredential]:
+    """
+    Returns the credentials configured for the organisation. Installation tokens and
+    fine-grained tokens only have access to their own organisation, so each organisation's
+    service is only given its own.
+    """
+    credentials = [
+        GithubTokenCredential(token, name=f"additional-token-{index}")
+        for index, token in enumerate(
+            get_organisation_values(
+                app_config.github.additional_tokens, organisation_name
+            )
+        )
+    ]
+    if app_config.github.app_id and app_config.github.app_private_key:
+        installation_id = get_app_installation_id(organisation_name)
+        if installation_id is not None:
+            credentials.append(
+                GithubAppInstallationCredential(
+                    app_config.github.app_id,
+                    app_config.github.app_private_key,
+                    installation_id,
+                    app_config.github.api_url,
+                )
+            )
+    return credentials
+
+
+def create_github_service(
+    metrics: JobMetrics | None = None, organisation_name: str | None = None
+) -> GithubService:
+    response_cache = (
+        GithubResponseCache(
+            app_config.github.cache_directory,
+            app_config.github.cache_max_size_mb * 1024 * 1024,
+        )
+        if app_config.github.cache_directory
+        else None
+    )
+    organisation_name = organisation_name or app_config.github.organisations[0]
+    # The admin token is an organisation owner's token for every organisation crawled. Its
+    # rate limit is shared between them, and each token pool reads what is left of it from
+    # every response
+    return GithubService(
+        app_config.github.token,
+        app_config.github.max_workers,
+        app_config.github.rate_limit_reserve,
+        response_cache,
+        get_additional_github_credentials(organisation_name),
+        metrics,
+        app_config.github.api_url,
+        use_async_client=app_config.github.client == "async",
+        organisation_name=organisation_name,
+        primary_organisation_name=app_config.github.organisations[0],
+        repository_visibilities=app_config.github.repository_visibilities,
+    )
+
+
+def create_github_services(metrics: JobMetrics | None = None) -> list[GithubService]:
+    # A service per organisation, so each is crawled with its own workers and token pool
+    # and one organisation exhausting its rate limit does not hold back the others
+    return [
+        create_github_service(metrics, organisation_name)
+        for organisation_name in app_config.github.organisations
+    ]
+
+
+def create_github_services_by_organisation(
+    metrics: JobMetrics | None = None,
+) -> dict[str, GithubService]:
+    return dict(zip(app_config.github.organisations, create_github_services(metrics)))
+
+
+def group_asset_names_by_organisation(asset_names: list[str]) -> dict[str, list[str]]:
+    asset_names_by_organisation = {}
+    for asset_name in asset_names:
+        organisation_name = get_organisation_name_of_asset(
+            asset_name, app_config.github.organisations[0]
+        )
+        asset_names_by_organisation.setdefault(organisation_name, []).append(asset_name)
+    return asset_names_by_organisation
+
+
+def write_run_report(metrics: JobMetrics):
+    report = metrics.write(
+        app_config.run_report.path, app_config.run_report.prometheus_textfile_path
+    )
+    logger.info(
+        f"Run took [ {report['duration_seconds']:.1f} ] seconds for [ {report['repositories']} ] repositories, phases [ {', '.join(f'{phase}: {seconds:.1f}s' for phase, seconds in report['phase_seconds'].items())} ]"
+    )
+    logger.info(
+        f"GitHub API calls [ {sum(call['calls'] for call in report['api_calls'])} ] rate limit sleep [ {report['rate_limit_sleep_seconds']:.1f} ] seconds team parent cache hit rate [ {report['team_parent_cache']['hit_rate']:.0%} ]"
+    )
+    for repository in report["slowest_repositories"]:
+        logger.info(
+            f"Slow repository [ {repository['name']} ] took [ {repository['seconds']:.2f} ] seconds"
+        )
+
+
+def save_teams(
+    team_repository: TeamRepository,
+    github_services: list[GithubService | GithubGraphqlService],
+):
+    primary_organisation_name = app_config.github.organisations[0]
+    team_parents = {}
+    for github_service in github_services:
+        organisation_name = github_service.organisation_name
+        # Team names are qualified with their organisation as asset names are
+        for team_name, parent_name in github_service.get_team_parents().items():
+            team_parents[
+                get_asset_name(organisation_name, team_name, primary_organisation_name)
+            ] = parent_name and get_asset_name(
+                organisation_name, parent_name, primary_organisation_name
+            )
+    if team_parents:
+        team_repository.save_teams(team_parents)
+    logger.info(f"Saved [ {len(team_parents)} ] teams")
+
+
+def plan_relationships(
+    asset_service: AssetService,
+    owners: list[Owner],
+    relationships_by_asset_name: dict[str, dict[str, str]],
+    metrics: JobMetrics,
+) -> RelationshipPlan:
+    # The current relationships are read right before each batch is written, as other
+    # workers, webhook updates and earlier batches may have written the same repositories
+    with metrics.phase("load_relationships"):
+        current_relationships, current_asset_names = (
+            asset_service.find_relationships_with_owners(
+                owners, list(relationships_by_asset_name)
+            )
+        )
+    return RelationshipPlan.from_relationships(
+        current_relationships, current_asset_names, relationships_by_asset_name
+    )
+
+
+def plan_removed_repositories(
+    asset_service: AssetService,
+    owners: list[Owner],
+    mapped_repository_names: set[str],
+) -> RelationshipPlan:
+    # Batches only plan the repositories crawled, so repositories that have been deleted,
+    # archived or are no longer visible are only found once a full run has mapped the rest
+    removed_repository_names = (
+        asset_service.find_repository_names() - mapped_repository_names
+    )
+    if not removed_repository_names:
+        return RelationshipPlan()
+    current_relationships, _ = asset_service.find_relationships_with_owners(
+        owners, sorted(removed_repository_names)
+    )
+    return RelationshipPlan.for_removed_assets(
+        current_relationships, removed_repository_names
+    )
+
+
+def clean_up_after_full_run(
+    asset_service: AssetService,
+    team_repository: TeamRepository,
+    github_services: list[GithubService | GithubGraphqlService],
+    owners: list[Owner],
+    mapped_repository_names: set[str],
+):
+    """
+    Removes what belonged to repositories a full run did not map, as they have been deleted,
+    archived or are no longer visible, then publishes the run to web processes.
+    """
+    removal_plan = plan_removed_repositories(
+        asset_service, owners, mapped_repository_names
+    )
+    if not removal_plan.is_empty():
+        counts = asset_service.apply_relationship_plan(removal_plan, owners)
+        logger.info(
+            f"Removed [ {len(removal_plan.assets_to_delete)} ] repositories no longer mapped, relationships deleted [ {counts['deleted']} ]"
+        )
+    # Team parents are only known for teams resolved by this run, so teams are merged in and
+    # only removed once no remaining grant refers to them or a team below them
+    team_repository.delete_repository_grants_except(mapped_repository_names)
+    if github_services:
+        save_teams(team_repository, github_services)
+    team_repository.delete_teams_without_grants()
+    # Plans refresh the assets they change, a full refresh also covers relationships
+    # written before the table existed
+    asset_service.refresh_authoritative_ownership()
+    # Web processes rebuild their ownership index once they see the new generation
+    DataGenerationRepository().bump(OWNERSHIP_GENERATION_NAME)
+
+
+def get_previous_sync_state(
+    sync_state_repository: SyncStateRepository, run_started_at: datetime
+) -> tuple[dict[str, dict], datetime | None]:
+    cursor = sync_state_repository.find_cursor(SYNC_CURSOR_NAME)
+    full_resync_interval = timedelta(
+        hours=app_config.incremental_sync.full_resync_interval_hours
+    )
+
+    if (
+        cursor is None
+        or cursor.last_full_sync_at is None
+        or run_started_at - cursor.last_full_sync_at >= full_resync_interval
+    ):
+        logger.info("Full resync due, refreshing every repository")
+        return {}, None
+
+    logger.info(
+        f"Incremental sync of changes since [ {cursor.last_successful_run_at.isoformat()} ]"
+    )
+    return (
+        sync_state_repository.find_all_repository_states(),
+        cursor.last_successful_run_at,
+    )
+
+
+def get_owners_by_name(owners: list[dict], owner_repository: OwnerRepository) -> dict:
+    return {
+        owner["name"]: owner_repository.find_by_name(owner["name"])[0]
+        for owner in owners
+    }
+
+
+def get_checkpointed_repository_names(
+    checkpoint_repository: CheckpointRepository, run_started_at: datetime
+) -> set[str]:
+    status = checkpoint_repository.get_status()
+    if status["repositories"] == 0:
+        return set()
+
+    max_age = timedelta(hours=app_config.checkpoint.max_age_hours)
+    if run_started_at - status["oldest_checkpoint_at"] > max_age:
+        logger.info("Checkpoint is older than the maximum age, discarding it")
+        checkpoint_repository.reset()
+        return set()
+
+    logger.info(
+        f"Resuming from checkpoint of [ {status['repositories']} ] repositories"
+    )
+    return checkpoint_repository.find_all_names()
+
+
+def iter_unmapped_repositories(
+    get_all_repositories: Callable[[], list[dict]], mapped_repository_names: set[str]
+) -> Iterator[dict]:
+    # The GraphQL and team-centric crawls only return once every repository is fetched, so
+    # call them from the pipeline's fetch thread and skip repositories already checkpointed
+    for repository in get_all_repositories():
+        if repository["name"] not in mapped_repository_names:
+            yield repository
+
+
+def print_checkpoint_status():
+    status = CheckpointRepository().get_status()
+    print(json.dumps(status, default=str, indent=2))
+
+
+def reset_checkpoint():
+    CheckpointRepository().reset()
+    logger.info("Checkpoint reset")
+
+
+def enqueue_repositories():
+    configure_logging(app_config.logging_level)
+    repository_names = [
+        repository_name
+        for github_service in create_github_services()
+        for repository_name in github_service.get_all_repository_names()
+    ]
+    WorkQueueRepository().enqueue(repository_names)
+    logger.info(f"Enqueued [ {len(repository_names)} ] repositories")
+
+
+def create_lease_heartbeat(
+    worker_id: str, repository_names: list[str], lease_duration: timedelta
+) -> LeaseHeartbeat:
+    app = current_app._get_current_object()
+
+    def renew_leases():
+        # The heartbeat runs on its own thread, so it uses its own database session
+        with app.app_context():
+            held = WorkQueueRepository().renew_leases(
+                worker_id, repository_names, lease_duration, datetime.now(timezone.utc)
+            )
+        if held < len(repository_names):
+            logger.warning(
+                f"Worker [ {worker_id} ] lost the lease of [ {len(repository_names) - held} ] repositories to another worker"
+            )
+
+    return LeaseHeartbeat(renew_leases, lease_duration.total_seconds() / 3)
+
+
+def work_on_repositories(
+    worker_id: str,
+    owners: list[dict] | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+):
+    configure_logging(app_config.logging_level)
+    logger.info(f"Worker [ {worker_id} ] running...")
+
+    metrics = JobMetrics(app_config.run_report.slowest_repositories)
+    asset_service = AssetService(AssetRepository())
+    work_queue_repository = WorkQueueRepository()
+    team_repository = TeamRepository()
+    owners = get_owners(owners)
+    owner_matcher = OwnerMatcher(owners)
+    owners_by_name = get_owners_by_name(owners, OwnerRepository())
+    github_services = create_github_services_by_organisation(metrics)
+    lease_duration = timedelta(seconds=app_config.work_queue.lease_seconds)
+
+    while True:
+        repository_names = work_queue_repository.claim_batch(
+            worker_id,
+            app_config.work_queue.batch_size,
+            lease_duration,
+            datetime.now(timezone.utc),
+            app_config.work_queue.max_attempts,
+        )
+        if not repository_names:
+            status = work_queue_repository.get_status()
+            if status[CLAIMED] == 0:
+                break
+            # Leases held by crashed workers become claimable once they expire
+            logger.info(
+                f"Waiting for [ {status[CLAIMED]} ] repositories claimed by other workers"
+            )
+            sleep(app_config.work_queue.poll_seconds)
+            continue
+
+        with create_lease_heartbeat(worker_id, repository_names, lease_duration):
+            repositories = [
+                repository
+                for organisation_name, asset_names in group_asset_names_by_organisation(
+                    repository_names
+                ).items()
+                for repository in github_services[
+                    organisation_name
+                ].get_repositories_by_name(asset_names)
+            ]
+        plan = plan_relationships(
+            asset_service,
+            list(owners_by_name.values()),
+            {
+                repository["name"]: classify_repository(repository, owner_matcher)
+                for repository in repositories
+            },
+            metrics,
+        )
+        # Repositories deleted since they were enqueued are removed rather than mapped
+        removed_repository_names = sorted(
+            set(repository_names) - {repository["name"] for repository in repositories}
+        )
+        with metrics.phase("db_sync"):
+            counts = asset_service.apply_relationship_plan(
+                plan, list(owners_by_name.values())
+            )
+            team_repository.save_repository_grants(repositories)
+            if removed_repository_names:
+                asset_service.delete_assets_by_name(removed_repository_names)
+                team_repository.delete_repository_grants(removed_repository_names)
+        completed = work_queue_repository.complete(worker_id, repository_names)
+        if completed < len(repository_names):
+            logger.warning(
+                f"Worker [ {worker_id} ] lost the lease of [ {len(repository_names) - completed} ] repositories to another worker"
+            )
+        logger.info(
+            f"Worker [ {worker_id} ] mapped [ {len(repositories)} ] repositories, removed [ {len(removed_repository_names)} ], relationships inserted [ {counts['inserted']} ] updated [ {counts['updated']} ] deleted [ {counts['deleted']} ] unchanged [ {counts['unchanged']} ]"
+        )
+
+    # Stale grants and teams are removed, and the run published, once by the finalize step
+    save_teams(team_repository, list(github_services.values()))
+    write_run_report(metrics)
+    logger.info(f"Worker [ {worker_id} ] complete!")
+
+
+def update_repositories(
+    updates: dict[str, str],
+    owners: list[dict] | None = None,
+    github_services: dict[str, GithubService] | None = None,
+):
+    """
+    Maps only the repositories given, by asset name, between full runs. Repositories to
+    refresh are fetched from GitHub and classified as a run would, and repositories to remove,
+    or that no longer exist, are deleted along with their relationships and team grants.
+
+    A caller applying batches of updates passes the GitHub services of each organisation, so
+    they are created once rather than for every batch.
+    """
+    metrics = JobMetrics(app_config.run_report.slowest_repositories)
+    asset_service = AssetService(AssetRepository())
+    team_repository = TeamRepository()
+    owners = get_owners(owners)
+    owner_matcher = OwnerMatcher(owners)
+    owners_by_name = get_owners_by_name(owners, OwnerRepository())
+    if github_services is None:
+        github_services = create_github_services_by_organisation(metrics)
+    for github_service in github_services.values():
+        # Team parents may have changed since the previous batch, so they are read again
+        github_service.team_parent_cache.clear()
+
+    asset_names_to_refresh_by_organisation = {
+        organisation_name: asset_names
+        for organisation_name, asset_names in group_asset_names_by_organisation(
+            [asset_name for asset_name, update in updates.items() if update != REMOVE]
+        ).items()
+        if organisation_name in github_services
+    }
+    repositories = [
+        repository
+        for organisation_name, asset_names in asset_names_to_refresh_by_organisation.items()
+        for repository in github_services[organisation_name].get_repositories_by_name(
+            asset_names
+        )
+    ]
+    # A repository deleted since its event was sent is removed, rather than failing the
+    # updates of the other repositories in the batch
+    asset_names_not_found = {
+        asset_name
+        for asset_names in asset_names_to_refresh_by_organisation.values()
+        for asset_name in asset_names
+    } - {repository["name"] for repository in repositories}
+    asset_names_to_remove = sorted(
+        {asset_name for asset_name, update in updates.items() if update == REMOVE}
+        | asset_names_not_found
+    )
+    plan = plan_relationships(
+        asset_service,
+        list(owners_by_name.values()),
         {
-            "name": "Modernisation Platform",
-            "teams": ["modernisation-platform"],
-            "prefix": "modernisation-platform-",
+            repository["name"]: classify_repository(repository, owner_matcher)
+            for repository in repositories
         },
-    ],
+        metrics,
+    )
+    counts = asset_service.apply_relationship_plan(plan, list(owners_by_name.values()))
+    team_repository.save_repository_grants(repositories)
+    removed = 0
+    if asset_names_to_remove:
+        removed = asset_service.delete_assets_by_name(asset_names_to_remove)
+        team_repository.delete_repository_grants(asset_names_to_remove)
+    save_teams(team_repository, list(github_services.values()))
+    DataGenerationRepository().bump(OWNERSHIP_GENERATION_NAME)
+    logger.info(
+        f"Updated [ {len(updates)} ] repositories, removed [ {removed} ], relationships inserted [ {counts['inserted']} ] updated [ {counts['updated']} ] deleted [ {counts['deleted']} ] unchanged [ {counts['unchanged']} ]"
+    )
+
+
+def finalize_repositories(
+    owners: list[dict] | None = None, sleep: Callable[[float], None] = time.sleep
+):
+    configure_logging(app_config.logging_level)
+    work_queue_repository = WorkQueueRepository()
+
+    while True:
+        # Items out of attempts are failed here too, in case no worker is left to claim them
+        work_queue_repository.fail_items_out_of_attempts(
+            app_config.work_queue.max_attempts, datetime.now(timezone.utc)
+        )
+        status = work_queue_repository.get_status()
+        if status[PENDING] == 0 and status[CLAIMED] == 0:
+            break
+        logger.info(
+            f"Waiting for workers, repositories pending [ {status[PENDING]} ] claimed [ {status[CLAIMED]} ] done [ {status[DONE]} ]"
+        )
+        sleep(app_config.work_queue.poll_seconds)
+
+    if status[DONE] == 0:
+        logger.info("Work queue is empty, nothing to finalize")
+        return
+
+    failed_repository_names = work_queue_repository.find_names(FAILED)
+    if failed_repository_names:
+        logger.warning(
+            f"Failed to map [ {len(failed_repository_names)} ] repositories after [ {app_config.work_queue.max_attempts} ] attempts, keeping what was mapped before: [ {', '.join(sorted(failed_repository_names))} ]"
+        )
+    # Workers have saved the teams they resolved, so only stale grants and teams are left
+    clean_up_after_full_run(
+        AssetService(AssetRepository()),
+        TeamRepository(),
+        [],
+        list(get_owners_by_name(get_owners(owners), OwnerRepository()).values()),
+        work_queue_repository.find_names(DONE) | failed_repository_names,
+    )
+    work_queue_repository.reset()
+    logger.info(f"Finalized work queue of [ {status[DONE]} ] repositories")
+
+
+def main(
+    owners: list[dict] | None = None,
+    plan_only: bool = False,
+    snapshot_input: str | None = None,
+    snapshot_output: str | None = None,
 ):
     configure_logging(app_config.logging_level)
     logger.info("Running...")
+    if snapshot_input and snapshot_output:
+        raise ValueError("A snapshot cannot be written while mapping from a snapshot")
 
+    run_started_at = datetime.now(timezone.utc)
+    metrics = JobMetrics(app_config.run_report.slowest_repositories)
     asset_service = AssetService(AssetRepository())
     owner_repository = OwnerRepository()
-    github_service = GithubService(app_config.github.token)
+    checkpoint_repository = CheckpointRepository()
+    team_repository = TeamRepository()
+    is_incremental_sync = (
+        app_config.incremental_sync.enabled
+        and app_config.github.fetch_strategy == "rest"
+        and snapshot_input is None
+    )
+    if app_config.incremental_sync.enabled and not is_incremental_sync:
+        logger.warning(
+            f"Incremental sync is not supported when mapping from a snapshot or by the [ {app_config.github.fetch_strategy} ] fetch strategy, running a full sync"
+        )
 
-    repositories = github_service.get_all_repositories()
+    owners = get_owners(owners)
+    owner_matcher = OwnerMatcher(owners)
+    owners_by_name = get_owners_by_name(owners, owner_repository)
 
-    for owner in owners:
-        logger.info(f"Mapping Repositories for Owner [ {owner} ]")
-        name = owner["name"]
-        teams = owner["teams"]
-        prefix = owner.get("prefix")
+    # A plan writes nothing, including checkpoints, and a snapshot has to contain every
+    # repository, so neither resumes from a checkpoint
+    mapped_repository_names = (
+        set()
+        if plan_only or snapshot_input or snapshot_output
+        else get_checkpointed_repository_names(checkpoint_repository, run_started_at)
+    )
+    # Only a plan keeps every change to print it, a run only counts them so memory stays flat
+    plan = RelationshipPlan()
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    sync_state_repository = SyncStateRepository() if is_incremental_sync else None
 
-        for repository in repositories:
-            logger.info(f"Mapping Repository [ {repository} ]")
-            github_teams_with_admin_access = repository[
-                "github_teams_with_admin_access"
-            ]
-            github_teams_with_admin_access_parents = repository[
-                "github_teams_with_admin_access_parents"
-            ]
-            github_teams_with_any_access = repository["github_teams_with_any_access"]
-            github_teams_with_any_access_parents = repository[
-                "github_teams_with_any_access_parents"
-            ]
-            repository_name = repository["name"]
-            teams_with_admin_access = [
-                github_teams_with_admin_access,
-                github_teams_with_admin_access_parents,
-            ]
-            teams_with_any_access = [
-                github_teams_with_any_access,
-                github_teams_with_any_access_parents,
-            ]
-            repository_name_starts_with_prefix = (
-                repository_name.startswith(prefix) if prefix is not None else False
-            )
+    def classify(repository: dict) -> tuple[dict, dict[str, str]]:
+        logger.info(f"Mapping Repository [ {repository['name']} ]")
+        return repository, classify_repository(repository, owner_matcher)
 
-            owner = owner_repository.find_by_name(name)[0]
-            asset = asset_service.add_if_name_does_not_exist(repository_name)
+    def write_batch(classified_repositories: list[tuple[dict, dict[str, str]]]):
+        repositories = [repository for repository, _ in classified_repositories]
+        batch_plan = plan_relationships(
+            asset_service,
+            list(owners_by_name.values()),
+            {
+                repository["name"]: relationships
+                for repository, relationships in classified_repositories
+            },
+            metrics,
+        )
+        mapped_repository_names.update(
+            repository["name"] for repository in repositories
+        )
+        if plan_only:
+            plan.extend(batch_plan)
+            return
 
-            if contains_one_or_more(teams, teams_with_admin_access):
-                asset_service.update_relationships_with_owner(
-                    asset, owner, "ADMIN_ACCESS"
+        asset_service.apply_relationship_plan(batch_plan, list(owners_by_name.values()))
+        for key, count in batch_plan.get_counts().items():
+            counts[key] += count
+        team_repository.save_repository_grants(repositories)
+        if is_incremental_sync:
+            sync_state_repository.save_repository_states(repositories, run_started_at)
+        checkpoint_repository.save(repositories, datetime.now(timezone.utc))
+
+    since = None
+    github_services = []
+    repository_names_to_skip = set(mapped_repository_names)
+    if snapshot_input:
+        repositories = read_snapshot(snapshot_input)
+    elif app_config.github.fetch_strategy == "graphql":
+        if len(
+            app_config.github.organisations
+        ) > 1 or app_config.github.repository_visibilities != ["public"]:
+            logger.warning(
+                f"The graphql fetch strategy only maps public repositories of [ {app_config.github.organisations[0]} ]"
+            )
+        github_services = [
+            GithubGraphqlService(
+                app_config.github.token,
+                app_config.github.graphql_url,
+                metrics,
+                app_config.github.organisations[0],
+            )
+        ]
+        repositories = iter_unmapped_repositories(
+            github_services[0].get_all_repositories, repository_names_to_skip
+        )
+    elif app_config.github.fetch_strategy == "teams":
+        github_services = create_github_services(metrics)
+        repositories = iter_concurrently(
+            [
+                iter_unmapped_repositories(
+                    github_service.get_all_repositories_by_team,
+                    repository_names_to_skip,
+                )
+                for github_service in github_services
+            ],
+            app_config.pipeline.queue_size,
+        )
+    else:
+        github_services = create_github_services(metrics)
+        previous_repositories = None
+        if is_incremental_sync:
+            previous_repositories, since = get_previous_sync_state(
+                sync_state_repository, run_started_at
+            )
+        repositories = iter_concurrently(
+            [
+                github_service.iter_all_repositories(
+                    previous_repositories=previous_repositories,
+                    since=since,
+                    repository_names_to_skip=repository_names_to_skip,
                 )
-            elif (
-                contains_one_or_more(teams, teams_with_any_access)
-                or repository_name_starts_with_prefix
-            ):
-                asset_service.update_relationships_with_owner(asset, owner, "OTHER")
+                for github_service in github_services
+            ],
+            app_config.pipeline.queue_size,
+        )
+
+    if snapshot_output:
+        repositories = write_snapshot(
+            snapshot_output,
+            repositories,
+            ",".join(
+                github_service.organisation_name for github_service in github_services
+            ),
+        )
 
+    pipeline = RepositoryPipeline(
+        queue_size=app_config.pipeline.queue_size,
+        batch_size=app_config.checkpoint.chunk_size,
+    )
+    pipeline.run(repositories, classify, write_batch)
+    metrics.add_phase_seconds("classify", pipeline.classify_stage.seconds)
+    metrics.add_phase_seconds("db_sync", pipeline.write_stage.seconds)
+    # The graphql and teams strategies fetch in bulk rather than repository by repository
+    metrics.repositories = pipeline.write_stage.items
+
+    if is_incremental_sync:
+        logger.info(
+            f"Repositories refreshed [ {sum(github_service.repositories_refreshed for github_service in github_services)} ] skipped [ {sum(github_service.repositories_skipped for github_service in github_services)} ]"
+        )
+    if plan_only:
+        plan.extend(
+            plan_removed_repositories(
+                asset_service, list(owners_by_name.values()), mapped_repository_names
+            )
+        )
+        write_run_report(metrics)
+        print(plan.format())
+        return
+
+    logger.info(
+        f"Relationships inserted [ {counts['inserted']} ] updated [ {counts['updated']} ] deleted [ {counts['deleted']} ] unchanged [ {counts['unchanged']} ]"
+    )
+
+    if is_incremental_sync:
+        sync_state_repository.delete_repository_states_except(mapped_repository_names)
+        sync_state_repository.save_cursor(
+            SYNC_CURSOR_NAME, run_started_at, full_sync=since is None
+        )
+
+    clean_up_after_full_run(
+        asset_service,
+        team_repository,
+        github_services,
+        list(owners_by_name.values()),
+        mapped_repository_names,
+    )
+    checkpoint_repository.reset()
+    write_run_report(metrics)
     logger.info("Complete!")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Map GitHub repositories to their owners"
+    )
+    parser.add_argument(
+        "--checkpoint-status",
+        action="store_true",
+        help="print the repositories checkpointed by an unfinished run and exit",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="print the relationship changes a run would make without writing them",
+    )
+    parser.add_argument(
+        "--from-snapshot",
+        metavar="PATH",
+        help="map repositories from a snapshot file instead of crawling GitHub",
+    )
+    parser.add_argument(
+        "--write-snapshot",
+        metavar="PATH",
+        help="write the crawled repositories to a snapshot file",
+    )
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="enqueue every repository for workers to crawl and exit",
+    )
+    parser.add_argument(
+        "--work",
+        action="store_true",
+        help="claim and crawl batches of enqueued repositories until the queue is empty",
+    )
+    parser.add_argument(
+        "--finalize",
+        action="store_true",
+        help="wait for workers to finish every enqueued repository, remove what belonged to repositories not mapped, then clear the queue",
+    )
+    parser.add_argument(
+        "--reset-checkpoint",
+        action="store_true",
+        help="discard the checkpoint of an unfinished run and exit",
+    )
+    args = parser.parse_args()
+
     app = create_app()
     with app.app_context():
-        main()
+        if args.checkpoint_status:
+            print_checkpoint_status()
+        elif args.reset_checkpoint:
+            reset_checkpoint()
+        elif args.enqueue:
+            enqueue_repositories()
+        elif args.work:
+            work_on_repositories(f"{socket.gethostname()}-{os.getpid()}")
+        elif args.finalize:
+            finalize_repositories()
+        else:
+            main(
+                plan_only=args.plan,
+                snapshot_input=args.from_snapshot,
+                snapshot_output=args.write_snapshot,
+            )
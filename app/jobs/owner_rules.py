@@ -0,0 +1,216 @@
+import fnmatch
+import json
+import os
+import re
+from typing import Any
+
+OWNER_RULES_VERSION = 1
+
+DEFAULT_OWNER_RULES_PATH = os.path.join(os.path.dirname(__file__), "owner_rules.json")
+
+OWNER_RULE_KEYS = ["teams", "team_globs", "prefixes", "suffixes", "regexes"]
+
+
+def load_owner_rules(path: str = DEFAULT_OWNER_RULES_PATH) -> list[dict]:
+    with open(path, encoding="utf-8") as file:
+        rules = json.load(file)
+
+    if not isinstance(rules, dict) or rules.get("version") != OWNER_RULES_VERSION:
+        raise ValueError(
+            f"Owner rules [ {path} ] must be an object with version [ {OWNER_RULES_VERSION} ]"
+        )
+    validate_owners(rules.get("owners"))
+    return rules["owners"]
+
+
+def validate_owners(owners: Any):
+    if not isinstance(owners, list) or not owners:
+        raise ValueError("Owner rules must define a non-empty list of owners")
+
+    owner_names = set()
+    for index, owner in enumerate(owners):
+        if not isinstance(owner, dict) or not isinstance(owner.get("name"), str):
+            raise ValueError(f"Owner [ {index} ] must be an object with a name")
+        if owner["name"] in owner_names:
+            raise ValueError(f"Owner [ {owner['name']} ] is defined more than once")
+        owner_names.add(owner["name"])
+
+        unknown_keys = set(owner) - {"name", "description", *OWNER_RULE_KEYS}
+        if unknown_keys:
+            raise ValueError(
+                f"Owner [ {owner['name']} ] has unknown keys [ {', '.join(sorted(unknown_keys))} ]"
+            )
+        for key in OWNER_RULE_KEYS:
+            values = owner.get(key, [])
+            if not isinstance(values, list) or not all(
+                isinstance(value, str) and value for value in values
+            ):
+                raise ValueError(
+                    f"Owner [ {owner['name']} ] {key} must be a list of non-empty strings"
+                )
+        for pattern in owner.get("regexes", []):
+            try:
+                re.compile(pattern)
+            except re.error as error:
+                raise ValueError(
+                    f"Owner [ {owner['name']} ] has an invalid regex [ {pattern} ]: {error}"
+                )
+
+
+class PrefixTrie:
+    def __init__(self):
+        self.root: dict = {}
+
+    def add(self, key: str, value: Any):
+        node = self.root
+        for character in key:
+            node = node.setdefault(character, {})
+        # The empty string never collides with a single character key
+        node.setdefault("", []).append(value)
+
+    def find_values_for_prefixes_of(self, text: str) -> list:
+        values = []
+        node = self.root
+        for character in text:
+            node = node.get(character)
+            if node is None:
+                break
+            values.extend(node.get("", []))
+        return values
+
+
+# Backreferences and conditionals refer to groups by number or name, which would point at other
+# patterns once several are combined into one
+REGEX_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+def can_combine_regex(pattern: str) -> bool:
+    try:
+        compiled = re.compile(f"(?:{pattern})")
+    except re.error:
+        # Global flags such as (?i) are only allowed at the start of a pattern
+        return False
+    return not compiled.groupindex and not REGEX_GROUP_REFERENCE.search(pattern)
+
+
+class CombinedRegexes:
+    """
+    Regexes combined into one pattern that finds every regex that matches a name in a single
+    call. Each regex is an optional lookahead from the start of the name, so it is searched for
+    independently of the others and its named group is set when it matches. Regexes that cannot
+    be combined safely are searched for one by one.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.__patterns = patterns
+        self.__separate: dict[int, re.Pattern] = {}
+        combined = []
+        for index, pattern in enumerate(patterns):
+            if can_combine_regex(pattern):
+                combined.append(f"(?:(?=.*?(?P<regex{index}>{pattern})))?")
+            else:
+                self.__separate[index] = re.compile(pattern)
+        self.__combined = re.compile("".join(combined)) if combined else None
+
+    def find_matching_indexes(self, text: str) -> list[int]:
+        match = self.__combined.match(text) if self.__combined else None
+        return [
+            index
+            for index in range(len(self.__patterns))
+            if (
+                self.__separate[index].search(text)
+                if index in self.__separate
+                else match.group(f"regex{index}") is not None
+            )
+        ]
+
+
+class OwnerMatcher:
+    """
+    Owner rules compiled once into lookups that do not grow with the number of rules.
+
+    Exact team names are a hash lookup, and team globs are resolved once per distinct team name
+    and then cached. Prefixes and suffixes are tries walked along the repository name, forwards
+    and backwards, so the cost of matching depends on the length of the name rather than the
+    number of rules. Regexes are combined into one pattern searched once per name, although each
+    regex is still a separate scan of the name within it.
+
+    Each match reports the rule that produced it, e.g. "prefix:hmpps-" or "team:OPG".
+    """
+
+    def __init__(self, owners: list[dict]):
+        validate_owners(owners)
+        self.owner_names = [owner["name"] for owner in owners]
+        self.__teams: dict[str, list[tuple[str, str]]] = {}
+        self.__team_globs: list[tuple[re.Pattern, str, str]] = []
+        self.__team_cache: dict[str, list[tuple[str, str]]] = {}
+        self.__prefixes = PrefixTrie()
+        self.__suffixes = PrefixTrie()
+        self.__regexes: list[tuple[str, str]] = []
+
+        for owner in owners:
+            name = owner["name"]
+            for team in owner.get("teams", []):
+                self.__teams.setdefault(team, []).append((name, f"team:{team}"))
+            for team_glob in owner.get("team_globs", []):
+                self.__team_globs.append(
+                    (
+                        re.compile(fnmatch.translate(team_glob)),
+                        name,
+                        f"team_glob:{team_glob}",
+                    )
+                )
+            for prefix in owner.get("prefixes", []):
+                self.__prefixes.add(prefix, (name, f"prefix:{prefix}"))
+            for suffix in owner.get("suffixes", []):
+                self.__suffixes.add(suffix[::-1], (name, f"suffix:{suffix}"))
+            for pattern in owner.get("regexes", []):
+                self.__regexes.append((name, f"regex:{pattern}"))
+        self.__combined_regexes = CombinedRegexes(
+            [pattern for owner in owners for pattern in owner.get("regexes", [])]
+        )
+
+    def __find_team_matches(self, team: str) -> list[tuple[str, str]]:
+        if team not in self.__team_cache:
+            self.__team_cache[team] = self.__teams.get(team, []) + [
+                (name, rule)
+                for pattern, name, rule in self.__team_globs
+                if pattern.match(team)
+            ]
+        return self.__team_cache[team]
+
+    def __find_name_matches(self, repository_name: str) -> list[tuple[str, str]]:
+        return (
+            self.__prefixes.find_values_for_prefixes_of(repository_name)
+            + self.__suffixes.find_values_for_prefixes_of(repository_name[::-1])
+            + [
+                self.__regexes[index]
+                for index in self.__combined_regexes.find_matching_indexes(
+                    repository_name
+                )
+            ]
+        )
+
+    def match_repository(self, repository: dict) -> dict[str, tuple[str, str]]:
+        """
+        Returns the relationship type and the rule that matched for each owner of the
+        repository. Admin access through a team takes precedence over any other match.
+        """
+        matches = {}
+        for team in (
+            repository["github_teams_with_admin_access"]
+            + repository["github_teams_with_admin_access_parents"]
+        ):
+            for owner_name, rule in self.__find_team_matches(team):
+                matches.setdefault(owner_name, ("ADMIN_ACCESS", rule))
+        for team in (
+            repository["github_teams_with_any_access"]
+            + repository["github_teams_with_any_access_parents"]
+        ):
+            for owner_name, rule in self.__find_team_matches(team):
+                matches.setdefault(owner_name, ("OTHER", rule))
+        # Name rules match the repository name without any organisation qualifier
+        repository_name = repository["name"].rsplit("/", 1)[-1]
+        for owner_name, rule in self.__find_name_matches(repository_name):
+            matches.setdefault(owner_name, ("OTHER", rule))
+        return matches
@@ -0,0 +1,189 @@
+import logging
+import queue
+import resource
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+END_OF_REPOSITORIES = object()
+
+
+def put_until_stopped(items: queue.Queue, item: Any, stopped: threading.Event) -> bool:
+    # Stop producing once the consumer has gone, rather than blocking on a full queue
+    while not stopped.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def close_iterable(iterable: Iterable):
+    # Closing a generator runs its cleanup, such as shutting down the executor it fetches with
+    close = getattr(iterable, "close", None)
+    if close is not None:
+        close()
+
+
+def iter_concurrently(
+    iterables: list[Iterable[dict]], queue_size: int = 200
+) -> Iterator[dict]:
+    """
+    Yields the repositories of several iterables, such as the crawls of each organisation, as
+    soon as any of them produces one. Each iterable runs on its own thread, so the time taken
+    is that of the slowest iterable rather than the sum of them all.
+    """
+    if len(iterables) == 1:
+        yield from iterables[0]
+        return
+
+    merged = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        return put_until_stopped(merged, item, stopped)
+
+    def iterate(repositories: Iterable[dict]):
+        try:
+            for repository in repositories:
+                if not put(repository):
+                    return
+            put(END_OF_REPOSITORIES)
+        except BaseException as exception:
+            put(exception)
+        finally:
+            close_iterable(repositories)
+
+    threads = [
+        threading.Thread(target=iterate, args=(iterable,), daemon=True)
+        for iterable in iterables
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        unfinished = len(threads)
+        while unfinished:
+            repository = merged.get()
+            if repository is END_OF_REPOSITORIES:
+                unfinished -= 1
+                continue
+            if isinstance(repository, BaseException):
+                raise repository
+            yield repository
+    finally:
+        stopped.set()
+        for thread in threads:
+            thread.join()
+
+
+class PipelineStage:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+
+class RepositoryPipeline:
+    """
+    Streams repositories from a fetch iterator through classification to a batch writer.
+
+    The fetch iterator runs on its own thread and hands repositories over through a bounded
+    queue, so GitHub requests keep going while earlier repositories are classified and written
+    to the database on the calling thread, which keeps the database session on the thread that
+    owns it.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 200,
+        batch_size: int = 100,
+        stop_timeout_seconds: float = 30.0,
+    ):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.stop_timeout_seconds = stop_timeout_seconds
+        self.fetch_stage = PipelineStage("fetch")
+        self.classify_stage = PipelineStage("classify")
+        self.write_stage = PipelineStage("write")
+
+    def __fetch(
+        self,
+        repositories: Iterable[dict],
+        fetched: queue.Queue,
+        stopped: threading.Event,
+    ):
+        started_at = time.monotonic()
+        try:
+            for repository in repositories:
+                if not put_until_stopped(fetched, repository, stopped):
+                    return
+                self.fetch_stage.items += 1
+            put_until_stopped(fetched, END_OF_REPOSITORIES, stopped)
+        except BaseException as exception:
+            put_until_stopped(fetched, exception, stopped)
+        finally:
+            self.fetch_stage.seconds = time.monotonic() - started_at
+            close_iterable(repositories)
+
+    def run(
+        self,
+        repositories: Iterable[dict],
+        classify: Callable[[dict], Any],
+        write_batch: Callable[[list], None],
+    ):
+        fetched = queue.Queue(maxsize=self.queue_size)
+        stopped = threading.Event()
+        fetcher = threading.Thread(
+            target=self.__fetch, args=(repositories, fetched, stopped), daemon=True
+        )
+        fetcher.start()
+
+        try:
+            batch = []
+            while True:
+                repository = fetched.get()
+                if repository is END_OF_REPOSITORIES:
+                    break
+                if isinstance(repository, BaseException):
+                    raise repository
+                started_at = time.monotonic()
+                batch.append(classify(repository))
+                self.classify_stage.seconds += time.monotonic() - started_at
+                self.classify_stage.items += 1
+                if len(batch) >= self.batch_size:
+                    self.__write(batch, write_batch)
+                    batch = []
+            if batch:
+                self.__write(batch, write_batch)
+        finally:
+            # A failed classification or write leaves the fetcher to stop at its next put,
+            # which may be a while if it is in a GitHub request or waiting for a rate limit
+            # reset, so it is left to finish on its own rather than holding up the error
+            stopped.set()
+            fetcher.join(timeout=self.stop_timeout_seconds)
+            if fetcher.is_alive():
+                logger.warning(
+                    f"Pipeline fetch thread did not stop within [ {self.stop_timeout_seconds:.0f} ] seconds, leaving it to finish"
+                )
+        self.log_statistics()
+
+    def __write(self, batch: list, write_batch: Callable[[list], None]):
+        started_at = time.monotonic()
+        write_batch(batch)
+        self.write_stage.seconds += time.monotonic() - started_at
+        self.write_stage.items += len(batch)
+
+    def log_statistics(self):
+        for stage in [self.fetch_stage, self.classify_stage, self.write_stage]:
+            logger.info(
+                f"Pipeline stage [ {stage.name} ] processed [ {stage.items} ] repositories in [ {stage.seconds:.1f} ] seconds at [ {stage.items_per_second():.1f} ] repositories/second"
+            )
+        # ru_maxrss is reported in kilobytes on Linux
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        logger.info(f"Peak RSS [ {peak_rss_mb:.1f} ] MB")
@@ -21,6 +21,20 @@ def __get_env_var_as_boolean(name: str, default: bool) -> bool | None:
     return default
 
 
+def __get_env_var_as_organisation_mapping(name: str) -> dict[str | None, list[str]]:
+    """
+    Parses comma separated values that may each be qualified by the organisation they belong
+    to, as in "organisation:value". Values that are not qualified are keyed by None.
+    """
+    values_by_organisation = {}
+    for entry in (__get_env_var(name) or "").split(","):
+        if not entry:
+            continue
+        organisation_name, _, value = entry.rpartition(":")
+        values_by_organisation.setdefault(organisation_name or None, []).append(value)
+    return values_by_organisation
+
+
 app_config = SimpleNamespace(
     add_stub_values_to_database=__get_env_var_as_boolean(
         "ADD_STUB_VALUES_TO_DATABASE", default=False
@@ -31,6 +45,10 @@ app_config = SimpleNamespace(
         client_id=__get_env_var("AUTH0_CLIENT_ID"),
         client_secret=__get_env_var("AUTH0_CLIENT_SECRET"),
     ),
+    checkpoint=SimpleNamespace(
+        chunk_size=int(__get_env_var("CHECKPOINT_CHUNK_SIZE") or "100"),
+        max_age_hours=int(__get_env_var("CHECKPOINT_MAX_AGE_HOURS") or "24"),
+    ),
     circleci=SimpleNamespace(
         token=__get_env_var("CIRCLECI_TOKEN"),
         cost_per_credit=float(
@@ -42,8 +60,33 @@ app_config = SimpleNamespace(
     flask=SimpleNamespace(
         app_secret_key=__get_env_var("APP_SECRET_KEY"),
     ),
+    incremental_sync=SimpleNamespace(
+        enabled=__get_env_var_as_boolean("INCREMENTAL_SYNC_ENABLED", default=False),
+        full_resync_interval_hours=int(
+            __get_env_var("FULL_RESYNC_INTERVAL_HOURS") or "168"
+        ),
+    ),
     logging_level=__get_env_var("LOGGING_LEVEL"),
+    owner_rules=SimpleNamespace(
+        path=__get_env_var("OWNER_RULES_PATH"),
+    ),
+    ownership_index=SimpleNamespace(
+        enabled=__get_env_var_as_boolean("OWNERSHIP_INDEX_ENABLED", default=True),
+        check_interval_seconds=float(
+            __get_env_var("OWNERSHIP_INDEX_CHECK_INTERVAL_SECONDS") or "30"
+        ),
+    ),
     phase_banner_text=__get_env_var("PHASE_BANNER_TEXT"),
+    pipeline=SimpleNamespace(
+        queue_size=int(__get_env_var("PIPELINE_QUEUE_SIZE") or "200"),
+    ),
+    run_report=SimpleNamespace(
+        path=__get_env_var("RUN_REPORT_PATH"),
+        prometheus_textfile_path=__get_env_var("PROMETHEUS_TEXTFILE_PATH"),
+        slowest_repositories=int(
+            __get_env_var("RUN_REPORT_SLOWEST_REPOSITORIES") or "10"
+        ),
+    ),
     postgres=SimpleNamespace(
         user=__get_env_var("POSTGRES_USER"),
         password=__get_env_var("POSTGRES_PASSWORD"),
@@ -55,5 +98,50 @@ app_config = SimpleNamespace(
             f"{__get_env_var('POSTGRES_HOST')}:{__get_env_var('POSTGRES_PORT')}/{__get_env_var('POSTGRES_DB')}"
         ),
     ),
-    github=SimpleNamespace(token=__get_env_var("ADMIN_GITHUB_TOKEN")),
+    work_queue=SimpleNamespace(
+        batch_size=int(__get_env_var("WORK_QUEUE_BATCH_SIZE") or "50"),
+        lease_seconds=int(__get_env_var("WORK_QUEUE_LEASE_SECONDS") or "900"),
+        poll_seconds=int(__get_env_var("WORK_QUEUE_POLL_SECONDS") or "30"),
+        max_attempts=int(__get_env_var("WORK_QUEUE_MAX_ATTEMPTS") or "3"),
+    ),
+    webhook=SimpleNamespace(
+        secret=__get_env_var("GITHUB_WEBHOOK_SECRET"),
+        delay_seconds=float(__get_env_var("WEBHOOK_DELAY_SECONDS") or "5"),
+    ),
+    github=SimpleNamespace(
+        token=__get_env_var("ADMIN_GITHUB_TOKEN"),
+        # Values not qualified by an organisation belong to the primary organisation
+        additional_tokens=__get_env_var_as_organisation_mapping(
+            "GITHUB_ADDITIONAL_TOKENS"
+        ),
+        app_id=__get_env_var("GITHUB_APP_ID"),
+        app_private_key=__get_env_var("GITHUB_APP_PRIVATE_KEY"),
+        app_installation_ids=__get_env_var_as_organisation_mapping(
+            "GITHUB_APP_INSTALLATION_IDS"
+        ),
+        api_url=__get_env_var("GITHUB_API_URL") or "https://api.github.com",
+        # The first organisation is the primary one, whose repositories keep bare asset names
+        organisations=[
+            organisation_name
+            for organisation_name in (
+                __get_env_var("GITHUB_ORGANISATIONS") or "ministryofjustice"
+            ).split(",")
+            if organisation_name
+        ],
+        repository_visibilities=[
+            visibility
+            for visibility in (
+                __get_env_var("GITHUB_REPOSITORY_VISIBILITIES") or "public"
+            ).split(",")
+            if visibility
+        ],
+        client=__get_env_var("GITHUB_CLIENT") or "pygithub",
+        fetch_strategy=__get_env_var("GITHUB_FETCH_STRATEGY") or "rest",
+        max_workers=int(__get_env_var("GITHUB_MAX_WORKERS") or "1"),
+        rate_limit_reserve=int(__get_env_var("GITHUB_RATE_LIMIT_RESERVE") or "100"),
+        cache_directory=__get_env_var("GITHUB_CACHE_DIRECTORY"),
+        cache_max_size_mb=int(__get_env_var("GITHUB_CACHE_MAX_SIZE_MB") or "256"),
+        graphql_url=__get_env_var("GITHUB_GRAPHQL_URL")
+        or "https://api.github.com/graphql",
+    ),
 )
@@ -2,9 +2,11 @@ from flask import Flask
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+from app.main.routes.webhook import webhook_route
+
 
 def configure_limiter(app: Flask, is_rate_limit_enabled: bool = True) -> None:
-    Limiter(
+    limiter = Limiter(
         get_remote_address,
         app=app,
         default_limits=["100 per minute", "10 per second"],
@@ -12,3 +14,6 @@ def configure_limiter(app: Flask, is_rate_limit_enabled: bool = True) -> None:
         strategy="moving-window",
         enabled=is_rate_limit_enabled,
     )
+    # GitHub delivers bursts of webhook events from a few addresses, and every delivery is
+    # checked against its signature instead
+    limiter.exempt(webhook_route)
@@ -0,0 +1,71 @@
+import logging
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import List
+
+from sqlalchemy import Engine, insert, select, text
+
+from app.main.migrations.versions import (
+    v0001_initial_schema,
+    v0002_job_state_tables,
+    v0003_indexes_and_unique_constraints,
+    v0004_authoritative_ownership,
+    v0005_backfill_authoritative_ownership,
+)
+from app.main.models import SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+# Each migration has a VERSION, a docstring naming it and an upgrade(connection) function.
+# Migrations are applied in order and never edited once released, add a new one instead
+MIGRATIONS: List[ModuleType] = [
+    v0001_initial_schema,
+    v0002_job_state_tables,
+    v0003_indexes_and_unique_constraints,
+    v0004_authoritative_ownership,
+    v0005_backfill_authoritative_ownership,
+]
+
+# An arbitrary key for the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 4_118_263
+
+
+def get_migration_name(migration: ModuleType) -> str:
+    return migration.__doc__.strip().splitlines()[0]
+
+
+def migrate(engine: Engine, migrations: List[ModuleType] = MIGRATIONS) -> List[int]:
+    """
+    Applies the migrations not yet recorded in the schema_migration table in a single
+    transaction, so a failed migration leaves the schema as it was, and returns the versions
+    applied.
+    """
+    applied_versions = []
+    with engine.begin() as connection:
+        # Every web process and the job migrate on start up, so only one does at a time
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+            )
+        SchemaMigration.__table__.create(connection, checkfirst=True)
+        recorded_versions = set(connection.scalars(select(SchemaMigration.version)))
+
+        for migration in sorted(migrations, key=lambda migration: migration.VERSION):
+            if migration.VERSION in recorded_versions:
+                continue
+            logger.info(
+                f"Applying migration [ {migration.VERSION} ] [ {get_migration_name(migration)} ]"
+            )
+            migration.upgrade(connection)
+            connection.execute(
+                insert(SchemaMigration).values(
+                    version=migration.VERSION,
+                    name=get_migration_name(migration),
+                    applied_at=datetime.now(timezone.utc),
+                )
+            )
+            applied_versions.append(migration.VERSION)
+
+    if not applied_versions:
+        logger.info("Database schema is up to date")
+    return applied_versions
@@ -0,0 +1,40 @@
+"""
+Initial schema
+
+Creates the owner, asset and relationship tables as they were before migrations were
+introduced. Databases created back then already have them and are left as they are.
+"""
+
+from sqlalchemy import Column, Connection, ForeignKey, Integer, MetaData, String, Table
+
+VERSION = 1
+
+metadata = MetaData()
+
+Table(
+    "owner",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+)
+
+Table(
+    "asset",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("type", String),
+)
+
+Table(
+    "relationship",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("type", String),
+    Column("asset_id", Integer, ForeignKey("asset.id")),
+    Column("owner_id", Integer, ForeignKey("owner.id")),
+)
+
+
+def upgrade(connection: Connection):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,106 @@
+"""
+Job state tables
+
+Creates the tables the job keeps its state in between runs: the incremental sync cursor and
+repository states, the crawl checkpoint and work queue, the GitHub team hierarchy and team
+grants, and the data generations readers reload on.
+"""
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    Connection,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+)
+
+VERSION = 2
+
+metadata = MetaData()
+
+Table(
+    "sync_cursor",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("last_successful_run_at", DateTime(timezone=True)),
+    Column("last_full_sync_at", DateTime(timezone=True)),
+)
+
+Table(
+    "repository_sync_state",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("team_grants_fingerprint", String),
+    Column("teams_with_access", JSON),
+    Column("synced_at", DateTime(timezone=True)),
+)
+
+Table(
+    "crawl_checkpoint",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("teams_with_access", JSON),
+    Column("checkpointed_at", DateTime(timezone=True)),
+)
+
+Table(
+    "crawl_work_item",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("status", String),
+    Column("claimed_by", String),
+    Column("lease_expires_at", DateTime(timezone=True)),
+    Column("attempts", Integer),
+)
+
+Table(
+    "github_team",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True),
+    Column("parent_name", String),
+)
+
+Table(
+    "github_team_ancestor",
+    metadata,
+    Column("ancestor_name", String, primary_key=True),
+    Column("descendant_name", String, primary_key=True),
+    Column("depth", Integer),
+    Index("ix_github_team_ancestor_descendant_name", "descendant_name"),
+)
+
+Table(
+    "github_team_repository_grant",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("team_name", String),
+    Column("repository_name", String),
+    Column("has_admin", Boolean),
+    Index(
+        "ix_github_team_repository_grant_team_name_has_admin", "team_name", "has_admin"
+    ),
+    Index("ix_github_team_repository_grant_repository_name", "repository_name"),
+)
+
+Table(
+    "data_generation",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True),
+    Column("generation", Integer),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+
+def upgrade(connection: Connection):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,86 @@
+"""
+Indexes and unique constraints
+
+Assets and owners become unique by name and relationships unique by asset and owner,
+merging any duplicates into the row with the lowest id first. Asset names are indexed for
+searching by trigram where pg_trgm is available, and by prefix otherwise.
+"""
+
+import logging
+
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import DBAPIError
+
+VERSION = 3
+
+logger = logging.getLogger(__name__)
+
+# Rows referring to an asset or owner, which are moved to the row kept for its name
+REFERENCES = {
+    "asset": [("relationship", "asset_id")],
+    "owner": [("relationship", "owner_id")],
+}
+
+
+def merge_duplicate_names(connection: Connection, table: str):
+    kept_ids = f"SELECT MIN(id) FROM {table} GROUP BY name"
+    for referencing_table, column in REFERENCES[table]:
+        connection.execute(
+            text(
+                f"UPDATE {referencing_table} SET {column} = ("
+                f"SELECT MIN(kept.id) FROM {table} kept JOIN {table} duplicate "
+                f"ON kept.name = duplicate.name "
+                f"WHERE duplicate.id = {referencing_table}.{column}"
+                f") WHERE {column} NOT IN ({kept_ids})"
+            )
+        )
+    connection.execute(text(f"DELETE FROM {table} WHERE id NOT IN ({kept_ids})"))
+
+
+def delete_duplicate_relationships(connection: Connection):
+    # The job rewrites the relationship type of the row kept on its next run
+    connection.execute(
+        text(
+            "DELETE FROM relationship WHERE id NOT IN ("
+            "SELECT MIN(id) FROM relationship GROUP BY asset_id, owner_id)"
+        )
+    )
+
+
+def create_asset_name_search_index(connection: Connection):
+    if connection.dialect.name != "postgresql":
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            connection.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_asset_name_trigram "
+                    "ON asset USING gin (name gin_trgm_ops)"
+                )
+            )
+    except DBAPIError:
+        logger.warning(
+            "The pg_trgm extension is not available, indexing asset names by prefix instead"
+        )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_asset_name_prefix "
+                "ON asset (name text_pattern_ops)"
+            )
+        )
+
+
+def upgrade(connection: Connection):
+    merge_duplicate_names(connection, "asset")
+    merge_duplicate_names(connection, "owner")
+    delete_duplicate_relationships(connection)
+    for statement in [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_asset_name ON asset (name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_owner_name ON owner (name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_relationship_asset_id_owner_id "
+        "ON relationship (asset_id, owner_id)",
+        "CREATE INDEX IF NOT EXISTS ix_relationship_owner_id ON relationship (owner_id)",
+    ]:
+        connection.execute(text(statement))
+    create_asset_name_search_index(connection)
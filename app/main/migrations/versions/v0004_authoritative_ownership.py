@@ -0,0 +1,53 @@
+"""
+Authoritative ownership
+
+Creates the table the job keeps alongside the relationships with whether each owner of an
+asset has admin access to it and is authoritative for it.
+"""
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Connection,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+)
+
+VERSION = 4
+
+metadata = MetaData()
+
+# Only referred to by the foreign keys below, the tables are created by earlier migrations
+Table("asset", metadata, Column("id", Integer, primary_key=True))
+Table("owner", metadata, Column("id", Integer, primary_key=True))
+
+authoritative_ownership = Table(
+    "authoritative_ownership",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("asset_id", Integer, ForeignKey("asset.id")),
+    Column("owner_id", Integer, ForeignKey("owner.id")),
+    Column("owner_name", String),
+    Column("has_admin", Boolean),
+    Column("is_authoritative", Boolean),
+    Index(
+        "ix_authoritative_ownership_owner_name_is_authoritative_has_admin",
+        "owner_name",
+        "is_authoritative",
+        "has_admin",
+    ),
+    Index(
+        "ix_authoritative_ownership_asset_id_owner_id",
+        "asset_id",
+        "owner_id",
+        unique=True,
+    ),
+)
+
+
+def upgrade(connection: Connection):
+    authoritative_ownership.create(connection, checkfirst=True)
@@ -0,0 +1,30 @@
+"""
+Backfill authoritative ownership
+
+Fills the authoritative ownership table from the existing relationships, so owner pages
+are complete as soon as it is deployed rather than after the job next runs. An owner is
+authoritative for an asset if it has admin access, or if no owner has admin access.
+"""
+
+from sqlalchemy import Connection, text
+
+VERSION = 5
+
+HAS_ADMIN = "{relationship}.type LIKE '%ADMIN!_ACCESS%' ESCAPE '!'"
+
+
+def upgrade(connection: Connection):
+    has_admin = HAS_ADMIN.format(relationship="relationship")
+    other_has_admin = HAS_ADMIN.format(relationship="other")
+    connection.execute(text("DELETE FROM authoritative_ownership"))
+    connection.execute(
+        text(
+            "INSERT INTO authoritative_ownership "
+            "(asset_id, owner_id, owner_name, has_admin, is_authoritative) "
+            f"SELECT relationship.asset_id, relationship.owner_id, owner.name, "
+            f"{has_admin}, {has_admin} OR NOT EXISTS ("
+            f"SELECT 1 FROM relationship other "
+            f"WHERE other.asset_id = relationship.asset_id AND {other_has_admin}) "
+            "FROM relationship JOIN owner ON relationship.owner_id = owner.id"
+        )
+    )
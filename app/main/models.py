@@ -1,7 +1,8 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSONB
-from typing import List
+from typing import List, Optional
 
 db = SQLAlchemy()
 
@@ -22,6 +23,8 @@ class Owner(db.Model):
         overlaps="relationships",
     )
 
+    __table_args__ = (db.Index("ix_owner_name", "name", unique=True),)
+
     def __repr__(self) -> str:
         return f"<Owner id={self.id}, name={self.name}, relationships={self.relationships}>"
 
@@ -43,6 +46,9 @@ class Asset(db.Model):
         overlaps="relationships",
     )
 
+    # Searching by name uses a trigram index created by a migration, as it needs pg_trgm
+    __table_args__ = (db.Index("ix_asset_name", "name", unique=True),)
+
     def __repr__(self) -> str:
         return f"<Asset id={self.id}, name={self.name}, owners={[self.owners]}, relationships={self.relationships}>"
 
@@ -58,5 +64,181 @@ class Relationship(db.Model):
     asset: Mapped["Asset"] = relationship("Asset", back_populates="relationships")
     owner: Mapped["Owner"] = relationship("Owner", back_populates="relationships")
 
+    __table_args__ = (
+        db.Index(
+            "ix_relationship_asset_id_owner_id", "asset_id", "owner_id", unique=True
+        ),
+        db.Index("ix_relationship_owner_id", "owner_id"),
+    )
+
     def __repr__(self) -> str:
         return f"<Relationship id={self.id}, type={self.type}, asset_id={self.asset_id}, owner_id={self.owner_id}>"
+
+
+class AuthoritativeOwnership(db.Model):
+    """
+    Whether each owner with a relationship to an asset has admin access to it and is
+    authoritative for it, kept by the job alongside the relationships so owner pages read
+    one owner's rows rather than working it out for every asset.
+    """
+
+    __tablename__ = "authoritative_ownership"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    asset_id: Mapped[int] = mapped_column(db.ForeignKey("asset.id"))
+    owner_id: Mapped[int] = mapped_column(db.ForeignKey("owner.id"))
+    owner_name: Mapped[str] = mapped_column(db.String)
+    has_admin: Mapped[bool] = mapped_column(db.Boolean)
+    is_authoritative: Mapped[bool] = mapped_column(db.Boolean)
+
+    __table_args__ = (
+        db.Index(
+            "ix_authoritative_ownership_owner_name_is_authoritative_has_admin",
+            "owner_name",
+            "is_authoritative",
+            "has_admin",
+        ),
+        db.Index(
+            "ix_authoritative_ownership_asset_id_owner_id",
+            "asset_id",
+            "owner_id",
+            unique=True,
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AuthoritativeOwnership id={self.id}, asset_id={self.asset_id}, owner_name={self.owner_name}, has_admin={self.has_admin}, is_authoritative={self.is_authoritative}>"
+
+
+class SyncCursor(db.Model):
+    __tablename__ = "sync_cursor"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String)
+    last_successful_run_at: Mapped[Optional[datetime]] = mapped_column(
+        db.DateTime(timezone=True)
+    )
+    last_full_sync_at: Mapped[Optional[datetime]] = mapped_column(
+        db.DateTime(timezone=True)
+    )
+
+    def __repr__(self) -> str:
+        return f"<SyncCursor id={self.id}, name={self.name}, last_successful_run_at={self.last_successful_run_at}, last_full_sync_at={self.last_full_sync_at}>"
+
+
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migration"
+
+    version: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String)
+    applied_at: Mapped[datetime] = mapped_column(db.DateTime(timezone=True))
+
+    def __repr__(self) -> str:
+        return f"<SchemaMigration version={self.version}, name={self.name}, applied_at={self.applied_at}>"
+
+
+class DataGeneration(db.Model):
+    """A counter bumped each time the job changes the data it names, so readers know to reload."""
+
+    __tablename__ = "data_generation"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String, unique=True)
+    generation: Mapped[int] = mapped_column(db.Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(db.DateTime(timezone=True))
+
+    def __repr__(self) -> str:
+        return f"<DataGeneration id={self.id}, name={self.name}, generation={self.generation}, updated_at={self.updated_at}>"
+
+
+class RepositorySyncState(db.Model):
+    __tablename__ = "repository_sync_state"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String)
+    team_grants_fingerprint: Mapped[str] = mapped_column(db.String)
+    teams_with_access: Mapped[dict] = mapped_column(db.JSON)
+    synced_at: Mapped[datetime] = mapped_column(db.DateTime(timezone=True))
+
+    def __repr__(self) -> str:
+        return f"<RepositorySyncState id={self.id}, name={self.name}, team_grants_fingerprint={self.team_grants_fingerprint}, synced_at={self.synced_at}>"
+
+
+class CrawlCheckpoint(db.Model):
+    __tablename__ = "crawl_checkpoint"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String)
+    teams_with_access: Mapped[dict] = mapped_column(db.JSON)
+    checkpointed_at: Mapped[datetime] = mapped_column(db.DateTime(timezone=True))
+
+    def __repr__(self) -> str:
+        return f"<CrawlCheckpoint id={self.id}, name={self.name}, checkpointed_at={self.checkpointed_at}>"
+
+
+class CrawlWorkItem(db.Model):
+    __tablename__ = "crawl_work_item"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String)
+    status: Mapped[str] = mapped_column(db.String)
+    claimed_by: Mapped[Optional[str]] = mapped_column(db.String)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(
+        db.DateTime(timezone=True)
+    )
+    attempts: Mapped[int] = mapped_column(db.Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"<CrawlWorkItem id={self.id}, name={self.name}, status={self.status}, claimed_by={self.claimed_by}, lease_expires_at={self.lease_expires_at}, attempts={self.attempts}>"
+
+
+class GithubTeam(db.Model):
+    __tablename__ = "github_team"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(db.String, unique=True)
+    parent_name: Mapped[Optional[str]] = mapped_column(db.String)
+
+    def __repr__(self) -> str:
+        return f"<GithubTeam id={self.id}, name={self.name}, parent_name={self.parent_name}>"
+
+
+class GithubTeamAncestor(db.Model):
+    """
+    The closure of the team hierarchy: a row for every team and each of its ancestors, with the
+    number of levels between them, and a row for every team as its own ancestor at depth 0.
+    """
+
+    __tablename__ = "github_team_ancestor"
+
+    ancestor_name: Mapped[str] = mapped_column(db.String, primary_key=True)
+    descendant_name: Mapped[str] = mapped_column(db.String, primary_key=True)
+    depth: Mapped[int] = mapped_column(db.Integer)
+
+    __table_args__ = (
+        db.Index("ix_github_team_ancestor_descendant_name", "descendant_name"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GithubTeamAncestor ancestor_name={self.ancestor_name}, descendant_name={self.descendant_name}, depth={self.depth}>"
+
+
+class GithubTeamRepositoryGrant(db.Model):
+    __tablename__ = "github_team_repository_grant"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    team_name: Mapped[str] = mapped_column(db.String)
+    repository_name: Mapped[str] = mapped_column(db.String)
+    has_admin: Mapped[bool] = mapped_column(db.Boolean)
+
+    __table_args__ = (
+        db.Index(
+            "ix_github_team_repository_grant_team_name_has_admin",
+            "team_name",
+            "has_admin",
+        ),
+        db.Index("ix_github_team_repository_grant_repository_name", "repository_name"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GithubTeamRepositoryGrant id={self.id}, team_name={self.team_name}, repository_name={self.repository_name}, has_admin={self.has_admin}>"
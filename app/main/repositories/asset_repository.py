@@ -1,11 +1,16 @@
 import logging
 
+from sqlalchemy import delete, exists, func, insert, or_, select, update
 from sqlalchemy.engine import create
-from app.main.models import Asset, Relationship, db, Owner
+from sqlalchemy.orm import aliased
+from app.main.models import AuthoritativeOwnership, Asset, Relationship, db, Owner
+from app.main.repositories.upsert import get_insert
 from flask import g
 from sqlalchemy.orm import scoped_session
 from typing import List
 
+SYNC_CHUNK_SIZE = 500
+
 
 class AssetView:
     def __init__(self, name: str, owner_names: List[str], admin_owner_names: List[str]):
@@ -14,49 +19,267 @@ class AssetView:
         self.owner_names = owner_names
 
     @classmethod
-    def from_asset(cls, asset: Asset):
-        owner_names = [relationship.owner.name for relationship in asset.relationships]
-        admin_owner_names = [
-            relationship.owner.name
-            for relationship in asset.relationships
-            if "ADMIN_ACCESS" in relationship.type
-        ]
+    def from_rows(cls, rows) -> list["AssetView"]:
+        """
+        Builds views from (asset id, asset name, owner name, relationship type) rows ordered by
+        asset, where assets without relationships have a single row with no owner.
+        """
+        views_by_asset_id = {}
+        for asset_id, asset_name, owner_name, relationship_type in rows:
+            if asset_id not in views_by_asset_id:
+                views_by_asset_id[asset_id] = cls(
+                    name=asset_name, owner_names=[], admin_owner_names=[]
+                )
+            if owner_name is None:
+                continue
+            view = views_by_asset_id[asset_id]
+            view.owner_names.append(owner_name)
+            if "ADMIN_ACCESS" in relationship_type:
+                view.admin_owner_names.append(owner_name)
+        return list(views_by_asset_id.values())
+
+
+class AssetPage:
+    """
+    A page of assets ordered by name, the number of assets matching the filters across every
+    page and the name to continue after for the next page, if there is one.
+    """
+
+    def __init__(self, assets: List[AssetView], total: int, next_after: str | None):
+        self.assets = assets
+        self.total = total
+        self.next_after = next_after
+
+
+class RelationshipPlan:
+    """
+    The relationship changes needed to move the stored relationships of a set of assets to a
+    target mapping of asset name to owner name to relationship type.
+
+    Relationships are only deleted for assets in the target mapping, so assets that were not
+    crawled keep their relationships until a full run plans the removal of those assets.
+    """
+
+    def __init__(
+        self,
+        assets_to_add: List[str] | None = None,
+        relationships_to_insert: List[tuple[str, str, str]] | None = None,
+        relationships_to_update: List[tuple[int, str, str, str, str]] | None = None,
+        relationships_to_delete: List[tuple[int, str, str, str]] | None = None,
+        unchanged: int = 0,
+        assets_to_delete: List[str] | None = None,
+    ):
+        self.assets_to_add = assets_to_add or []
+        self.relationships_to_insert = relationships_to_insert or []
+        self.relationships_to_update = relationships_to_update or []
+        self.relationships_to_delete = relationships_to_delete or []
+        self.unchanged = unchanged
+        self.assets_to_delete = assets_to_delete or []
+
+    @classmethod
+    def for_removed_assets(
+        cls,
+        current_relationships: dict[tuple[str, str], tuple[int, str]],
+        asset_names: set[str],
+    ):
         return cls(
-            name=asset.name,
-            owner_names=owner_names,
-            admin_owner_names=admin_owner_names,
+            relationships_to_delete=[
+                (relationship_id, *key, relationship_type)
+                for key, (relationship_id, relationship_type) in sorted(
+                    current_relationships.items()
+                )
+                if key[0] in asset_names
+            ],
+            assets_to_delete=sorted(asset_names),
         )
 
+    @classmethod
+    def from_relationships(
+        cls,
+        current_relationships: dict[tuple[str, str], tuple[int, str]],
+        current_asset_names: set[str],
+        relationships_by_asset_name: dict[str, dict[str, str]],
+    ):
+        target_relationships = {
+            (asset_name, owner_name): relationship_type
+            for asset_name, relationships in relationships_by_asset_name.items()
+            for owner_name, relationship_type in relationships.items()
+        }
+        current_keys = {
+            key
+            for key in current_relationships
+            if key[0] in relationships_by_asset_name
+        }
+        target_keys = set(target_relationships)
+
+        relationships_to_update = []
+        unchanged = 0
+        for key in sorted(target_keys & current_keys):
+            relationship_id, current_type = current_relationships[key]
+            if current_type == target_relationships[key]:
+                unchanged += 1
+            else:
+                relationships_to_update.append(
+                    (relationship_id, *key, current_type, target_relationships[key])
+                )
+
+        return cls(
+            assets_to_add=sorted(
+                set(relationships_by_asset_name) - current_asset_names
+            ),
+            relationships_to_insert=[
+                (*key, target_relationships[key])
+                for key in sorted(target_keys - current_keys)
+            ],
+            relationships_to_update=relationships_to_update,
+            relationships_to_delete=[
+                (current_relationships[key][0], *key, current_relationships[key][1])
+                for key in sorted(current_keys - target_keys)
+            ],
+            unchanged=unchanged,
+        )
+
+    def extend(self, plan: "RelationshipPlan"):
+        self.assets_to_add.extend(plan.assets_to_add)
+        self.relationships_to_insert.extend(plan.relationships_to_insert)
+        self.relationships_to_update.extend(plan.relationships_to_update)
+        self.relationships_to_delete.extend(plan.relationships_to_delete)
+        self.unchanged += plan.unchanged
+        self.assets_to_delete.extend(plan.assets_to_delete)
+
+    def is_empty(self) -> bool:
+        return not (
+            self.assets_to_add
+            or self.relationships_to_insert
+            or self.relationships_to_update
+            or self.relationships_to_delete
+            or self.assets_to_delete
+        )
+
+    def get_counts(self) -> dict[str, int]:
+        return {
+            "inserted": len(self.relationships_to_insert),
+            "updated": len(self.relationships_to_update),
+            "deleted": len(self.relationships_to_delete),
+            "unchanged": self.unchanged,
+        }
+
+    def format(self) -> str:
+        lines = [f"+ asset {asset_name}" for asset_name in self.assets_to_add]
+        lines += [
+            f"+ {asset_name} -> {owner_name} [ {relationship_type} ]"
+            for asset_name, owner_name, relationship_type in self.relationships_to_insert
+        ]
+        lines += [
+            f"~ {asset_name} -> {owner_name} [ {from_type} ] => [ {to_type} ]"
+            for _, asset_name, owner_name, from_type, to_type in self.relationships_to_update
+        ]
+        lines += [
+            f"- {asset_name} -> {owner_name} [ {relationship_type} ]"
+            for _, asset_name, owner_name, relationship_type in self.relationships_to_delete
+        ]
+        lines += [f"- asset {asset_name}" for asset_name in self.assets_to_delete]
+        counts = self.get_counts()
+        lines.append(
+            f"Assets to add [ {len(self.assets_to_add)} ] delete [ {len(self.assets_to_delete)} ] relationships to insert [ {counts['inserted']} ] update [ {counts['updated']} ] delete [ {counts['deleted']} ] unchanged [ {counts['unchanged']} ]"
+        )
+        return "\n".join(lines)
+
 
 class AssetRepository:
     def __init__(self, db_session: scoped_session = db.session):
         self.db_session = db_session
 
     def find_all(self) -> list[AssetView]:
-        assets = self.db_session.query(Asset).all()
-
-        return [AssetView.from_asset(asset) for asset in assets]
+        return self.__find_views()
 
     def find_all_by_owners(self, owner_names: list[str]) -> list[AssetView]:
-        assets = (
-            self.db_session.query(Asset)
-            .join(Asset.owners)
-            .filter(Owner.name.in_(owner_names))
-            .distinct()
-            .all()
+        return self.__find_views(
+            select(Relationship.asset_id)
+            .join(Owner, Relationship.owner_id == Owner.id)
+            .where(Owner.name.in_(owner_names))
         )
 
-        return [AssetView.from_asset(asset) for asset in assets]
-
     def find_all_by_owner(self, owner_name: str) -> list[AssetView]:
-        assets = (
-            self.db_session.query(Asset)
-            .join(Asset.owners)
-            .filter(Asset.owners.any(name=owner_name))
-            .all()
+        return self.find_all_by_owners([owner_name])
+
+    def find_all_by_authoritative_owner(
+        self, owner_name: str, missing_admin_access_only: bool = False
+    ) -> list[AssetView]:
+        asset_ids = select(AuthoritativeOwnership.asset_id).where(
+            AuthoritativeOwnership.owner_name == owner_name,
+            AuthoritativeOwnership.is_authoritative.is_(True),
         )
+        if missing_admin_access_only:
+            asset_ids = asset_ids.where(AuthoritativeOwnership.has_admin.is_(False))
+        return self.__find_views(asset_ids)
+
+    def find_page(
+        self,
+        owner_name: str | None,
+        has_admin: bool | None = None,
+        authoritative_only: bool = False,
+        name_contains: str | None = None,
+        after: str | None = None,
+        page_size: int = 50,
+    ) -> AssetPage:
+        """
+        Returns a page of the assets of an owner, or of assets without an owner when no owner
+        is given, continuing after the asset named after. has_admin limits an owner's assets
+        to those it has, or does not have, admin access to.
+        """
+        filters = []
+        if owner_name is None:
+            filters.append(~exists().where(Relationship.asset_id == Asset.id))
+        else:
+            asset_ids = select(AuthoritativeOwnership.asset_id).where(
+                AuthoritativeOwnership.owner_name == owner_name
+            )
+            if authoritative_only:
+                asset_ids = asset_ids.where(
+                    AuthoritativeOwnership.is_authoritative.is_(True)
+                )
+            if has_admin is not None:
+                asset_ids = asset_ids.where(
+                    AuthoritativeOwnership.has_admin.is_(has_admin)
+                )
+            filters.append(Asset.id.in_(asset_ids))
+        if name_contains:
+            filters.append(Asset.name.contains(name_contains, autoescape=True))
 
-        return [AssetView.from_asset(asset) for asset in assets]
+        total = self.db_session.scalar(
+            select(func.count()).select_from(Asset).where(*filters)
+        )
+        if after is not None:
+            filters.append(Asset.name > after)
+        # One more than a page is read to know whether there is a next page
+        rows = self.db_session.execute(
+            select(Asset.id, Asset.name)
+            .where(*filters)
+            .order_by(Asset.name)
+            .limit(page_size + 1)
+        ).all()
+        page_rows = rows[:page_size]
+        assets = self.__find_views(
+            [asset_id for asset_id, _ in page_rows], order_by_name=True
+        )
+        next_after = page_rows[-1][1] if len(rows) > page_size else None
+        return AssetPage(assets, total, next_after)
+
+    def __find_views(
+        self, asset_ids=None, order_by_name: bool = False
+    ) -> list[AssetView]:
+        # One query for every view, rather than loading each asset's relationships and
+        # each relationship's owner in turn
+        query = (
+            select(Asset.id, Asset.name, Owner.name, Relationship.type)
+            .outerjoin(Relationship, Relationship.asset_id == Asset.id)
+            .outerjoin(Owner, Relationship.owner_id == Owner.id)
+            .order_by(Asset.name if order_by_name else Asset.id, Relationship.id)
+        )
+        if asset_ids is not None:
+            query = query.where(Asset.id.in_(asset_ids))
+        return AssetView.from_rows(self.db_session.execute(query))
 
     def add_asset(self, name: str, type: str) -> Asset:
         asset = Asset()
@@ -78,49 +301,236 @@ class AssetRepository:
         return relationship
 
     def clean_all_tables(self):
+        self.db_session.query(AuthoritativeOwnership).delete()
         self.db_session.query(Relationship).delete()
         self.db_session.query(Owner).delete()
         self.db_session.query(Asset).delete()
 
+    def delete_assets_by_name(
+        self, names: List[str], asset_type: str = "REPOSITORY"
+    ) -> int:
+        """Deletes the assets and every relationship to them, returning how many existed."""
+        asset_ids = list(
+            self.db_session.scalars(
+                select(Asset.id).where(Asset.name.in_(names), Asset.type == asset_type)
+            )
+        )
+        if asset_ids:
+            self.__delete_assets(asset_ids)
+        self.db_session.commit()
+        return len(asset_ids)
+
+    def find_names(self, asset_type: str = "REPOSITORY") -> set[str]:
+        return set(
+            self.db_session.scalars(select(Asset.name).where(Asset.type == asset_type))
+        )
+
     def find_by_name(self, name: str) -> List[Asset]:
         assets = self.db_session.query(Asset).filter(Asset.name == name).all()
         return assets
 
+    def add_asset_if_name_does_not_exist(self, name: str, type: str) -> Asset:
+        asset_id = self.__add_assets_if_names_do_not_exist([name], type)[name]
+        self.db_session.commit()
+        return self.db_session.get(Asset, asset_id)
+
     def update_relationship_with_owner(
         self, asset: Asset, owner: Owner, relationship_type: str
     ) -> Relationship:
-        relationships = (
-            self.db_session.query(Relationship)
-            .filter_by(asset_id=asset.id, owner_id=owner.id)
-            .all()
+        logging.info(
+            f"Setting relationship between Asset [ {asset.name} ] and Owner [ {owner.name} ] to [ {relationship_type} ]"
+        )
+        upsert = get_insert(self.db_session, Relationship).values(
+            asset_id=asset.id, owner_id=owner.id, type=relationship_type
         )
+        relationship_id = self.db_session.scalar(
+            upsert.on_conflict_do_update(
+                index_elements=[Relationship.asset_id, Relationship.owner_id],
+                set_={"type": upsert.excluded.type},
+            ).returning(Relationship.id)
+        )
+        self.db_session.commit()
+        return self.db_session.get(Relationship, relationship_id)
 
-        if len(relationships) > 1:
-            raise ValueError(
-                f"Asset [ {asset.name} ] has multiple relationships with Owner [ {owner.name} ]"
-            )
+    def find_relationships_with_owners(
+        self,
+        owners: List[Owner],
+        asset_type: str = "REPOSITORY",
+        asset_names: List[str] | None = None,
+    ) -> tuple[dict[tuple[str, str], tuple[int, str]], set[str]]:
+        asset_filters = [Asset.type == asset_type]
+        if asset_names is not None:
+            asset_filters.append(Asset.name.in_(asset_names))
 
-        if len(relationships) == 0:
-            logging.info(
-                f"Asset [ {asset.name} ] has no relationships with [ {owner.name} ] - creating new relationship [ {relationship_type} ] "
+        relationships = {}
+        for (
+            relationship_id,
+            asset_name,
+            owner_name,
+            relationship_type,
+        ) in self.db_session.execute(
+            select(Relationship.id, Asset.name, Owner.name, Relationship.type)
+            .join(Asset, Relationship.asset_id == Asset.id)
+            .join(Owner, Relationship.owner_id == Owner.id)
+            .where(Owner.id.in_([owner.id for owner in owners]), *asset_filters)
+        ):
+            relationships[(asset_name, owner_name)] = (
+                relationship_id,
+                relationship_type,
             )
-            return self.create_relationship(asset, owner, relationship_type)
 
-        relationship = relationships[0]
+        existing_asset_names = set(
+            self.db_session.scalars(select(Asset.name).where(*asset_filters))
+        )
+        return relationships, existing_asset_names
+
+    def apply_relationship_plan(
+        self,
+        plan: RelationshipPlan,
+        owners: List[Owner],
+        asset_type: str = "REPOSITORY",
+        chunk_size: int = SYNC_CHUNK_SIZE,
+    ) -> dict[str, int]:
+        if plan.is_empty():
+            return plan.get_counts()
 
-        if relationship.type == relationship_type:
-            logging.info(
-                f"No relationship change between Asset [ {asset.name} ] and Owner [ {owner.name} ] - skipping"
+        owner_ids_by_name = {owner.name: owner.id for owner in owners}
+        asset_names = sorted(
+            set(plan.assets_to_add)
+            | {asset_name for asset_name, _, _ in plan.relationships_to_insert}
+        )
+        asset_ids_by_name = {}
+        for start in range(0, len(asset_names), chunk_size):
+            asset_ids_by_name.update(
+                self.__add_assets_if_names_do_not_exist(
+                    asset_names[start : start + chunk_size], asset_type
+                )
             )
-            return relationship
 
-        logging.info(
-            f"Asset [ {asset.name} ] has one relationships with [ {owner.name} ] - updating relationship from [ {relationship.type} ] to new relationship [ {relationship_type} ] "
+        if plan.relationships_to_insert:
+            # A relationship written since the plan was made is updated in place
+            upsert = get_insert(self.db_session, Relationship)
+            self.db_session.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=[Relationship.asset_id, Relationship.owner_id],
+                    set_={"type": upsert.excluded.type},
+                ),
+                [
+                    {
+                        "asset_id": asset_ids_by_name[asset_name],
+                        "owner_id": owner_ids_by_name[owner_name],
+                        "type": relationship_type,
+                    }
+                    for asset_name, owner_name, relationship_type in plan.relationships_to_insert
+                ],
+            )
+        if plan.relationships_to_update:
+            self.db_session.execute(
+                update(Relationship),
+                [
+                    {"id": relationship_id, "type": to_type}
+                    for relationship_id, _, _, _, to_type in plan.relationships_to_update
+                ],
+            )
+        relationship_ids_to_delete = [
+            relationship_id for relationship_id, _, _, _ in plan.relationships_to_delete
+        ]
+        for start in range(0, len(relationship_ids_to_delete), chunk_size):
+            self.db_session.execute(
+                delete(Relationship).where(
+                    Relationship.id.in_(
+                        relationship_ids_to_delete[start : start + chunk_size]
+                    )
+                )
+            )
+
+        # Another owner gaining or losing admin access changes who is authoritative, so
+        # every owner of a changed asset is refreshed
+        changed_asset_names = sorted(
+            {asset_name for asset_name, _, _ in plan.relationships_to_insert}
+            | {asset_name for _, asset_name, _, _, _ in plan.relationships_to_update}
+            | {asset_name for _, asset_name, _, _ in plan.relationships_to_delete}
         )
-        relationship.type = relationship_type
+        for start in range(0, len(changed_asset_names), chunk_size):
+            self.__refresh_authoritative_ownership(
+                select(Asset.id).where(
+                    Asset.name.in_(changed_asset_names[start : start + chunk_size])
+                )
+            )
+        for start in range(0, len(plan.assets_to_delete), chunk_size):
+            self.__delete_assets(
+                select(Asset.id).where(
+                    Asset.name.in_(plan.assets_to_delete[start : start + chunk_size]),
+                    Asset.type == asset_type,
+                )
+            )
         self.db_session.commit()
 
-        return relationship
+        return plan.get_counts()
+
+    def refresh_authoritative_ownership(self):
+        """Rebuilds the authoritative ownership of every asset from its relationships."""
+        self.__refresh_authoritative_ownership()
+        self.db_session.commit()
+
+    def __refresh_authoritative_ownership(self, asset_ids=None):
+        other_relationship = aliased(Relationship)
+        has_admin = Relationship.type.contains("ADMIN_ACCESS", autoescape=True)
+        any_owner_has_admin = exists().where(
+            other_relationship.asset_id == Relationship.asset_id,
+            other_relationship.type.contains("ADMIN_ACCESS", autoescape=True),
+        )
+        ownership = select(
+            Relationship.asset_id,
+            Relationship.owner_id,
+            Owner.name,
+            has_admin,
+            or_(has_admin, ~any_owner_has_admin),
+        ).join(Owner, Relationship.owner_id == Owner.id)
+        stale_ownership = delete(AuthoritativeOwnership)
+        if asset_ids is not None:
+            ownership = ownership.where(Relationship.asset_id.in_(asset_ids))
+            stale_ownership = stale_ownership.where(
+                AuthoritativeOwnership.asset_id.in_(asset_ids)
+            )
+
+        self.db_session.execute(stale_ownership)
+        self.db_session.execute(
+            insert(AuthoritativeOwnership).from_select(
+                [
+                    AuthoritativeOwnership.asset_id,
+                    AuthoritativeOwnership.owner_id,
+                    AuthoritativeOwnership.owner_name,
+                    AuthoritativeOwnership.has_admin,
+                    AuthoritativeOwnership.is_authoritative,
+                ],
+                ownership,
+            )
+        )
+
+    def __delete_assets(self, asset_ids):
+        for entity in [AuthoritativeOwnership, Relationship]:
+            self.db_session.execute(
+                delete(entity).where(entity.asset_id.in_(asset_ids))
+            )
+        self.db_session.execute(delete(Asset).where(Asset.id.in_(asset_ids)))
+
+    def __add_assets_if_names_do_not_exist(
+        self, names: List[str], asset_type: str
+    ) -> dict[str, int]:
+        # Assets are unique by name, so an asset added by another process is kept
+        self.db_session.execute(
+            get_insert(self.db_session, Asset).on_conflict_do_nothing(
+                index_elements=[Asset.name]
+            ),
+            [{"name": name, "type": asset_type} for name in names],
+        )
+        return {
+            name: asset_id
+            for asset_id, name in self.db_session.execute(
+                select(Asset.id, Asset.name).where(Asset.name.in_(names))
+            )
+        }
 
 
 def get_asset_repository() -> AssetRepository:
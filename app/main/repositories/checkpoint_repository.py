@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import List, Set
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import scoped_session
+
+from app.main.models import CrawlCheckpoint, db
+from app.main.repositories.sync_state_repository import as_utc
+
+
+class CheckpointRepository:
+    def __init__(self, db_session: scoped_session = db.session):
+        self.db_session = db_session
+
+    def find_all_names(self) -> Set[str]:
+        return set(self.db_session.scalars(select(CrawlCheckpoint.name)))
+
+    def get_status(self) -> dict:
+        count, oldest, newest = self.db_session.execute(
+            select(
+                func.count(CrawlCheckpoint.id),
+                func.min(CrawlCheckpoint.checkpointed_at),
+                func.max(CrawlCheckpoint.checkpointed_at),
+            )
+        ).one()
+        return {
+            "repositories": count,
+            "oldest_checkpoint_at": as_utc(oldest),
+            "newest_checkpoint_at": as_utc(newest),
+        }
+
+    def save(self, repositories: List[dict], checkpointed_at: datetime):
+        names = [repository["name"] for repository in repositories]
+        self.db_session.execute(
+            delete(CrawlCheckpoint).where(CrawlCheckpoint.name.in_(names))
+        )
+        self.db_session.execute(
+            insert(CrawlCheckpoint),
+            [
+                {
+                    "name": repository["name"],
+                    "teams_with_access": repository,
+                    "checkpointed_at": checkpointed_at,
+                }
+                for repository in repositories
+            ],
+        )
+        self.db_session.commit()
+
+    def reset(self):
+        self.db_session.execute(delete(CrawlCheckpoint))
+        self.db_session.commit()
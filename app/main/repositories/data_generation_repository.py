@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+
+from app.main.models import DataGeneration, db
+from app.main.repositories.upsert import get_insert
+
+OWNERSHIP_GENERATION_NAME = "ownership"
+
+
+class DataGenerationRepository:
+    def __init__(self, db_session: scoped_session = db.session):
+        self.db_session = db_session
+
+    def find_generation(self, name: str) -> int:
+        generation = self.db_session.scalar(
+            select(DataGeneration.generation).where(DataGeneration.name == name)
+        )
+        return generation or 0
+
+    def bump(self, name: str) -> int:
+        now = datetime.now(timezone.utc)
+        upsert = get_insert(self.db_session, DataGeneration).values(
+            name=name, generation=1, updated_at=now
+        )
+        generation = self.db_session.scalar(
+            upsert.on_conflict_do_update(
+                index_elements=[DataGeneration.name],
+                set_={
+                    "generation": DataGeneration.generation + 1,
+                    "updated_at": now,
+                },
+            ).returning(DataGeneration.generation)
+        )
+        self.db_session.commit()
+        return generation
@@ -1,4 +1,5 @@
 from app.main.models import db, Owner
+from app.main.repositories.upsert import get_insert
 from flask import g
 from sqlalchemy.orm import scoped_session
 from typing import List
@@ -35,11 +36,13 @@ class OwnerRepository:
         return [owner.name for owner in owners]
 
     def add_owner(self, owner_name: str) -> Owner:
-        owner = Owner()
-        owner.name = owner_name
-        self.db_session.add(owner)
+        self.db_session.execute(
+            get_insert(self.db_session, Owner)
+            .values(name=owner_name)
+            .on_conflict_do_nothing(index_elements=[Owner.name])
+        )
         self.db_session.commit()
-        return owner
+        return self.find_by_name(owner_name)[0]
 
 
 def get_owner_repository() -> OwnerRepository:
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from typing import List, Set
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import scoped_session
+
+from app.main.models import RepositorySyncState, SyncCursor, db
+
+
+def as_utc(value: datetime | None) -> datetime | None:
+    # SQLite drops the timezone of stored datetimes, Postgres keeps it
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SyncStateRepository:
+    def __init__(self, db_session: scoped_session = db.session):
+        self.db_session = db_session
+
+    def find_cursor(self, name: str) -> SyncCursor | None:
+        cursor = (
+            self.db_session.query(SyncCursor).filter(SyncCursor.name == name).first()
+        )
+        if cursor is not None:
+            cursor.last_successful_run_at = as_utc(cursor.last_successful_run_at)
+            cursor.last_full_sync_at = as_utc(cursor.last_full_sync_at)
+        return cursor
+
+    def save_cursor(self, name: str, run_started_at: datetime, full_sync: bool):
+        cursor = (
+            self.db_session.query(SyncCursor).filter(SyncCursor.name == name).first()
+        )
+        if cursor is None:
+            cursor = SyncCursor()
+            cursor.name = name
+            self.db_session.add(cursor)
+        cursor.last_successful_run_at = run_started_at
+        if full_sync:
+            cursor.last_full_sync_at = run_started_at
+        self.db_session.commit()
+
+    def find_all_repository_states(self) -> dict[str, dict]:
+        return {
+            name: {**teams_with_access, "team_grants_fingerprint": fingerprint}
+            for name, fingerprint, teams_with_access in self.db_session.execute(
+                select(
+                    RepositorySyncState.name,
+                    RepositorySyncState.team_grants_fingerprint,
+                    RepositorySyncState.teams_with_access,
+                )
+            )
+        }
+
+    def save_repository_states(self, repositories: List[dict], synced_at: datetime):
+        names = [repository["name"] for repository in repositories]
+        existing_ids_by_name = {
+            name: id
+            for id, name in self.db_session.execute(
+                select(RepositorySyncState.id, RepositorySyncState.name).where(
+                    RepositorySyncState.name.in_(names)
+                )
+            )
+        }
+        states_to_insert = []
+        states_to_update = []
+        for repository in repositories:
+            if "team_grants_fingerprint" not in repository:
+                continue
+            state = {
+                "name": repository["name"],
+                "team_grants_fingerprint": repository["team_grants_fingerprint"],
+                "teams_with_access": {
+                    key: value
+                    for key, value in repository.items()
+                    if key != "team_grants_fingerprint"
+                },
+                "synced_at": synced_at,
+            }
+            if repository["name"] in existing_ids_by_name:
+                state["id"] = existing_ids_by_name[repository["name"]]
+                states_to_update.append(state)
+            else:
+                states_to_insert.append(state)
+
+        if states_to_insert:
+            self.db_session.execute(insert(RepositorySyncState), states_to_insert)
+        if states_to_update:
+            self.db_session.execute(update(RepositorySyncState), states_to_update)
+        self.db_session.commit()
+
+    def delete_repository_states_except(self, names_to_keep: Set[str]):
+        ids_to_delete = [
+            id
+            for id, name in self.db_session.execute(
+                select(RepositorySyncState.id, RepositorySyncState.name)
+            )
+            if name not in names_to_keep
+        ]
+        if ids_to_delete:
+            self.db_session.execute(
+                delete(RepositorySyncState).where(
+                    RepositorySyncState.id.in_(ids_to_delete)
+                )
+            )
+        self.db_session.commit()
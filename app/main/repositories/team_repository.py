@@ -0,0 +1,203 @@
+from typing import List, Set
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import scoped_session
+
+from app.main.models import (
+    GithubTeam,
+    GithubTeamAncestor,
+    GithubTeamRepositoryGrant,
+    db,
+)
+from app.main.repositories.upsert import get_insert
+
+
+def get_qualified_team_name(asset_name: str, team_name: str) -> str:
+    """
+    Qualifies a team name the way the asset name of a repository of its organisation is, so
+    teams of the same name in two organisations are stored apart. Repository names cannot
+    contain a slash, so only qualified asset names have one.
+    """
+    if "/" in asset_name:
+        return f"{asset_name.split('/', 1)[0]}/{team_name}"
+    return team_name
+
+
+def get_team_grants(repository: dict) -> dict[str, bool]:
+    """Returns whether each team with access to the repository has admin access."""
+    admin_teams = set(repository["github_teams_with_admin_access"])
+    return {
+        get_qualified_team_name(repository["name"], team_name): team_name in admin_teams
+        for team_name in repository["github_teams_with_any_access"]
+        + repository["github_teams_with_admin_access"]
+    }
+
+
+def get_team_ancestors(team_parents: dict[str, str | None]) -> list[dict]:
+    ancestors = []
+    for team_name in team_parents:
+        ancestor_name = team_name
+        depth = 0
+        seen = set()
+        # A cycle is not possible on GitHub, but stop rather than loop if one is stored
+        while ancestor_name and ancestor_name not in seen:
+            seen.add(ancestor_name)
+            ancestors.append(
+                {
+                    "ancestor_name": ancestor_name,
+                    "descendant_name": team_name,
+                    "depth": depth,
+                }
+            )
+            ancestor_name = team_parents.get(ancestor_name)
+            depth += 1
+    return ancestors
+
+
+class TeamRepository:
+    """
+    Stores GitHub teams, the access each team is granted to repositories and the closure of the
+    team hierarchy, so questions about a team and every team below it are a single join rather
+    than a walk up each team's parents.
+    """
+
+    def __init__(self, db_session: scoped_session = db.session):
+        self.db_session = db_session
+
+    def save_teams(self, team_parents: dict[str, str | None]):
+        """
+        Adds or updates teams by qualified name with their parent, keeping teams not given.
+        Teams are upserted, so a team added by another process meanwhile is updated.
+        """
+        if team_parents:
+            upsert = get_insert(self.db_session, GithubTeam)
+            self.db_session.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=[GithubTeam.name],
+                    set_={"parent_name": upsert.excluded.parent_name},
+                ),
+                [
+                    {"name": name, "parent_name": parent_name}
+                    for name, parent_name in team_parents.items()
+                ],
+            )
+        self.__rebuild_team_ancestors()
+        self.db_session.commit()
+
+    def delete_teams_without_grants(self):
+        """Deletes teams that neither have access to a repository nor are above a team that does."""
+        granted_team_names = select(GithubTeamRepositoryGrant.team_name)
+        team_names_to_keep = select(GithubTeamAncestor.ancestor_name).where(
+            GithubTeamAncestor.descendant_name.in_(granted_team_names)
+        )
+        self.db_session.execute(
+            delete(GithubTeam).where(GithubTeam.name.not_in(team_names_to_keep))
+        )
+        self.__rebuild_team_ancestors()
+        self.db_session.commit()
+
+    def __rebuild_team_ancestors(self):
+        team_parents = {
+            name: parent_name
+            for name, parent_name in self.db_session.execute(
+                select(GithubTeam.name, GithubTeam.parent_name)
+            )
+        }
+        self.db_session.execute(delete(GithubTeamAncestor))
+        ancestors = get_team_ancestors(team_parents)
+        if ancestors:
+            self.db_session.execute(insert(GithubTeamAncestor), ancestors)
+
+    def save_repository_grants(self, repositories: List[dict]):
+        """Replaces the team grants of each repository with the teams it is fetched with."""
+        names = [repository["name"] for repository in repositories]
+        self.db_session.execute(
+            delete(GithubTeamRepositoryGrant).where(
+                GithubTeamRepositoryGrant.repository_name.in_(names)
+            )
+        )
+        grants = [
+            {
+                "team_name": team_name,
+                "repository_name": repository["name"],
+                "has_admin": has_admin,
+            }
+            for repository in repositories
+            for team_name, has_admin in get_team_grants(repository).items()
+        ]
+        if grants:
+            self.db_session.execute(insert(GithubTeamRepositoryGrant), grants)
+        self.db_session.commit()
+
+    def delete_repository_grants(self, repository_names: List[str]):
+        self.db_session.execute(
+            delete(GithubTeamRepositoryGrant).where(
+                GithubTeamRepositoryGrant.repository_name.in_(repository_names)
+            )
+        )
+        self.db_session.commit()
+
+    def delete_repository_grants_except(self, repository_names_to_keep: Set[str]):
+        repository_names_to_delete = [
+            name
+            for name in self.db_session.scalars(
+                select(GithubTeamRepositoryGrant.repository_name).distinct()
+            )
+            if name not in repository_names_to_keep
+        ]
+        if repository_names_to_delete:
+            self.db_session.execute(
+                delete(GithubTeamRepositoryGrant).where(
+                    GithubTeamRepositoryGrant.repository_name.in_(
+                        repository_names_to_delete
+                    )
+                )
+            )
+        self.db_session.commit()
+
+    def find_ancestor_names(self, team_name: str) -> List[str]:
+        """Returns the names of the team's parent, its parent's parent and so on, nearest first."""
+        return list(
+            self.db_session.scalars(
+                select(GithubTeamAncestor.ancestor_name)
+                .where(
+                    GithubTeamAncestor.descendant_name == team_name,
+                    GithubTeamAncestor.depth > 0,
+                )
+                .order_by(GithubTeamAncestor.depth)
+            )
+        )
+
+    def find_descendant_names(self, team_name: str) -> List[str]:
+        return list(
+            self.db_session.scalars(
+                select(GithubTeamAncestor.descendant_name)
+                .where(
+                    GithubTeamAncestor.ancestor_name == team_name,
+                    GithubTeamAncestor.depth > 0,
+                )
+                .order_by(GithubTeamAncestor.depth, GithubTeamAncestor.descendant_name)
+            )
+        )
+
+    def find_repository_names_with_access_by_team_or_descendants(
+        self, team_name: str, admin_only: bool = False
+    ) -> List[str]:
+        """
+        Returns the repositories that the team or any team below it has access to, or admin
+        access to when admin_only is set.
+        """
+        query = (
+            select(GithubTeamRepositoryGrant.repository_name)
+            .join(
+                GithubTeamAncestor,
+                GithubTeamAncestor.descendant_name
+                == GithubTeamRepositoryGrant.team_name,
+            )
+            .where(GithubTeamAncestor.ancestor_name == team_name)
+            .distinct()
+            .order_by(GithubTeamRepositoryGrant.repository_name)
+        )
+        if admin_only:
+            query = query.where(GithubTeamRepositoryGrant.has_admin.is_(True))
+        return list(self.db_session.scalars(query))
@@ -0,0 +1,13 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import scoped_session
+
+
+def get_insert(db_session: scoped_session, entity):
+    """
+    Returns an INSERT of the session's database, which supports ON CONFLICT upserts against
+    the unique indexes of the schema. The tests run against sqlite and the app against
+    Postgres.
+    """
+    if db_session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(entity)
+    return sqlite.insert(entity)
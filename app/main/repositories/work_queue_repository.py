@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from typing import List, Set
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import scoped_session
+
+from app.main.models import CrawlWorkItem, db
+
+PENDING = "PENDING"
+CLAIMED = "CLAIMED"
+DONE = "DONE"
+FAILED = "FAILED"
+
+
+class WorkQueueRepository:
+    """
+    A queue of repositories to crawl shared by several worker processes through the database.
+
+    Workers claim batches with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never
+    wait on or claim each other's rows. A claim holds a lease; once the lease expires, the
+    items are claimable again so work held by a crashed worker is picked up by another.
+
+    Each claim counts as an attempt. An item whose lease expires after its last attempt is
+    failed rather than claimed again, so an item that crashes every worker stops being retried.
+    """
+
+    def __init__(self, db_session: scoped_session = db.session):
+        self.db_session = db_session
+
+    def enqueue(self, names: List[str]):
+        self.db_session.execute(delete(CrawlWorkItem))
+        if names:
+            self.db_session.execute(
+                insert(CrawlWorkItem),
+                [{"name": name, "status": PENDING, "attempts": 0} for name in names],
+            )
+        self.db_session.commit()
+
+    def claim_batch(
+        self,
+        worker_id: str,
+        batch_size: int,
+        lease_duration: timedelta,
+        now: datetime,
+        max_attempts: int = 3,
+    ) -> List[str]:
+        self.fail_items_out_of_attempts(max_attempts, now)
+        claimed = self.db_session.execute(
+            select(CrawlWorkItem.id, CrawlWorkItem.name)
+            .where(
+                or_(
+                    CrawlWorkItem.status == PENDING,
+                    (CrawlWorkItem.status == CLAIMED)
+                    & (CrawlWorkItem.lease_expires_at < now),
+                )
+            )
+            .order_by(CrawlWorkItem.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if claimed:
+            self.db_session.execute(
+                update(CrawlWorkItem)
+                .where(CrawlWorkItem.id.in_([id for id, _ in claimed]))
+                .values(
+                    status=CLAIMED,
+                    claimed_by=worker_id,
+                    lease_expires_at=now + lease_duration,
+                    attempts=CrawlWorkItem.attempts + 1,
+                )
+            )
+        self.db_session.commit()
+        return [name for _, name in claimed]
+
+    def fail_items_out_of_attempts(self, max_attempts: int, now: datetime) -> int:
+        failed = self.db_session.execute(
+            update(CrawlWorkItem)
+            .where(
+                (CrawlWorkItem.status == CLAIMED)
+                & (CrawlWorkItem.lease_expires_at < now)
+                & (CrawlWorkItem.attempts >= max_attempts)
+            )
+            .values(status=FAILED, lease_expires_at=None)
+        ).rowcount
+        self.db_session.commit()
+        return failed
+
+    def renew_leases(
+        self,
+        worker_id: str,
+        names: List[str],
+        lease_duration: timedelta,
+        now: datetime,
+    ) -> int:
+        """Extends the leases still held by the worker and returns how many it holds."""
+        renewed = self.db_session.execute(
+            update(CrawlWorkItem)
+            .where(self.__is_held_by(worker_id, names))
+            .values(lease_expires_at=now + lease_duration)
+        ).rowcount
+        self.db_session.commit()
+        return renewed
+
+    def complete(self, worker_id: str, names: List[str]) -> int:
+        """
+        Marks the items still leased to the worker as done and returns how many were. Items
+        whose lease expired and were claimed by another worker are left to that worker.
+        """
+        completed = self.db_session.execute(
+            update(CrawlWorkItem)
+            .where(self.__is_held_by(worker_id, names))
+            .values(status=DONE, lease_expires_at=None)
+        ).rowcount
+        self.db_session.commit()
+        return completed
+
+    def get_status(self) -> dict[str, int]:
+        counts = {PENDING: 0, CLAIMED: 0, DONE: 0, FAILED: 0}
+        for status, count in self.db_session.execute(
+            select(CrawlWorkItem.status, func.count(CrawlWorkItem.id)).group_by(
+                CrawlWorkItem.status
+            )
+        ):
+            counts[status] = count
+        return counts
+
+    def find_names(self, status: str) -> Set[str]:
+        return set(
+            self.db_session.scalars(
+                select(CrawlWorkItem.name).where(CrawlWorkItem.status == status)
+            )
+        )
+
+    def __is_held_by(self, worker_id: str, names: List[str]):
+        return (
+            CrawlWorkItem.name.in_(names)
+            & (CrawlWorkItem.status == CLAIMED)
+            & (CrawlWorkItem.claimed_by == worker_id)
+        )
+
+    def reset(self):
+        self.db_session.execute(delete(CrawlWorkItem))
+        self.db_session.commit()
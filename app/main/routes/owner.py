@@ -1,7 +1,7 @@
 import logging
 
 import requests
-from flask import Blueprint, abort, render_template, request
+from flask import Blueprint, abort, render_template, request, url_for
 
 from app.main.middleware.auth import requires_auth
 from app.main.repositories.asset_repository import AssetView
@@ -15,6 +15,10 @@ logger = logging.getLogger(__name__)
 
 owner_route = Blueprint("owner_route", __name__)
 
+ACCESS_LEVELS = ["ADMIN", "OTHER"]
+
+REPOSITORY_PAGE_SIZE = 50
+
 
 def filter_by_compliance_status(
     compliance_status: str,
@@ -45,58 +49,52 @@ def get_repositories_compliance_map(repositories: list[AssetView]):
 def index():
     repository_name = request.args.get("repository-name")
     selected_owner = request.args.get("owner") or "NO_OWNER"
-    selected_access_levels = request.args.getlist("access-levels")
+    selected_access_levels = request.args.getlist("access-levels") or ACCESS_LEVELS
     authoritative_owners_only = bool(request.args.get("authorative_owners_only"))
+    after = request.args.get("after")
 
     owner_repository = get_owner_repository()
     asset_service = get_asset_service()
 
     owners = owner_repository.find_all_names()
 
-    filtered_repositories = []
-    if "NO_OWNER" == selected_owner:
-        filtered_repositories = [
-            repository
-            for repository in asset_service.get_all_repositories()
-            if not repository.owner_names
-        ]
-    else:
-        for repository in asset_service.get_all_repositories():
-            if (
-                authoritative_owners_only
-                and asset_service.is_owner_authoritative_for_repository(
-                    repository, selected_owner
-                )
-            ):
-                filtered_repositories += [repository]
-            elif (
-                not authoritative_owners_only
-                and selected_owner in repository.owner_names
-            ):
-                filtered_repositories += [repository]
-
-    filtered_repositories_by_name = []
-    if repository_name:
-        for repository in filtered_repositories:
-            if repository_name and repository_name in repository.name:
-                filtered_repositories_by_name = filtered_repositories_by_name + [
-                    repository
-                ]
-    else:
-        filtered_repositories_by_name = filtered_repositories
-
-    repositories_filtered_by_access_level = filtered_repositories_by_name
+    page = asset_service.get_repository_page(
+        None if "NO_OWNER" == selected_owner else selected_owner,
+        selected_access_levels,
+        authoritative_owners_only,
+        repository_name,
+        after,
+        REPOSITORY_PAGE_SIZE,
+    )
+
+    next_page_url = None
+    if page.next_after is not None:
+        next_page_url = url_for(
+            "owner_route.index",
+            **{**request.args.to_dict(flat=False), "after": page.next_after},
+        )
+    first_page_url = None
+    if after is not None:
+        first_page_url = url_for(
+            "owner_route.index",
+            **{
+                key: values
+                for key, values in request.args.to_dict(flat=False).items()
+                if key != "after"
+            },
+        )
 
     return render_template(
         "pages/owner.html",
-        repositories=repositories_filtered_by_access_level,
+        repositories=page.assets,
+        repository_count=page.total,
+        next_page_url=next_page_url,
+        first_page_url=first_page_url,
         repository_name=repository_name if repository_name else "",
         selected_owners=selected_owner,
         owners=owners,
-        access_levels=["ADMIN", "OTHER"],
-        selected_access_levels=selected_access_levels
-        if selected_access_levels
-        else ["ADMIN", "OTHER"],
+        access_levels=ACCESS_LEVELS,
+        selected_access_levels=selected_access_levels,
         exclude_other_relationships_where_admins_exist=authoritative_owners_only,
     )
 
@@ -0,0 +1,69 @@
+import logging
+import threading
+
+from flask import Blueprint, abort, current_app, request
+
+from app.main.config.app_config import app_config
+from app.main.repositories.team_repository import TeamRepository
+from app.main.services.github_webhook_service import (
+    GithubWebhookService,
+    is_valid_signature,
+)
+from app.main.services.repository_update_queue import RepositoryUpdateQueue
+
+logger = logging.getLogger(__name__)
+
+webhook_route = Blueprint("webhook_route", __name__)
+
+queue_lock = threading.Lock()
+
+
+def get_repository_update_queue() -> RepositoryUpdateQueue:
+    # One queue per app, so its background thread outlives the request that started it
+    with queue_lock:
+        if "repository_update_queue" not in current_app.extensions:
+            # The job module imports the app, so import it once the app exists
+            from app.jobs.map_github_repositories_to_owners import (
+                create_github_services_by_organisation,
+                update_repositories,
+            )
+
+            app = current_app._get_current_object()
+            github_services = {}
+
+            def apply_updates(updates: dict[str, str]):
+                with app.app_context():
+                    # The queue applies one batch at a time, so its services are created by
+                    # the first batch and reused by the rest
+                    if not github_services:
+                        github_services.update(create_github_services_by_organisation())
+                    update_repositories(updates, github_services=github_services)
+
+            current_app.extensions["repository_update_queue"] = RepositoryUpdateQueue(
+                apply_updates, app_config.webhook.delay_seconds
+            )
+        return current_app.extensions["repository_update_queue"]
+
+
+@webhook_route.route("/github", methods=["POST"])
+def github():
+    if not is_valid_signature(
+        app_config.webhook.secret,
+        request.get_data(),
+        request.headers.get("X-Hub-Signature-256"),
+    ):
+        logger.warning("Rejected GitHub webhook delivery with an invalid signature")
+        abort(403)
+
+    event = request.headers.get("X-GitHub-Event", "")
+    delivery = request.headers.get("X-GitHub-Delivery")
+    updates = GithubWebhookService(
+        app_config.github.organisations,
+        app_config.github.repository_visibilities,
+        TeamRepository(),
+    ).get_repository_updates(event, request.get_json(silent=True) or {})
+    get_repository_update_queue().add(updates)
+    logger.info(
+        f"GitHub webhook delivery [ {delivery} ] of [ {event} ] event queued [ {len(updates)} ] repository updates"
+    )
+    return {"repositories": sorted(updates)}, 202
@@ -1,61 +1,97 @@
 import logging
 from app.main.models import Asset, Owner
 from app.main.repositories.asset_repository import (
+    AssetPage,
     AssetRepository,
     get_asset_repository,
     AssetView,
+    RelationshipPlan,
 )
-from flask import g
+from app.main.config.app_config import app_config
+from app.main.repositories.data_generation_repository import (
+    OWNERSHIP_GENERATION_NAME,
+    DataGenerationRepository,
+)
+from app.main.services.ownership_index import (
+    OwnershipIndex,
+    OwnershipIndexCache,
+    is_owner_authoritative_for_repository,
+)
+from flask import current_app, g
 from typing import List
 
 
 class AssetService:
-    def __init__(self, asset_repository: AssetRepository):
+    def __init__(
+        self,
+        asset_repository: AssetRepository,
+        ownership_index_cache: OwnershipIndexCache | None = None,
+    ):
         self.__asset_repository = asset_repository
+        self.__ownership_index_cache = ownership_index_cache
+
+    def get_ownership_index(self) -> OwnershipIndex:
+        if self.__ownership_index_cache is None:
+            return OwnershipIndex(self.__asset_repository.find_all())
+        return self.__ownership_index_cache.get()
 
     def get_all_repositories(self) -> List[AssetView]:
-        repositories = self.__asset_repository.find_all()
-        return repositories
+        return self.get_ownership_index().repositories
+
+    def get_repository_page(
+        self,
+        owner_to_filter_by: str | None,
+        access_levels: List[str],
+        authoritative_owners_only: bool = False,
+        repository_name: str | None = None,
+        after: str | None = None,
+        page_size: int = 50,
+    ) -> AssetPage:
+        """
+        Returns a page of the repositories of an owner, or without an owner when no owner is
+        given, filtered in the database. access_levels is any of ADMIN and OTHER.
+        """
+        has_admin = None
+        if access_levels == ["ADMIN"]:
+            has_admin = True
+        elif access_levels == ["OTHER"]:
+            has_admin = False
+        return self.__asset_repository.find_page(
+            owner_to_filter_by,
+            has_admin,
+            authoritative_owners_only,
+            repository_name,
+            after,
+            page_size,
+        )
 
     def get_repositories_by_authoratative_owner(
         self,
         owner_to_filter_by: str,
     ) -> List[AssetView]:
-        repositories = self.__asset_repository.find_all_by_owner(owner_to_filter_by)
-        response = [
-            repo
-            for repo in repositories
-            if self.is_owner_authoritative_for_repository(repo, owner_to_filter_by)
-        ]
-        return response
+        if self.__ownership_index_cache is None:
+            return self.__asset_repository.find_all_by_authoritative_owner(
+                owner_to_filter_by
+            )
+        return self.get_ownership_index().get_repositories_by_authoritative_owner(
+            owner_to_filter_by
+        )
 
     def get_repositories_by_authoratative_owner_filtered_by_missing_admin_access(
         self, owner_to_filter_by: str
     ) -> list[AssetView]:
-        repositories = self.get_repositories_by_authoratative_owner(owner_to_filter_by)
-
-        repositories_missing_admin_access = [
-            repository
-            for repository in repositories
-            if owner_to_filter_by not in repository.admin_owner_names
-        ]
-
-        return repositories_missing_admin_access
+        if self.__ownership_index_cache is None:
+            return self.__asset_repository.find_all_by_authoritative_owner(
+                owner_to_filter_by, missing_admin_access_only=True
+            )
+        return self.get_ownership_index().get_repositories_missing_admin_access(
+            owner_to_filter_by
+        )
 
     def is_owner_authoritative_for_repository(
         self, repository: AssetView, owner_to_filter_by: str
     ) -> bool:
-        owner_has_admin_access = bool(
-            owner_to_filter_by in repository.admin_owner_names
-        )
-        owner_has_other_access = bool(owner_to_filter_by in repository.owner_names)
-        no_repository_admins = len(repository.admin_owner_names) == 0
-
-        has_authorative_ownership = bool(
-            owner_has_admin_access or (owner_has_other_access and no_repository_admins)
-        )
-
-        return has_authorative_ownership
+        return is_owner_authoritative_for_repository(repository, owner_to_filter_by)
 
     def add_asset(self, name: str, type: str):
         asset = self.__asset_repository.add_asset(name=name, type=type)
@@ -70,6 +106,9 @@ class AssetService:
     def clean_all_tables(self):
         self.__asset_repository.clean_all_tables()
 
+    def refresh_authoritative_ownership(self):
+        self.__asset_repository.refresh_authoritative_ownership()
+
     def update_relationships_with_owner(
         self, asset: Asset, owner: Owner, relationship_type: str
     ):
@@ -77,23 +116,48 @@ class AssetService:
             asset, owner, relationship_type
         )
 
-    def add_if_name_does_not_exist(self, name: str) -> Asset:
-        assets = self.__asset_repository.find_by_name(name)
+    def delete_assets_by_name(self, names: List[str]) -> int:
+        return self.__asset_repository.delete_assets_by_name(names)
 
-        if len(assets) > 1:
-            raise ValueError(
-                f"Multiple Repositories Named [ {name} ] - Remove The Duplicates"
-            )
+    def find_repository_names(self) -> set[str]:
+        return self.__asset_repository.find_names("REPOSITORY")
+
+    def find_relationships_with_owners(
+        self, owners: List[Owner], asset_names: List[str] | None = None
+    ) -> tuple[dict[tuple[str, str], tuple[int, str]], set[str]]:
+        return self.__asset_repository.find_relationships_with_owners(
+            owners, asset_names=asset_names
+        )
 
-        if len(assets) == 1:
-            logging.debug(f"Found existing respoistory with ID [ {assets[0].id} ]")
-            return assets[0]
+    def apply_relationship_plan(
+        self, plan: RelationshipPlan, owners: List[Owner]
+    ) -> dict[str, int]:
+        return self.__asset_repository.apply_relationship_plan(plan, owners)
 
-        logging.info(f"No repository found [ {name} ] - creating a new asset...")
-        return self.__asset_repository.add_asset(name, "REPOSITORY")
+    def add_if_name_does_not_exist(self, name: str) -> Asset:
+        return self.__asset_repository.add_asset_if_name_does_not_exist(
+            name, "REPOSITORY"
+        )
+
+
+def get_ownership_index_cache() -> OwnershipIndexCache | None:
+    if not app_config.ownership_index.enabled:
+        return None
+    # One cache per app, so the index outlives the request that built it
+    if "ownership_index_cache" not in current_app.extensions:
+        current_app.extensions["ownership_index_cache"] = OwnershipIndexCache(
+            lambda: DataGenerationRepository().find_generation(
+                OWNERSHIP_GENERATION_NAME
+            ),
+            lambda: AssetRepository().find_all(),
+            app_config.ownership_index.check_interval_seconds,
+        )
+    return current_app.extensions["ownership_index_cache"]
 
 
 def get_asset_service() -> AssetService:
     if "asset_service" not in g:
-        g.asset_service = AssetService(get_asset_repository())
+        g.asset_service = AssetService(
+            get_asset_repository(), get_ownership_index_cache()
+        )
     return g.asset_service
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import re
+from typing import AsyncIterator, Awaitable, Callable
+from urllib.parse import urlencode, urlsplit
+
+import aiohttp
+from requests.structures import CaseInsensitiveDict
+
+from app.main.services.github_token_pool import (
+    GITHUB_API_URL,
+    GithubCredential,
+    GithubTokenPool,
+)
+from app.main.services.job_metrics import JobMetrics, get_endpoint_name
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_VERSION = "2022-11-28"
+TEAM_REPOSITORY_PERMISSIONS_MEDIA_TYPE = "application/vnd.github.v3.repository+json"
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+PAGE_SIZE = 100
+MAX_REDIRECTS = 5
+
+NEXT_LINK_PATTERN = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+
+class GithubRequestError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"GitHub responded with [ {status} ]: {message}")
+        self.status = status
+
+
+class GithubAsyncResponse:
+    def __init__(self, status: int, headers: CaseInsensitiveDict, body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    def get_next_url(self) -> str | None:
+        next_link = NEXT_LINK_PATTERN.search(self.headers.get("Link", ""))
+        return next_link.group(1) if next_link else None
+
+    def raise_for_status(self) -> None:
+        # Redirects are followed, so a 3xx here is one that could not be followed
+        if not 200 <= self.status < 300:
+            raise GithubRequestError(
+                self.status, (self.json() or {}).get("message", "")
+            )
+
+
+class GithubAsyncClient:
+    """
+    An asyncio client for the GitHub REST endpoints the job crawls.
+
+    Requests share a pool of kept alive connections, at most max_concurrency at once, and take
+    their credential from the token pool. Redirects, such as those GitHub responds with for a
+    renamed repository, are followed up to MAX_REDIRECTS times. Server errors and dropped connections are retried
+    with exponential backoff, and rate limited requests are retried once the token pool has
+    a credential with budget left.
+    Unlike PyGithub, no request is made implicitly, so each request is counted in the metrics.
+
+    The client must be created and used within a single event loop.
+    """
+
+    def __init__(
+        self,
+        token_pool: GithubTokenPool,
+        api_url: str = GITHUB_API_URL,
+        max_concurrency: int = 10,
+        metrics: JobMetrics | None = None,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0,
+        timeout_seconds: float = 30,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ) -> None:
+        self.token_pool = token_pool
+        self.api_url = api_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.metrics = metrics or JobMetrics()
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.sleep = sleep
+        self.__session: aiohttp.ClientSession | None = None
+        self.__team_parent_names: dict[str, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "GithubAsyncClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        for task in self.__team_parent_names.values():
+            task.cancel()
+        await asyncio.gather(*self.__team_parent_names.values(), return_exceptions=True)
+        if self.__session:
+            await self.__session.close()
+
+    def __get_session(self) -> aiohttp.ClientSession:
+        # A session belongs to the event loop it is created in, so it is created on first use
+        if self.__session is None:
+            self.__session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            )
+        return self.__session
+
+    def __get_url(self, url: str, params: dict | None) -> str:
+        parts = urlsplit(url)
+        url = url if parts.scheme else f"{self.api_url}{url}"
+        query = urlencode(params or {})
+        if not query:
+            return url
+        return f"{url}&{query}" if parts.query else f"{url}?{query}"
+
+    async def __acquire_credential(self) -> GithubCredential:
+        while True:
+            credential, wait_time = self.token_pool.try_acquire()
+            if credential:
+                return credential
+            self.token_pool.record_wait(wait_time)
+            await self.sleep(wait_time)
+
+    def __get_retry_wait(
+        self, response: GithubAsyncResponse, attempt: int
+    ) -> float | None:
+        if response.status in RETRYABLE_STATUSES:
+            return self.backoff_seconds * 2**attempt
+        if response.status in (403, 429):
+            if "Retry-After" in response.headers:
+                return float(response.headers["Retry-After"])
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                # The token pool has seen the budget is used up, and holds the credential back
+                # until its rate limit resets
+                return 0.0
+        return None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: dict | None = None,
+        accept: str = "application/vnd.github+json",
+    ) -> GithubAsyncResponse:
+        url = self.__get_url(url, params)
+        endpoint = get_endpoint_name(method, urlsplit(url).path)
+        attempt = 0
+        while True:
+            credential = await self.__acquire_credential()
+            self.metrics.record_api_call("rest", endpoint)
+            # Minting an app installation token blocks, but only once an hour per installation
+            headers = {
+                "Accept": accept,
+                "Authorization": f"token {credential.get_token()}",
+                "User-Agent": "operations-engineering-ownership",
+                "X-GitHub-Api-Version": GITHUB_API_VERSION,
+            }
+            try:
+                response = await self.__send(method, url, headers)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                if attempt >= self.max_retries:
+                    raise
+                wait_time = self.backoff_seconds * 2**attempt
+                logger.warning(
+                    f"GitHub request [ {endpoint} ] failed with [ {error!r} ], retrying in [ {wait_time:.1f} ] seconds"
+                )
+            else:
+                self.token_pool.observe_headers(credential, response.headers)
+                wait_time = self.__get_retry_wait(response, attempt)
+                if wait_time is None or attempt >= self.max_retries:
+                    return response
+                logger.warning(
+                    f"GitHub request [ {endpoint} ] responded with [ {response.status} ], retrying in [ {wait_time:.1f} ] seconds"
+                )
+            attempt += 1
+            if wait_time:
+                await self.sleep(wait_time)
+
+    async def __send(
+        self, method: str, url: str, headers: dict[str, str]
+    ) -> GithubAsyncResponse:
+        try:
+            async with self.__get_session().request(
+                method, url, headers=headers, max_redirects=MAX_REDIRECTS
+            ) as response:
+                return GithubAsyncResponse(
+                    response.status,
+                    CaseInsensitiveDict(response.headers),
+                    await response.read(),
+                )
+        except aiohttp.TooManyRedirects as error:
+            raise GithubRequestError(
+                error.status, f"more than [ {MAX_REDIRECTS} ] redirects"
+            ) from error
+
+    async def get_json(self, url: str, params: dict | None = None, **kwargs):
+        """Returns the decoded response, or None when GitHub responds not found."""
+        response = await self.request("GET", url, params, **kwargs)
+        if response.status == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def iter_pages(
+        self, url: str, params: dict | None = None
+    ) -> AsyncIterator[list]:
+        next_url, next_params = url, {**(params or {}), "per_page": PAGE_SIZE}
+        while next_url:
+            response = await self.request("GET", next_url, next_params)
+            response.raise_for_status()
+            yield response.json()
+            # The next link carries every parameter of the original request
+            next_url, next_params = response.get_next_url(), None
+
+    async def get_all_pages(self, url: str, params: dict | None = None) -> list:
+        items = []
+        async for page in self.iter_pages(url, params):
+            items.extend(page)
+        return items
+
+    def iter_organisation_repositories(
+        self, organisation_name: str, repository_type: str = "public"
+    ) -> AsyncIterator[list[dict]]:
+        return self.iter_pages(
+            f"/orgs/{organisation_name}/repos", {"type": repository_type}
+        )
+
+    async def get_repository_teams(self, repository_full_name: str) -> list[dict]:
+        return await self.get_all_pages(f"/repos/{repository_full_name}/teams")
+
+    async def get_team_repository_permissions(
+        self, team: dict, repository_full_name: str
+    ) -> dict | None:
+        repository = await self.get_json(
+            f"{team['url']}/repos/{repository_full_name}",
+            accept=TEAM_REPOSITORY_PERMISSIONS_MEDIA_TYPE,
+        )
+        return repository["permissions"] if repository else None
+
+    async def get_team(self, team_url: str) -> dict:
+        return await self.get_json(team_url)
+
+    async def get_team_parent_names(self, team: dict) -> list[str]:
+        """
+        Returns the names of a team's parent, its parent's parent and so on. Each team is only
+        requested once however many repositories and concurrent lookups share it.
+        """
+        if team["url"] in self.__team_parent_names:
+            self.metrics.record_team_parent_cache(hit=True)
+        else:
+            self.metrics.record_team_parent_cache(hit=False)
+            self.__team_parent_names[team["url"]] = asyncio.create_task(
+                self.__get_team_parent_names(team)
+            )
+        return await asyncio.shield(self.__team_parent_names[team["url"]])
+
+    async def __get_team_parent_names(self, team: dict) -> list[str]:
+        parent = team.get("parent")
+        if not parent:
+            return []
+        if parent["url"] not in self.__team_parent_names:
+            self.__team_parent_names[parent["url"]] = asyncio.create_task(
+                self.__get_parent_team_parent_names(parent["url"])
+            )
+        return [parent["name"]] + await self.__team_parent_names[parent["url"]]
+
+    async def __get_parent_team_parent_names(self, team_url: str) -> list[str]:
+        # A team listed as a parent only has a summary, so fetch it to find its own parent
+        with self.metrics.phase("resolve_parents"):
+            team = await self.get_team(team_url)
+        return await self.__get_team_parent_names(team)
@@ -0,0 +1,198 @@
+import logging
+from typing import List
+
+import requests
+
+from app.main.services.github_service import (
+    DEFAULT_ORGANISATION_NAME,
+    build_repositories_from_team_permissions,
+)
+from app.main.services.job_metrics import JobMetrics
+
+logger = logging.getLogger(__name__)
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# GraphQL permission names mapped to the REST names used by the rest of the job
+REPOSITORY_PERMISSIONS = {
+    "ADMIN": "admin",
+    "MAINTAIN": "maintain",
+    "WRITE": "push",
+    "TRIAGE": "triage",
+    "READ": "pull",
+}
+
+REPOSITORIES_QUERY = """
+query($organisation: String!, $cursor: String) {
+  organization(login: $organisation) {
+    repositories(first: 100, after: $cursor, privacy: PUBLIC, isFork: false) {
+      pageInfo { hasNextPage endCursor }
+      nodes { name isArchived isFork }
+    }
+  }
+}
+"""
+
+TEAMS_QUERY = """
+query($organisation: String!, $cursor: String) {
+  organization(login: $organisation) {
+    teams(first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        slug
+        parentTeam { name }
+        repositories(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          edges { permission node { name } }
+        }
+      }
+    }
+  }
+}
+"""
+
+TEAM_REPOSITORIES_QUERY = """
+query($organisation: String!, $slug: String!, $cursor: String) {
+  organization(login: $organisation) {
+    team(slug: $slug) {
+      repositories(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        edges { permission node { name } }
+      }
+    }
+  }
+}
+"""
+
+
+QUERY_NAMES = {
+    REPOSITORIES_QUERY: "repositories",
+    TEAMS_QUERY: "teams",
+    TEAM_REPOSITORIES_QUERY: "team_repositories",
+}
+
+
+class GithubGraphqlService:
+    def __init__(
+        self,
+        org_token: str,
+        api_url: str = GITHUB_GRAPHQL_URL,
+        metrics: JobMetrics | None = None,
+        organisation_name: str = DEFAULT_ORGANISATION_NAME,
+    ) -> None:
+        self.organisation_name = organisation_name
+        self.api_url = api_url
+        self.metrics = metrics or JobMetrics()
+        self.team_parents: dict[str, str | None] = {}
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {org_token}"})
+
+    def __query(self, query: str, variables: dict) -> dict:
+        self.metrics.record_api_call("graphql", QUERY_NAMES[query])
+        response = self.session.post(
+            self.api_url, json={"query": query, "variables": variables}
+        )
+        response.raise_for_status()
+        response_json = response.json()
+
+        if response_json.get("errors"):
+            raise ValueError(f"GraphQL query failed: {response_json['errors']}")
+
+        return response_json["data"]
+
+    def __get_all_repository_names(self) -> list[str]:
+        repository_names = []
+        cursor = None
+
+        while True:
+            repositories = self.__query(
+                REPOSITORIES_QUERY,
+                {"organisation": self.organisation_name, "cursor": cursor},
+            )["organization"]["repositories"]
+            repository_names.extend(
+                repository["name"]
+                for repository in repositories["nodes"]
+                if not (repository["isArchived"] or repository["isFork"])
+            )
+            if not repositories["pageInfo"]["hasNextPage"]:
+                return repository_names
+            cursor = repositories["pageInfo"]["endCursor"]
+
+    def __add_team_repository_permissions(
+        self, team_repositories: dict, permissions: dict[str, str]
+    ) -> None:
+        for edge in team_repositories["edges"]:
+            permissions[edge["node"]["name"]] = REPOSITORY_PERMISSIONS.get(
+                edge["permission"], ""
+            )
+
+    def __get_remaining_team_repository_permissions(
+        self, slug: str, cursor: str, permissions: dict[str, str]
+    ) -> None:
+        while cursor:
+            team_repositories = self.__query(
+                TEAM_REPOSITORIES_QUERY,
+                {
+                    "organisation": self.organisation_name,
+                    "slug": slug,
+                    "cursor": cursor,
+                },
+            )["organization"]["team"]["repositories"]
+            self.__add_team_repository_permissions(team_repositories, permissions)
+            page_info = team_repositories["pageInfo"]
+            cursor = page_info["endCursor"] if page_info["hasNextPage"] else None
+
+    def __get_all_teams(
+        self,
+    ) -> tuple[dict[str, str | None], dict[str, dict[str, str]]]:
+        team_parents = {}
+        team_repository_permissions = {}
+        cursor = None
+
+        while True:
+            teams = self.__query(
+                TEAMS_QUERY,
+                {"organisation": self.organisation_name, "cursor": cursor},
+            )["organization"]["teams"]
+            for team in teams["nodes"]:
+                logger.info(f"Processing Team: [ {team['name']} ]")
+                parent_team = team["parentTeam"]
+                team_parents[team["name"]] = (
+                    parent_team["name"] if parent_team else None
+                )
+                permissions = {}
+                self.__add_team_repository_permissions(
+                    team["repositories"], permissions
+                )
+                page_info = team["repositories"]["pageInfo"]
+                if page_info["hasNextPage"]:
+                    self.__get_remaining_team_repository_permissions(
+                        team["slug"], page_info["endCursor"], permissions
+                    )
+                team_repository_permissions[team["name"]] = permissions
+            if not teams["pageInfo"]["hasNextPage"]:
+                return team_parents, team_repository_permissions
+            cursor = teams["pageInfo"]["endCursor"]
+
+    def get_team_parents(self) -> dict[str, str | None]:
+        return dict(self.team_parents)
+
+    def get_all_repositories(
+        self,
+        limit: int = 1000,
+        teams_to_ignore: List[str] = ["organisation-security-auditor"],
+    ) -> list[dict]:
+        repository_names = self.__get_all_repository_names()
+        logger.info(f"Total Repositories: [ {len(repository_names)} ]")
+        if len(repository_names) > limit:
+            logger.info("Limit Reached, exiting early")
+            repository_names = repository_names[:limit]
+
+        team_parents, team_repository_permissions = self.__get_all_teams()
+        logger.info(f"Total Teams: [ {len(team_parents)} ]")
+        self.team_parents.update(team_parents)
+
+        return build_repositories_from_team_permissions(
+            repository_names, team_parents, team_repository_permissions, teams_to_ignore
+        )
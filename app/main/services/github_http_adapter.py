@@ -0,0 +1,90 @@
+from importlib.metadata import version
+from urllib.parse import urlsplit
+
+from github import Github
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+from app.main.services.github_response_cache import GithubResponseCache
+from app.main.services.job_metrics import JobMetrics, get_endpoint_name
+from app.main.services.github_token_pool import GithubTokenPool
+
+
+class GithubHTTPAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        token_pool: GithubTokenPool,
+        response_cache: GithubResponseCache | None = None,
+        metrics: JobMetrics | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.token_pool = token_pool
+        self.response_cache = response_cache
+        self.metrics = metrics
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        cached_entry = None
+        if self.response_cache and request.method == "GET":
+            cached_entry = self.response_cache.get(request)
+            if cached_entry:
+                self.response_cache.add_conditional_headers(request, cached_entry)
+
+        if self.metrics:
+            self.metrics.record_api_call(
+                "rest", get_endpoint_name(request.method, urlsplit(request.url).path)
+            )
+        credential = self.token_pool.acquire()
+        request.headers["Authorization"] = f"token {credential.get_token()}"
+        response = super().send(request, **kwargs)
+        self.token_pool.observe_headers(credential, response.headers)
+
+        if self.response_cache and request.method == "GET":
+            if response.status_code == 304 and cached_entry:
+                return self.response_cache.use_cached_response(response, cached_entry)
+            self.response_cache.put(response)
+        return response
+
+
+# The adapter reaches into private attributes of PyGithub, so it is only known to work with the
+# version pinned in the Pipfile
+SUPPORTED_PYGITHUB_VERSION = "2.3.0"
+
+
+def get_private_attribute(instance: object, name: str):
+    if not hasattr(instance, name):
+        raise RuntimeError(
+            f"PyGithub [ {version('PyGithub')} ] has no [ {type(instance).__name__}.{name} ] to mount the GitHub HTTP adapter on, only PyGithub [ {SUPPORTED_PYGITHUB_VERSION} ] is supported"
+        )
+    return getattr(instance, name)
+
+
+def use_github_http_adapter(
+    github_client: Github,
+    token_pool: GithubTokenPool,
+    response_cache: GithubResponseCache | None = None,
+    metrics: JobMetrics | None = None,
+) -> Github:
+    # PyGithub does not expose the requests session it sends requests with, so wrap the
+    # connection class its requester creates and mount the adapter on each new session. The
+    # adapter sets the Authorization header of each request from the token pool.
+    requester = get_private_attribute(github_client, "_Github__requester")
+    connection_class = get_private_attribute(requester, "_Requester__connectionClass")
+
+    def create_connection(*args, **kwargs):
+        connection = connection_class(*args, **kwargs)
+        connection.session.mount(
+            f"{connection.protocol}://",
+            GithubHTTPAdapter(
+                token_pool,
+                response_cache,
+                metrics,
+                max_retries=connection.retry,
+                pool_connections=connection.pool_size,
+                pool_maxsize=connection.pool_size,
+            ),
+        )
+        return connection
+
+    requester._Requester__connectionClass = create_connection
+    return github_client
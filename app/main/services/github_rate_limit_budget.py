@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from typing import Callable, Mapping
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REMAINING_HEADER = "X-RateLimit-Remaining"
+RATE_LIMIT_LIMIT_HEADER = "X-RateLimit-Limit"
+RATE_LIMIT_RESET_HEADER = "X-RateLimit-Reset"
+
+
+class GithubRateLimitBudget:
+    """
+    Tracks the request budget GitHub reports in its rate limit headers and is shared by every
+    worker making requests with the same credentials.
+
+    Each request reserves a slot with acquire() before it is sent. Once the remaining budget
+    falls to the reserve, acquire() blocks until the rate limit resets rather than letting
+    requests fail with a RateLimitExceededException.
+    """
+
+    def __init__(
+        self,
+        reserve: int = 100,
+        wait_time_buffer: int = 5,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.reserve = reserve
+        self.wait_time_buffer = wait_time_buffer
+        self.clock = clock
+        self.sleep = sleep
+        self.remaining: int | None = None
+        self.limit: int | None = None
+        self.reset_timestamp: int | None = None
+        self.paused_until: float | None = None
+        self.requests_made = 0
+        self.seconds_spent_waiting = 0.0
+        self.started_at = clock()
+        self.__lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            wait_time = self.try_acquire()
+            if not wait_time:
+                return
+
+            logger.warning(
+                f"Rate limit budget exhausted, waiting [ {wait_time:.0f} ] seconds for reset"
+            )
+            self.sleep(wait_time)
+            with self.__lock:
+                self.seconds_spent_waiting += wait_time
+
+    def try_acquire(self) -> float:
+        """
+        Reserves a slot for a request without blocking. Returns 0 when the slot was reserved,
+        otherwise the number of seconds until the budget is available again.
+        """
+        with self.__lock:
+            now = self.clock()
+            if self.paused_until is None or now >= self.paused_until:
+                if (
+                    self.remaining is not None
+                    and self.remaining <= self.reserve
+                    and self.__seconds_until_reset() > 0
+                ):
+                    # Requests made after the reset refresh the budget from GitHub's headers
+                    self.paused_until = self.reset_timestamp + self.wait_time_buffer
+                    self.remaining = None
+                else:
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    self.requests_made += 1
+                    return 0
+            return self.paused_until - now
+
+    def observe(self, remaining: int, limit: int, reset_timestamp: int) -> None:
+        with self.__lock:
+            if (
+                self.remaining is None
+                or self.reset_timestamp is None
+                or reset_timestamp > self.reset_timestamp
+            ):
+                self.remaining = remaining
+            else:
+                # Responses from concurrent workers can arrive out of order within a window
+                self.remaining = min(self.remaining, remaining)
+            self.limit = limit
+            self.reset_timestamp = reset_timestamp
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        if (
+            RATE_LIMIT_REMAINING_HEADER in headers
+            and RATE_LIMIT_LIMIT_HEADER in headers
+            and RATE_LIMIT_RESET_HEADER in headers
+        ):
+            self.observe(
+                int(float(headers[RATE_LIMIT_REMAINING_HEADER])),
+                int(float(headers[RATE_LIMIT_LIMIT_HEADER])),
+                int(float(headers[RATE_LIMIT_RESET_HEADER])),
+            )
+
+    def requests_per_second(self) -> float:
+        elapsed = self.clock() - self.started_at
+        return self.requests_made / elapsed if elapsed > 0 else 0.0
+
+    def __seconds_until_reset(self) -> float:
+        if self.reset_timestamp is None:
+            return 0
+        return max(self.reset_timestamp - self.clock(), 0)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from requests import PreparedRequest, Response
+
+logger = logging.getLogger(__name__)
+
+# Only headers PyGithub reads from a response body it did not request fresh
+CACHED_HEADERS = ["Content-Type", "Link", "ETag", "Last-Modified"]
+
+
+class GithubResponseCache:
+    """
+    An on-disk cache of GitHub API responses keyed by URL, used to send conditional requests.
+
+    GitHub does not count 304 Not Modified responses against the rate limit, so a cached
+    ETag/Last-Modified turns an unchanged listing into a free request. Entries are evicted
+    least recently used first once the cache grows past max_size_bytes.
+    """
+
+    def __init__(self, directory: str, max_size_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.__size_bytes = sum(
+            os.path.getsize(path) for path in self.__get_entry_paths()
+        )
+
+    def __get_entry_paths(self) -> list[str]:
+        return [
+            os.path.join(self.directory, file_name)
+            for file_name in os.listdir(self.directory)
+            if file_name.endswith(".json")
+        ]
+
+    def __get_entry_path(self, request: PreparedRequest) -> str:
+        key = f"{request.url} {request.headers.get('Accept', '')}"
+        return os.path.join(
+            self.directory, f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+        )
+
+    def get(self, request: PreparedRequest) -> dict | None:
+        path = self.__get_entry_path(request)
+        try:
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def add_conditional_headers(self, request: PreparedRequest, entry: dict) -> None:
+        if entry.get("etag"):
+            request.headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            request.headers["If-Modified-Since"] = entry["last_modified"]
+
+    def use_cached_response(self, response: Response, entry: dict) -> Response:
+        with self.__lock:
+            self.hits += 1
+        try:
+            os.utime(self.__get_entry_path(response.request))
+        except OSError:
+            pass
+        response.status_code = 200
+        response.reason = "OK"
+        response._content = entry["body"].encode("utf-8")
+        response.headers.update(entry["headers"])
+        return response
+
+    def put(self, response: Response) -> None:
+        with self.__lock:
+            self.misses += 1
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        entry = json.dumps(
+            {
+                "url": response.request.url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "headers": {
+                    header: response.headers[header]
+                    for header in CACHED_HEADERS
+                    if header in response.headers
+                },
+                "body": response.content.decode("utf-8"),
+            }
+        )
+        path = self.__get_entry_path(response.request)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with self.__lock:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(entry)
+            os.replace(temporary_path, path)
+            self.__size_bytes += os.path.getsize(path) - previous_size
+            if self.__size_bytes > self.max_size_bytes:
+                self.__evict()
+
+    def __evict(self) -> None:
+        target_size_bytes = self.max_size_bytes * 0.9
+        for path in sorted(self.__get_entry_paths(), key=os.path.getmtime):
+            if self.__size_bytes <= target_size_bytes:
+                break
+            self.__size_bytes -= os.path.getsize(path)
+            os.remove(path)
+            self.evictions += 1
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def log_statistics(self) -> None:
+        logger.info(
+            f"GitHub response cache hits [ {self.hits} ] misses [ {self.misses} ] evictions [ {self.evictions} ] hit rate [ {self.hit_rate():.1%} ]"
+        )
@@ -1,17 +1,45 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
 from calendar import timegm
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
 from time import gmtime, sleep
-from typing import Callable, List
+from typing import AsyncIterator, Callable, Iterable, Iterator, List
 
 from github import (
     Github,
     RateLimitExceededException,
+    UnknownObjectException,
 )
+from github.Permissions import Permissions
 from github.Repository import Repository
 from github.Team import Team
 import logging
 
+from app.main.services.github_async_client import (
+    GithubAsyncClient,
+    GithubRequestError,
+)
+from app.main.services.github_http_adapter import use_github_http_adapter
+from app.main.services.github_response_cache import GithubResponseCache
+from app.main.services.job_metrics import JobMetrics
+from app.main.services.github_token_pool import (
+    GITHUB_API_URL,
+    GithubCredential,
+    GithubTokenCredential,
+    GithubTokenPool,
+)
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_ORGANISATION_NAME = "ministryofjustice"
+
+REPOSITORY_VISIBILITIES = ["public", "private", "internal"]
+
 
 def retries_github_rate_limit_exception_at_next_reset_once(func: Callable) -> Callable:
     def decorator(*args, **kwargs):
@@ -49,36 +77,260 @@ def retries_github_rate_limit_exception_at_next_reset_once(func: Callable) -> Ca
             )
 
             wait_time_buffer = 5
-            sleep(
+            wait_time = (
                 time_until_core_api_rate_limit_resets + wait_time_buffer
                 if time_until_core_api_rate_limit_resets
                 else 0
             )
+            sleep(wait_time)
+            args[0].record_rate_limit_retry_sleep(wait_time)
             return func(*args, **kwargs)
 
     return decorator
 
 
+def get_all_parents_team_names(
+    team_name: str,
+    team_parents: dict[str, str | None],
+    team_parent_cache: dict[str, List[str]],
+) -> list[str]:
+    if team_name in team_parent_cache:
+        return team_parent_cache[team_name]
+
+    parents = []
+    parent_name = team_parents.get(team_name)
+
+    while parent_name and parent_name not in parents:
+        parents.append(parent_name)
+        parent_name = team_parents.get(parent_name)
+
+    team_parent_cache[team_name] = parents
+    return parents
+
+
+def get_team_grants_fingerprint(teams: List[Team]) -> str:
+    return get_fingerprint_of_team_grants(
+        (team.name, team.permission, team.parent.name if team.parent else None)
+        for team in teams
+    )
+
+
+def get_fingerprint_of_team_grants(
+    team_grants: Iterable[tuple[str, str, str | None]],
+) -> str:
+    """
+    Fingerprints the name, permission and parent name of each team granted access to a
+    repository, as listed by /repos/{repo}/teams. Moving or renaming a team's parent changes the
+    fingerprint, but changes further up the hierarchy do not, as the listing only includes the
+    direct parent; those are picked up by the team webhook events instead.
+    """
+    team_grants = sorted(
+        [name, permission, parent_name] for name, permission, parent_name in team_grants
+    )
+    return hashlib.sha256(json.dumps(team_grants).encode()).hexdigest()
+
+
+def has_changed_since(changed_ats: List[datetime | None], since: datetime) -> bool:
+    for changed_at in changed_ats:
+        if changed_at is None:
+            continue
+        if changed_at.tzinfo is None:
+            changed_at = changed_at.replace(tzinfo=timezone.utc)
+        if changed_at > since:
+            return True
+    return False
+
+
+def parse_github_timestamp(timestamp: str | None) -> datetime | None:
+    return datetime.fromisoformat(timestamp) if timestamp else None
+
+
+def get_asset_name(
+    organisation_name: str, repository_name: str, primary_organisation_name: str
+) -> str:
+    """
+    Repositories of the primary organisation keep their bare names as asset names, and those of
+    any other organisation are qualified with it, e.g. "moj-analytical-services/repository".
+    """
+    if organisation_name == primary_organisation_name:
+        return repository_name
+    return f"{organisation_name}/{repository_name}"
+
+
+def get_organisation_name_of_asset(
+    asset_name: str, primary_organisation_name: str
+) -> str:
+    # Repository names cannot contain a slash, so only qualified names have one
+    if "/" in asset_name:
+        return asset_name.split("/", 1)[0]
+    return primary_organisation_name
+
+
+def get_repository_name_of_asset(asset_name: str) -> str:
+    return asset_name.rsplit("/", 1)[-1]
+
+
+def get_repository_listing_type(visibilities: List[str]) -> str:
+    # The organisation listing can be narrowed to public repositories, but internal
+    # repositories are only listed by "all", so anything else is filtered by visibility
+    return "public" if set(visibilities) == {"public"} else "all"
+
+
+def build_repositories_from_team_permissions(
+    repository_names: List[str],
+    team_parents: dict[str, str | None],
+    team_repository_permissions: dict[str, dict[str, str]],
+    teams_to_ignore: List[str],
+) -> list[dict]:
+    repositories = {
+        name: {
+            "name": name,
+            "github_teams_with_admin_access": [],
+            "github_teams_with_admin_access_parents": [],
+            "github_teams_with_any_access": [],
+            "github_teams_with_any_access_parents": [],
+        }
+        for name in repository_names
+    }
+    team_parent_cache = {}
+
+    for team_name, permissions in team_repository_permissions.items():
+        if team_name in teams_to_ignore:
+            logging.info(f"Team [ {team_name} ] specified to ignore, skipping...")
+            continue
+        team_parents_names = get_all_parents_team_names(
+            team_name, team_parents, team_parent_cache
+        )
+        for repository_name, permission in permissions.items():
+            repository = repositories.get(repository_name)
+            if repository is None or not permission:
+                continue
+            if permission == "admin":
+                repository["github_teams_with_admin_access"].append(team_name)
+                repository["github_teams_with_admin_access_parents"].extend(
+                    team_parents_names
+                )
+            repository["github_teams_with_any_access"].append(team_name)
+            repository["github_teams_with_any_access_parents"].extend(
+                team_parents_names
+            )
+
+    return list(repositories.values())
+
+
 class GithubService:
-    def __init__(self, org_token: str) -> None:
-        self.organisation_name: str = "ministryofjustice"
-        self.github_client_core_api: Github = Github(org_token)
+    def __init__(
+        self,
+        org_token: str,
+        max_workers: int = 1,
+        rate_limit_reserve: int = 100,
+        response_cache: GithubResponseCache | None = None,
+        additional_credentials: List[GithubCredential] | None = None,
+        metrics: JobMetrics | None = None,
+        api_url: str = GITHUB_API_URL,
+        use_async_client: bool = False,
+        organisation_name: str = DEFAULT_ORGANISATION_NAME,
+        primary_organisation_name: str | None = None,
+        repository_visibilities: List[str] | None = None,
+    ) -> None:
+        self.organisation_name = organisation_name
+        self.primary_organisation_name = primary_organisation_name or organisation_name
+        self.repository_visibilities = repository_visibilities or ["public"]
+        unknown_visibilities = set(self.repository_visibilities) - set(
+            REPOSITORY_VISIBILITIES
+        )
+        if unknown_visibilities:
+            raise ValueError(
+                f"Unknown repository visibilities [ {', '.join(sorted(unknown_visibilities))} ]"
+            )
+        self.org_token = org_token
+        self.api_url = api_url
+        self.use_async_client = use_async_client
+        self.max_workers = max_workers
+        self.token_pool = GithubTokenPool(
+            [GithubTokenCredential(org_token, name="org-token")]
+            + (additional_credentials or []),
+            rate_limit_reserve,
+        )
+        self.response_cache = response_cache
+        self.metrics = metrics or JobMetrics()
+        # Parent chains of every team seen, nearest parent first, shared by each crawl
+        self.team_parent_cache: dict[str, List[str]] = {}
+        self.seconds_slept_on_rate_limit_retries = 0.0
+        self.github_client_core_api: Github = self.__create_github_client()
+        self.__thread_local = threading.local()
+        self.__lock = threading.Lock()
+
+    def __create_github_client(self) -> Github:
+        return use_github_http_adapter(
+            Github(self.org_token, base_url=self.api_url),
+            self.token_pool,
+            self.response_cache,
+            self.metrics,
+        )
+
+    def record_rate_limit_retry_sleep(self, seconds: float) -> None:
+        with self.__lock:
+            self.seconds_slept_on_rate_limit_retries += seconds
+        self.__record_rate_limit_sleep()
+
+    def __record_rate_limit_sleep(self) -> None:
+        # Both waiting for the token pool and retrying after a rate limit error are reported as
+        # the organisation's running total
+        self.metrics.record_rate_limit_sleep(
+            self.organisation_name,
+            self.token_pool.seconds_spent_waiting
+            + self.seconds_slept_on_rate_limit_retries,
+        )
+
+    def get_asset_name(self, repository_name: str) -> str:
+        return get_asset_name(
+            self.organisation_name, repository_name, self.primary_organisation_name
+        )
+
+    def get_team_parents(self) -> dict[str, str | None]:
+        """Returns the parent of each team seen so far, and of each of their ancestors."""
+        team_parents = {}
+        for team_name, parent_names in list(self.team_parent_cache.items()):
+            chain = [team_name] + parent_names
+            for team, parent in zip(chain, parent_names + [None]):
+                team_parents.setdefault(team, parent)
+        return team_parents
+
+    def __is_repository_to_map(
+        self, archived: bool, fork: bool, visibility: str | None
+    ) -> bool:
+        return not (archived or fork) and visibility in self.repository_visibilities
+
+    def __get_organisation_repositories(self) -> Iterable[Repository]:
+        return self.github_client_core_api.get_organization(
+            self.organisation_name
+        ).get_repos(type=get_repository_listing_type(self.repository_visibilities))
+
+    def __get_thread_github_client(self) -> Github:
+        # PyGithub clients reuse a single connection, so each worker thread needs its own
+        if not hasattr(self.__thread_local, "github_client"):
+            self.__thread_local.github_client = self.__create_github_client()
+        return self.__thread_local.github_client
 
     @retries_github_rate_limit_exception_at_next_reset_once
     def __get_all_parents_team_names_of_team(
-        self, team: Team, team_parent_cache: dict[str, List[str]] = {}
+        self, team: Team, team_parent_cache: dict[str, List[str]]
     ) -> list[str]:
         if team.name in team_parent_cache:
             logging.info("Teams parents cache hit!")
+            self.metrics.record_team_parent_cache(hit=True)
             return team_parent_cache[team.name]
+        self.metrics.record_team_parent_cache(hit=False)
 
         parents = []
         team_to_check = team
 
-        while team_to_check and team_to_check.parent:
-            parent_name = team_to_check.parent.name
-            parents.append(parent_name)
-            team_to_check = team_to_check.parent
+        with self.metrics.phase("resolve_parents"):
+            while team_to_check and team_to_check.parent:
+                parent_name = team_to_check.parent.name
+                parents.append(parent_name)
+                team_to_check = team_to_check.parent
 
         team_parent_cache[team.name] = parents
         return parents
@@ -86,22 +338,25 @@ class GithubService:
     @retries_github_rate_limit_exception_at_next_reset_once
     def __get_teams_with_access(
         self,
-        repository: Repository,
+        repository_full_name: str,
         teams_to_ignore: List[str],
-        team: Team,
-        team_parent_cache: dict[str, List[str]] = {},
+        team_parent_cache: dict[str, List[str]],
+        teams: List[Team] | None = None,
     ) -> tuple[list[str], list[str], list[str], list[str]]:
         teams_with_admin_access = []
         teams_with_admin_access_parents = []
         teams_with_any_access = []
         teams_with_any_access_parents = []
+        if teams is None:
+            teams = self.__get_teams(repository_full_name)
 
-        for team in list(repository.get_teams()):
+        for team in teams:
             logger.info(f"Processing Team: [ {team.name} ]")
             if team.name in teams_to_ignore:
                 logging.info("Team specified to ignore, skipping...")
                 continue
-            permissions = team.get_repo_permission(repository)
+            with self.metrics.phase("resolve_teams"):
+                permissions = team.get_repo_permission(repository_full_name)
             team_parents = self.__get_all_parents_team_names_of_team(
                 team, team_parent_cache
             )
@@ -124,47 +379,570 @@ class GithubService:
             teams_with_any_access_parents,
         )
 
+    @retries_github_rate_limit_exception_at_next_reset_once
+    def __get_teams(self, repository_full_name: str) -> list[Team]:
+        with self.metrics.phase("resolve_teams"):
+            repository = self.__get_thread_github_client().get_repo(
+                repository_full_name, lazy=True
+            )
+            return list(repository.get_teams())
+
+    def __get_repository_with_teams_with_access(
+        self,
+        repository: Repository,
+        counter: int,
+        teams_to_ignore: List[str],
+        team_parent_cache: dict[str, List[str]],
+        previous_repositories: dict[str, dict] | None = None,
+        since: datetime | None = None,
+    ) -> tuple[dict, bool]:
+        started_at = time.monotonic()
+        try:
+            return self.__get_repository_with_teams_with_access_untimed(
+                repository,
+                counter,
+                teams_to_ignore,
+                team_parent_cache,
+                previous_repositories,
+                since,
+            )
+        finally:
+            self.metrics.record_repository(
+                self.get_asset_name(repository.name), time.monotonic() - started_at
+            )
+
+    def __get_repository_with_teams_with_access_untimed(
+        self,
+        repository: Repository,
+        counter: int,
+        teams_to_ignore: List[str],
+        team_parent_cache: dict[str, List[str]],
+        previous_repositories: dict[str, dict] | None,
+        since: datetime | None,
+    ) -> tuple[dict, bool]:
+        asset_name = self.get_asset_name(repository.name)
+        logger.info(f"Processing Repository: [ {asset_name} ] {counter}")
+        teams = None
+        team_grants_fingerprint = None
+        if previous_repositories is not None:
+            teams = self.__get_teams(repository.full_name)
+            team_grants_fingerprint = get_team_grants_fingerprint(teams)
+            previous_repository = previous_repositories.get(asset_name)
+            if (
+                previous_repository
+                and previous_repository["team_grants_fingerprint"]
+                == team_grants_fingerprint
+                and since is not None
+                and not has_changed_since(
+                    [repository.pushed_at, repository.updated_at], since
+                )
+            ):
+                logger.info("Repository unchanged since last sync, skipping...")
+                return previous_repository, False
+
+        (
+            teams_with_admin_access,
+            teams_with_admin_access_parents,
+            teams_with_any_access,
+            teams_with_any_access_parents,
+        ) = self.__get_teams_with_access(
+            repository.full_name, teams_to_ignore, team_parent_cache, teams
+        )
+        response = {
+            "name": asset_name,
+            "github_teams_with_admin_access": teams_with_admin_access,
+            "github_teams_with_admin_access_parents": teams_with_admin_access_parents,
+            "github_teams_with_any_access": teams_with_any_access,
+            "github_teams_with_any_access_parents": teams_with_any_access_parents,
+        }
+        if team_grants_fingerprint is not None:
+            response["team_grants_fingerprint"] = team_grants_fingerprint
+        return response, True
+
+    def iter_all_repositories(
+        self,
+        limit: int = 1000,
+        teams_to_ignore: List[str] = ["organisation-security-auditor"],
+        previous_repositories: dict[str, dict] | None = None,
+        since: datetime | None = None,
+        repository_names_to_skip: set[str] | None = None,
+    ) -> Iterator[dict]:
+        """
+        Yields repositories with their team access in listing order as they are fetched. Pages of
+        the repository listing are only requested as they are needed and at most twice as many
+        repositories as there are workers are in flight at once, so memory stays flat however
+        large the organisation is.
+
+        When previous_repositories is given, each repository's team grants are fingerprinted and
+        the previous result is reused for repositories whose grants are unchanged and that have
+        not been pushed to or updated since the given time.
+
+        Repositories named in repository_names_to_skip are not fetched or yielded. Both it and
+        previous_repositories are keyed by asset name, which is also the name of each repository
+        yielded.
+        """
+        if self.use_async_client:
+            yield from self.__iter_async(
+                self.__iter_all_repositories_async(
+                    limit,
+                    teams_to_ignore,
+                    previous_repositories,
+                    since,
+                    repository_names_to_skip or set(),
+                )
+            )
+            self.__log_statistics()
+            return
+
+        team_parent_cache = self.team_parent_cache
+        repository_names_to_skip = repository_names_to_skip or set()
+        repositories_to_check = (
+            repository
+            for repository in self.__iter_timed(
+                self.__get_organisation_repositories(), "list_repositories"
+            )
+            if self.__is_repository_to_map(
+                repository.archived, repository.fork, repository.visibility
+            )
+        )
+        if repository_names_to_skip:
+            logger.info(
+                f"Skipping [ {len(repository_names_to_skip)} ] already fetched repositories"
+            )
+
+        self.repositories_refreshed = 0
+        self.repositories_skipped = 0
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                for counter, repository in enumerate(repositories_to_check, start=1):
+                    if counter > limit:
+                        logger.info("Limit Reached, exiting early")
+                        break
+                    if self.get_asset_name(repository.name) in repository_names_to_skip:
+                        continue
+                    in_flight.append(
+                        executor.submit(
+                            self.__get_repository_with_teams_with_access,
+                            repository,
+                            counter,
+                            teams_to_ignore,
+                            team_parent_cache,
+                            previous_repositories,
+                            since,
+                        )
+                    )
+                    if len(in_flight) >= self.max_workers * 2:
+                        yield self.__count_fetched_repository(
+                            *in_flight.popleft().result()
+                        )
+                while in_flight:
+                    yield self.__count_fetched_repository(*in_flight.popleft().result())
+            finally:
+                # When the generator is closed early, repositories not yet started are
+                # dropped so the executor only waits for those already being fetched
+                for future in in_flight:
+                    future.cancel()
+
+        self.__log_statistics()
+
+    def __iter_timed(self, iterable: Iterable, phase: str) -> Iterator:
+        # Time only fetching each item, not the work the consumer does between items
+        iterator = iter(iterable)
+        while True:
+            with self.metrics.phase(phase):
+                item = next(iterator, None)
+            if item is None:
+                return
+            yield item
+
+    def __log_statistics(self):
+        logger.info(
+            f"Made [ {self.token_pool.requests_made} ] GitHub requests for [ {self.organisation_name} ] at [ {self.token_pool.requests_per_second():.2f} ] requests/second with [ {self.max_workers} ] workers"
+        )
+        self.token_pool.log_statistics()
+        self.__record_rate_limit_sleep()
+        if self.response_cache:
+            self.response_cache.log_statistics()
+
+    def __count_fetched_repository(self, repository: dict, refreshed: bool) -> dict:
+        if refreshed:
+            self.repositories_refreshed += 1
+        else:
+            self.repositories_skipped += 1
+        return repository
+
+    def __iter_async(self, repositories: AsyncIterator[dict]) -> Iterator[dict]:
+        # The event loop only runs while the caller waits for the next repository, so like
+        # the thread pool version nothing more is fetched than the caller asks for
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(anext(repositories))
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(repositories.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def __create_async_client(self) -> GithubAsyncClient:
+        return GithubAsyncClient(
+            self.token_pool, self.api_url, self.max_workers, self.metrics
+        )
+
+    async def __iter_all_repositories_async(
+        self,
+        limit: int,
+        teams_to_ignore: List[str],
+        previous_repositories: dict[str, dict] | None,
+        since: datetime | None,
+        repository_names_to_skip: set[str],
+    ) -> AsyncIterator[dict]:
+        self.repositories_refreshed = 0
+        self.repositories_skipped = 0
+        in_flight = deque()
+        counter = 0
+        async with self.__create_async_client() as client:
+            pages = client.iter_organisation_repositories(
+                self.organisation_name,
+                get_repository_listing_type(self.repository_visibilities),
+            )
+            try:
+                while counter <= limit:
+                    with self.metrics.phase("list_repositories"):
+                        page = await anext(pages, None)
+                    if page is None:
+                        break
+                    for repository in page:
+                        if not self.__is_repository_to_map(
+                            repository["archived"],
+                            repository["fork"],
+                            repository.get("visibility"),
+                        ):
+                            continue
+                        counter += 1
+                        if counter > limit:
+                            logger.info("Limit Reached, exiting early")
+                            break
+                        if (
+                            self.get_asset_name(repository["name"])
+                            in repository_names_to_skip
+                        ):
+                            continue
+                        in_flight.append(
+                            asyncio.create_task(
+                                self.__get_repository_with_teams_with_access_async(
+                                    client,
+                                    repository,
+                                    counter,
+                                    teams_to_ignore,
+                                    previous_repositories,
+                                    since,
+                                )
+                            )
+                        )
+                        if len(in_flight) >= self.max_workers * 2:
+                            yield self.__count_fetched_repository(
+                                *await in_flight.popleft()
+                            )
+                while in_flight:
+                    yield self.__count_fetched_repository(*await in_flight.popleft())
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                await asyncio.gather(*in_flight, return_exceptions=True)
+                await pages.aclose()
+
+    async def __get_repository_with_teams_with_access_async(
+        self,
+        client: GithubAsyncClient,
+        repository: dict,
+        counter: int,
+        teams_to_ignore: List[str],
+        previous_repositories: dict[str, dict] | None = None,
+        since: datetime | None = None,
+    ) -> tuple[dict, bool]:
+        asset_name = self.get_asset_name(repository["name"])
+        logger.info(f"Processing Repository: [ {asset_name} ] {counter}")
+        started_at = time.monotonic()
+        with self.metrics.phase("resolve_teams"):
+            teams = await client.get_repository_teams(repository["full_name"])
+
+        team_grants_fingerprint = None
+        if previous_repositories is not None:
+            team_grants_fingerprint = get_fingerprint_of_team_grants(
+                (
+                    team["name"],
+                    team["permission"],
+                    team["parent"]["name"] if team.get("parent") else None,
+                )
+                for team in teams
+            )
+            previous_repository = previous_repositories.get(asset_name)
+            if (
+                previous_repository
+                and previous_repository["team_grants_fingerprint"]
+                == team_grants_fingerprint
+                and since is not None
+                and not has_changed_since(
+                    [
+                        parse_github_timestamp(repository.get("pushed_at")),
+                        parse_github_timestamp(repository.get("updated_at")),
+                    ],
+                    since,
+                )
+            ):
+                logger.info("Repository unchanged since last sync, skipping...")
+                self.metrics.record_repository(
+                    asset_name, time.monotonic() - started_at
+                )
+                return previous_repository, False
+
+        response = await self.__get_teams_with_access_async(
+            client, repository["full_name"], teams, teams_to_ignore
+        )
+        response["name"] = asset_name
+        if team_grants_fingerprint is not None:
+            response["team_grants_fingerprint"] = team_grants_fingerprint
+        self.metrics.record_repository(asset_name, time.monotonic() - started_at)
+        return response, True
+
+    async def __get_teams_with_access_async(
+        self,
+        client: GithubAsyncClient,
+        repository_full_name: str,
+        teams: List[dict],
+        teams_to_ignore: List[str],
+    ) -> dict:
+        teams = [team for team in teams if team["name"] not in teams_to_ignore]
+
+        async def get_team_access(team: dict) -> tuple[dict | None, list[str]]:
+            with self.metrics.phase("resolve_teams"):
+                permissions = await client.get_team_repository_permissions(
+                    team, repository_full_name
+                )
+            team_parents = await client.get_team_parent_names(team)
+            self.team_parent_cache[team["name"]] = team_parents
+            return permissions, team_parents
+
+        response = {
+            "github_teams_with_admin_access": [],
+            "github_teams_with_admin_access_parents": [],
+            "github_teams_with_any_access": [],
+            "github_teams_with_any_access_parents": [],
+        }
+        for team, (permissions, team_parents) in zip(
+            teams, await asyncio.gather(*(get_team_access(team) for team in teams))
+        ):
+            if not permissions:
+                continue
+            if permissions.get("admin"):
+                response["github_teams_with_admin_access"].append(team["name"])
+                response["github_teams_with_admin_access_parents"].extend(team_parents)
+            if any(
+                permissions.get(permission)
+                for permission in ["admin", "maintain", "push", "pull", "triage"]
+            ):
+                response["github_teams_with_any_access"].append(team["name"])
+                response["github_teams_with_any_access_parents"].extend(team_parents)
+        return response
+
+    async def __get_repositories_by_name_async(
+        self, asset_names: List[str], teams_to_ignore: List[str]
+    ) -> list[dict]:
+        repository_names = [
+            get_repository_name_of_asset(asset_name) for asset_name in asset_names
+        ]
+        async with self.__create_async_client() as client:
+            fetched_repositories = await asyncio.gather(
+                *(
+                    self.__get_repository_by_name_async(
+                        client, repository_name, counter, teams_to_ignore
+                    )
+                    for counter, repository_name in enumerate(repository_names, start=1)
+                )
+            )
+        return [
+            repository for repository in fetched_repositories if repository is not None
+        ]
+
+    async def __get_repository_by_name_async(
+        self,
+        client: GithubAsyncClient,
+        repository_name: str,
+        counter: int,
+        teams_to_ignore: List[str],
+    ) -> dict | None:
+        try:
+            repository, _ = await self.__get_repository_with_teams_with_access_async(
+                client,
+                {
+                    "name": repository_name,
+                    "full_name": f"{self.organisation_name}/{repository_name}",
+                },
+                counter,
+                teams_to_ignore,
+            )
+        except GithubRequestError as error:
+            if error.status != 404:
+                raise
+            self.__log_repository_not_found(repository_name)
+            return None
+        return repository
+
+    def __log_repository_not_found(self, repository_name: str):
+        logger.warning(
+            f"Repository [ {self.get_asset_name(repository_name)} ] not found, it has been deleted or is no longer visible"
+        )
+
     @retries_github_rate_limit_exception_at_next_reset_once
     def get_all_repositories(
         self,
         limit: int = 1000,
         teams_to_ignore: List[str] = ["organisation-security-auditor"],
+        previous_repositories: dict[str, dict] | None = None,
+        since: datetime | None = None,
     ) -> list[dict]:
-        response = []
-        team_parent_cache = {}
-        repositories = list(
-            self.github_client_core_api.get_organization(
-                self.organisation_name
-            ).get_repos(type="public")
-        )
-        repositories_to_check = [
-            repository
-            for repository in repositories
-            if not (repository.archived or repository.fork)
+        return list(
+            self.iter_all_repositories(
+                limit, teams_to_ignore, previous_repositories, since
+            )
+        )
+
+    @retries_github_rate_limit_exception_at_next_reset_once
+    def get_all_repository_names(self, limit: int = 1000) -> list[str]:
+        """Returns the asset name of each repository to map."""
+        return [
+            self.get_asset_name(repository_name)
+            for repository_name in self.__get_all_repository_names(limit)
         ]
-        logger.info(f"Total Repositories: [ {len(repositories_to_check)} ]")
-        counter = 1
-        for repo in repositories_to_check:
-            if counter > limit:
-                logger.info("Limit Reached, exiting early")
-                break
-            logger.info(
-                f"Processing Repository: [ {repo.name} ] {counter}/{len(repositories_to_check)}"
+
+    def __get_all_repository_names(self, limit: int) -> list[str]:
+        with self.metrics.phase("list_repositories"):
+            repository_names = [
+                repository.name
+                for repository in self.__get_organisation_repositories()
+                if self.__is_repository_to_map(
+                    repository.archived, repository.fork, repository.visibility
+                )
+            ]
+        logger.info(f"Total Repositories: [ {len(repository_names)} ]")
+        if len(repository_names) > limit:
+            logger.info("Limit Reached, exiting early")
+            repository_names = repository_names[:limit]
+        return repository_names
+
+    def get_repositories_by_name(
+        self,
+        asset_names: List[str],
+        teams_to_ignore: List[str] = ["organisation-security-auditor"],
+    ) -> list[dict]:
+        """
+        Fetches the team access of repositories of this organisation by asset name.
+        Repositories that no longer exist are left out.
+        """
+        if self.use_async_client:
+            repositories = asyncio.run(
+                self.__get_repositories_by_name_async(asset_names, teams_to_ignore)
             )
+            self.__log_statistics()
+            return repositories
+
+        team_parent_cache = self.team_parent_cache
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            repositories = [
+                repository
+                for repository in executor.map(
+                    lambda asset_name: self.__get_repository_by_name(
+                        asset_name, teams_to_ignore, team_parent_cache
+                    ),
+                    asset_names,
+                )
+                if repository is not None
+            ]
+        self.__log_statistics()
+        return repositories
+
+    def __get_repository_by_name(
+        self,
+        asset_name: str,
+        teams_to_ignore: List[str],
+        team_parent_cache: dict[str, List[str]],
+    ) -> dict | None:
+        logger.info(f"Processing Repository: [ {asset_name} ]")
+        started_at = time.monotonic()
+        repository_name = get_repository_name_of_asset(asset_name)
+        try:
             (
                 teams_with_admin_access,
                 teams_with_admin_access_parents,
                 teams_with_any_access,
                 teams_with_any_access_parents,
-            ) = self.__get_teams_with_access(repo, teams_to_ignore, team_parent_cache)
-            response.append(
-                {
-                    "name": repo.name,
-                    "github_teams_with_admin_access": teams_with_admin_access,
-                    "github_teams_with_admin_access_parents": teams_with_admin_access_parents,
-                    "github_teams_with_any_access": teams_with_any_access,
-                    "github_teams_with_any_access_parents": teams_with_any_access_parents,
-                },
+            ) = self.__get_teams_with_access(
+                f"{self.organisation_name}/{repository_name}",
+                teams_to_ignore,
+                team_parent_cache,
             )
-            counter += 1
-        return response
+        except UnknownObjectException:
+            self.__log_repository_not_found(repository_name)
+            return None
+        self.metrics.record_repository(asset_name, time.monotonic() - started_at)
+        return {
+            "name": asset_name,
+            "github_teams_with_admin_access": teams_with_admin_access,
+            "github_teams_with_admin_access_parents": teams_with_admin_access_parents,
+            "github_teams_with_any_access": teams_with_any_access,
+            "github_teams_with_any_access_parents": teams_with_any_access_parents,
+        }
+
+    @retries_github_rate_limit_exception_at_next_reset_once
+    def get_all_repositories_by_team(
+        self,
+        limit: int = 1000,
+        teams_to_ignore: List[str] = ["organisation-security-auditor"],
+    ) -> list[dict]:
+        repository_names = self.__get_all_repository_names(limit)
+        organisation = self.github_client_core_api.get_organization(
+            self.organisation_name
+        )
+
+        team_parents = {}
+        team_repository_permissions = {}
+        with self.metrics.phase("resolve_teams"):
+            for team in organisation.get_teams():
+                logger.info(f"Processing Team: [ {team.name} ]")
+                team_parents[team.name] = team.parent.name if team.parent else None
+                if team.name in teams_to_ignore:
+                    continue
+                team_repository_permissions[team.name] = {
+                    repository.name: self.__get_permission_name(repository.permissions)
+                    for repository in team.get_repos()
+                }
+        logger.info(f"Total Teams: [ {len(team_parents)} ]")
+        for team_name in team_parents:
+            get_all_parents_team_names(team_name, team_parents, self.team_parent_cache)
+        self.__log_statistics()
+
+        repositories = build_repositories_from_team_permissions(
+            repository_names, team_parents, team_repository_permissions, teams_to_ignore
+        )
+        for repository in repositories:
+            repository["name"] = self.get_asset_name(repository["name"])
+        return repositories
+
+    def __get_permission_name(self, permissions: Permissions | None) -> str:
+        if not permissions:
+            return ""
+        if permissions.admin:
+            return "admin"
+        if permissions.maintain:
+            return "maintain"
+        if permissions.push:
+            return "push"
+        if permissions.triage:
+            return "triage"
+        if permissions.pull:
+            return "pull"
+        return ""
@@ -0,0 +1,65 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "github-repository-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def write_snapshot(
+    path: str, repositories: Iterable[dict], organisation_name: str
+) -> Iterator[dict]:
+    """
+    Writes repositories to a gzip compressed JSON Lines snapshot as they are yielded back.
+
+    The first line is a header naming the format and its version, followed by one repository per
+    line. The snapshot is written to a temporary file and only moved into place once every
+    repository has been written, so a failed crawl never leaves a partial snapshot behind.
+    """
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    repository_count = 0
+    try:
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as file:
+            file.write(
+                json.dumps(
+                    {
+                        "format": SNAPSHOT_FORMAT,
+                        "version": SNAPSHOT_VERSION,
+                        "organisation": organisation_name,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                    }
+                )
+                + "\n"
+            )
+            for repository in repositories:
+                file.write(json.dumps(repository, separators=(",", ":")) + "\n")
+                repository_count += 1
+                yield repository
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+    logger.info(f"Wrote snapshot of [ {repository_count} ] repositories to [ {path} ]")
+
+
+def read_snapshot(path: str) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        header = json.loads(file.readline() or "{}")
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"[ {path} ] is not a GitHub repository snapshot")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Snapshot [ {path} ] has version [ {header.get('version')} ], expected [ {SNAPSHOT_VERSION} ]"
+            )
+
+        logger.info(
+            f"Reading snapshot of [ {header['organisation']} ] created at [ {header['created_at']} ]"
+        )
+        for line in file:
+            yield json.loads(line)
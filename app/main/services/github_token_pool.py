@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Mapping
+
+from github import Auth, GithubIntegration, UnknownObjectException
+
+from app.main.services.github_rate_limit_budget import GithubRateLimitBudget
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+
+
+class GithubTokenCredential:
+    def __init__(self, token: str, name: str) -> None:
+        self.token = token
+        # Names appear in logs and run reports, so they are given rather than derived from
+        # the token itself
+        self.name = name
+
+    def get_token(self) -> str:
+        return self.token
+
+
+class GithubAppInstallationCredential:
+    """
+    Mints installation access tokens for a GitHub App installation from the app's private key.
+
+    Installation tokens expire after an hour, so a new one is minted shortly before the current
+    one expires. Each installation has its own rate limit, separate from any personal tokens.
+    An app is installed once per organisation, so an app adds at most one installation's rate
+    limit to an organisation.
+    """
+
+    def __init__(
+        self,
+        app_id: str,
+        private_key: str,
+        installation_id: int,
+        base_url: str = GITHUB_API_URL,
+        refresh_margin: timedelta = timedelta(minutes=5),
+    ) -> None:
+        self.app_id = app_id
+        self.private_key = private_key
+        self.installation_id = installation_id
+        self.base_url = base_url
+        self.refresh_margin = refresh_margin
+        self.name = f"app-installation-{installation_id}"
+        self.token: str | None = None
+        self.expires_at: datetime | None = None
+        self.__lock = threading.Lock()
+
+    def get_token(self) -> str:
+        with self.__lock:
+            if (
+                self.token is None
+                or self.expires_at is None
+                or datetime.now(timezone.utc) >= self.expires_at - self.refresh_margin
+            ):
+                self.__mint_token()
+            return self.token
+
+    def __mint_token(self) -> None:
+        logger.info(f"Minting installation token for [ {self.name} ]")
+        integration = GithubIntegration(
+            auth=Auth.AppAuth(self.app_id, self.private_key), base_url=self.base_url
+        )
+        authorization = integration.get_access_token(self.installation_id)
+        self.token = authorization.token
+        self.expires_at = authorization.expires_at
+        if self.expires_at is not None and self.expires_at.tzinfo is None:
+            self.expires_at = self.expires_at.replace(tzinfo=timezone.utc)
+
+
+def find_app_installation_id(
+    app_id: str,
+    private_key: str,
+    organisation_name: str,
+    base_url: str = GITHUB_API_URL,
+) -> int | None:
+    """Returns the id of the app's installation on the organisation, if it is installed."""
+    integration = GithubIntegration(
+        auth=Auth.AppAuth(app_id, private_key), base_url=base_url
+    )
+    try:
+        return integration.get_org_installation(organisation_name).id
+    except UnknownObjectException:
+        return None
+
+
+GithubCredential = GithubTokenCredential | GithubAppInstallationCredential
+
+
+class GithubTokenPool:
+    """
+    Spreads requests across several GitHub credentials, each with its own rate limit budget.
+
+    Each request goes to the credential with the most remaining quota. A credential whose budget
+    has fallen to the reserve is left out of rotation until its rate limit resets, and only once
+    every credential is exhausted does acquire() block until the earliest reset.
+    """
+
+    def __init__(
+        self,
+        credentials: List[GithubCredential],
+        reserve: int = 100,
+        wait_time_buffer: int = 5,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if not credentials:
+            raise ValueError("At least one GitHub credential is required")
+        self.credentials = credentials
+        if len({credential.name for credential in credentials}) < len(credentials):
+            raise ValueError("GitHub credential names must be unique")
+        self.budgets = {
+            credential.name: GithubRateLimitBudget(
+                reserve, wait_time_buffer, clock, sleep
+            )
+            for credential in credentials
+        }
+        self.clock = clock
+        self.sleep = sleep
+        self.seconds_spent_waiting = 0.0
+        self.started_at = clock()
+        self.__lock = threading.Lock()
+
+    def __get_priority(self, credential: GithubCredential) -> tuple[float, int]:
+        budget = self.budgets[credential.name]
+        remaining = float("inf") if budget.remaining is None else budget.remaining
+        return remaining, -budget.requests_made
+
+    def acquire(self) -> GithubCredential:
+        while True:
+            credential, wait_time = self.try_acquire()
+            if credential:
+                return credential
+            self.record_wait(wait_time)
+            self.sleep(wait_time)
+
+    def try_acquire(self) -> tuple[GithubCredential | None, float]:
+        """
+        Returns a credential to make a request with, or None and the seconds until one is
+        available, without blocking.
+        """
+        with self.__lock:
+            wait_times = []
+            for credential in sorted(
+                self.credentials, key=self.__get_priority, reverse=True
+            ):
+                wait_time = self.budgets[credential.name].try_acquire()
+                if not wait_time:
+                    return credential, 0.0
+                wait_times.append(wait_time)
+            return None, min(wait_times)
+
+    def record_wait(self, wait_time: float) -> None:
+        logger.warning(
+            f"Rate limit budget of all [ {len(self.credentials)} ] GitHub credentials exhausted, waiting [ {wait_time:.0f} ] seconds for reset"
+        )
+        with self.__lock:
+            self.seconds_spent_waiting += wait_time
+
+    def observe_headers(
+        self, credential: GithubCredential, headers: Mapping[str, str]
+    ) -> None:
+        self.budgets[credential.name].observe_headers(headers)
+
+    @property
+    def requests_made(self) -> int:
+        return sum(budget.requests_made for budget in self.budgets.values())
+
+    def requests_per_second(self) -> float:
+        elapsed = self.clock() - self.started_at
+        return self.requests_made / elapsed if elapsed > 0 else 0.0
+
+    def get_usage(self) -> dict[str, dict]:
+        return {
+            name: {
+                "requests_made": budget.requests_made,
+                "remaining": budget.remaining,
+                "limit": budget.limit,
+                "reset_timestamp": budget.reset_timestamp,
+            }
+            for name, budget in self.budgets.items()
+        }
+
+    def log_statistics(self) -> None:
+        for name, usage in self.get_usage().items():
+            logger.info(
+                f"GitHub credential [ {name} ] made [ {usage['requests_made']} ] requests with [ {usage['remaining']} ] of [ {usage['limit']} ] remaining"
+            )
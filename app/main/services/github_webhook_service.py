@@ -0,0 +1,132 @@
+import hashlib
+import hmac
+import logging
+from typing import List
+
+from app.main.repositories.team_repository import TeamRepository
+from app.main.services.github_service import get_asset_name
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EVENTS = ["repository", "team", "team_add", "membership"]
+
+REFRESH = "REFRESH"
+REMOVE = "REMOVE"
+
+# Repository actions after which the repository is no longer mapped
+REPOSITORY_REMOVED_ACTIONS = ["deleted", "archived"]
+
+
+def is_valid_signature(secret: str | None, body: bytes, signature: str | None) -> bool:
+    """
+    Checks the X-Hub-Signature-256 header GitHub signs each delivery with, an HMAC of the
+    request body keyed by the webhook secret. Without a secret configured nothing is valid.
+    """
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature.removeprefix("sha256="), expected)
+
+
+class GithubWebhookService:
+    """
+    Works out which repositories a GitHub webhook event changes the ownership of, and whether
+    each should be refreshed from GitHub or is no longer mapped at all.
+    """
+
+    def __init__(
+        self,
+        organisation_names: List[str],
+        repository_visibilities: List[str],
+        team_repository: TeamRepository,
+    ):
+        self.organisation_names = organisation_names
+        self.repository_visibilities = repository_visibilities
+        self.team_repository = team_repository
+
+    def get_repository_updates(self, event: str, payload: dict) -> dict[str, str]:
+        """Returns REFRESH or REMOVE for the asset name of each repository affected."""
+        organisation_name = (payload.get("organization") or {}).get("login")
+        if event not in SUPPORTED_EVENTS:
+            return {}
+        if organisation_name not in self.organisation_names:
+            logger.info(
+                f"Ignoring [ {event} ] event from unmapped organisation [ {organisation_name} ]"
+            )
+            return {}
+
+        if event == "repository":
+            return self.__get_repository_event_updates(organisation_name, payload)
+        if event == "team_add" or (event == "team" and payload.get("repository")):
+            return self.__get_refresh_update(organisation_name, payload["repository"])
+        if event == "team":
+            return self.__get_team_event_updates(organisation_name, payload)
+        # Ownership follows teams' access to repositories, not who is in each team
+        logger.info("Team membership changes do not affect ownership, ignoring")
+        return {}
+
+    def __get_asset_name(self, organisation_name: str, repository_name: str) -> str:
+        return get_asset_name(
+            organisation_name, repository_name, self.organisation_names[0]
+        )
+
+    def __is_repository_to_map(self, repository: dict) -> bool:
+        return (
+            not (repository.get("archived") or repository.get("fork"))
+            and repository.get("visibility") in self.repository_visibilities
+        )
+
+    def __get_refresh_update(
+        self, organisation_name: str, repository: dict
+    ) -> dict[str, str]:
+        return {
+            self.__get_asset_name(organisation_name, repository["name"]): (
+                REFRESH if self.__is_repository_to_map(repository) else REMOVE
+            )
+        }
+
+    def __get_repository_event_updates(
+        self, organisation_name: str, payload: dict
+    ) -> dict[str, str]:
+        repository = payload["repository"]
+        changes = payload.get("changes") or {}
+        updates = {}
+
+        previous_name = changes.get("repository", {}).get("name", {}).get("from")
+        if payload["action"] == "renamed" and previous_name:
+            updates[self.__get_asset_name(organisation_name, previous_name)] = REMOVE
+
+        previous_organisation_name = (
+            changes.get("owner", {})
+            .get("from", {})
+            .get("organization", {})
+            .get("login")
+        )
+        if (
+            payload["action"] == "transferred"
+            and previous_organisation_name in self.organisation_names
+        ):
+            updates[
+                self.__get_asset_name(previous_organisation_name, repository["name"])
+            ] = REMOVE
+
+        if payload["action"] in REPOSITORY_REMOVED_ACTIONS:
+            updates[self.__get_asset_name(organisation_name, repository["name"])] = (
+                REMOVE
+            )
+        else:
+            updates.update(self.__get_refresh_update(organisation_name, repository))
+        return updates
+
+    def __get_team_event_updates(
+        self, organisation_name: str, payload: dict
+    ) -> dict[str, str]:
+        # Renaming, moving or deleting a team changes the teams and parents recorded for
+        # every repository the team or a team below it has access to
+        changes = payload.get("changes") or {}
+        team_name = changes.get("name", {}).get("from") or payload["team"]["name"]
+        # Teams are stored with names qualified by their organisation as asset names are
+        repository_names = self.team_repository.find_repository_names_with_access_by_team_or_descendants(
+            self.__get_asset_name(organisation_name, team_name)
+        )
+        return {repository_name: REFRESH for repository_name in repository_names}
@@ -0,0 +1,225 @@
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+METRIC_PREFIX = "map_github_repositories_to_owners"
+
+# Path segments that identify a resource rather than the kind of request
+ENDPOINT_PATTERNS = [
+    (re.compile(r"/repos/[^/]+/[^/]+"), "/repos/{owner}/{repo}"),
+    (re.compile(r"/orgs/[^/]+"), "/orgs/{org}"),
+    (re.compile(r"/teams/[^/]+"), "/teams/{team}"),
+    (re.compile(r"/team/[^/]+"), "/team/{team}"),
+    (re.compile(r"/organizations/\d+"), "/organizations/{org_id}"),
+    (re.compile(r"/installations/\d+"), "/installations/{installation_id}"),
+]
+
+
+def get_endpoint_name(method: str, path: str) -> str:
+    path = path.split("?")[0]
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path, count=1)
+    return f"{method} {path}"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class JobMetrics:
+    """
+    Collects where a run of the job spends its time and its GitHub API budget, and writes it
+    out as a JSON run report and a Prometheus textfile when the run finishes.
+
+    Phases that run on several worker threads at once, such as resolving teams, report the
+    seconds summed across threads, so they can add up to more than the run's wall clock time.
+    """
+
+    def __init__(
+        self,
+        slowest_repositories_count: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.slowest_repositories_count = slowest_repositories_count
+        self.clock = clock
+        self.started_at = clock()
+        self.phase_seconds: dict[str, float] = {}
+        self.api_calls: dict[tuple[str, str], int] = {}
+        self.rate_limit_sleep_seconds = 0.0
+        self.rate_limit_sleep_seconds_by_organisation: dict[str, float] = {}
+        self.team_parent_cache_hits = 0
+        self.team_parent_cache_misses = 0
+        self.repositories = 0
+        self.__slowest_repositories: list[tuple[float, str]] = []
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started_at = self.clock()
+        try:
+            yield
+        finally:
+            self.add_phase_seconds(name, self.clock() - started_at)
+
+    def add_phase_seconds(self, name: str, seconds: float) -> None:
+        with self.__lock:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+
+    def record_api_call(self, api: str, endpoint: str) -> None:
+        with self.__lock:
+            key = (api, endpoint)
+            self.api_calls[key] = self.api_calls.get(key, 0) + 1
+
+    def record_rate_limit_sleep(self, organisation_name: str, seconds: float) -> None:
+        # Each organisation is crawled with its own token pool, which reports its running total
+        with self.__lock:
+            self.rate_limit_sleep_seconds_by_organisation[organisation_name] = seconds
+            self.rate_limit_sleep_seconds = sum(
+                self.rate_limit_sleep_seconds_by_organisation.values()
+            )
+
+    def record_team_parent_cache(self, hit: bool) -> None:
+        with self.__lock:
+            if hit:
+                self.team_parent_cache_hits += 1
+            else:
+                self.team_parent_cache_misses += 1
+
+    def record_repository(self, name: str, seconds: float) -> None:
+        with self.__lock:
+            self.repositories += 1
+            if len(self.__slowest_repositories) < self.slowest_repositories_count:
+                heapq.heappush(self.__slowest_repositories, (seconds, name))
+            else:
+                heapq.heappushpop(self.__slowest_repositories, (seconds, name))
+
+    def team_parent_cache_hit_rate(self) -> float:
+        total = self.team_parent_cache_hits + self.team_parent_cache_misses
+        return self.team_parent_cache_hits / total if total else 0.0
+
+    def get_slowest_repositories(self) -> list[dict]:
+        return [
+            {"name": name, "seconds": seconds}
+            for seconds, name in sorted(self.__slowest_repositories, reverse=True)
+        ]
+
+    def get_report(self) -> dict:
+        return {
+            "duration_seconds": self.clock() - self.started_at,
+            "repositories": self.repositories,
+            "phase_seconds": dict(sorted(self.phase_seconds.items())),
+            "api_calls": [
+                {"api": api, "endpoint": endpoint, "calls": calls}
+                for (api, endpoint), calls in sorted(self.api_calls.items())
+            ],
+            "rate_limit_sleep_seconds": self.rate_limit_sleep_seconds,
+            "rate_limit_sleep_seconds_by_organisation": dict(
+                sorted(self.rate_limit_sleep_seconds_by_organisation.items())
+            ),
+            "team_parent_cache": {
+                "hits": self.team_parent_cache_hits,
+                "misses": self.team_parent_cache_misses,
+                "hit_rate": self.team_parent_cache_hit_rate(),
+            },
+            "slowest_repositories": self.get_slowest_repositories(),
+        }
+
+    def get_prometheus_text(self, report: dict) -> str:
+        lines = []
+
+        def add_metric(name: str, help_text: str, samples: list[tuple[dict, float]]):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{label}="{escape_label_value(str(label_value))}"'
+                    for label, label_value in labels.items()
+                )
+                lines.append(
+                    f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}"
+                    if label_text
+                    else f"{METRIC_PREFIX}_{name} {value}"
+                )
+
+        add_metric(
+            "duration_seconds",
+            "Wall clock seconds the run took",
+            [({}, report["duration_seconds"])],
+        )
+        add_metric(
+            "repositories",
+            "Repositories processed by the run",
+            [({}, report["repositories"])],
+        )
+        add_metric(
+            "phase_seconds",
+            "Seconds spent in each phase, summed across worker threads",
+            [
+                ({"phase": phase}, seconds)
+                for phase, seconds in report["phase_seconds"].items()
+            ],
+        )
+        add_metric(
+            "api_calls",
+            "GitHub API calls made by the run by API and endpoint",
+            [
+                ({"api": call["api"], "endpoint": call["endpoint"]}, call["calls"])
+                for call in report["api_calls"]
+            ],
+        )
+        add_metric(
+            "rate_limit_sleep_seconds",
+            "Seconds spent waiting for GitHub rate limits to reset",
+            [({}, report["rate_limit_sleep_seconds"])],
+        )
+        add_metric(
+            "organisation_rate_limit_sleep_seconds",
+            "Seconds spent waiting for GitHub rate limits to reset by organisation",
+            [
+                ({"organisation": organisation_name}, seconds)
+                for organisation_name, seconds in report[
+                    "rate_limit_sleep_seconds_by_organisation"
+                ].items()
+            ],
+        )
+        add_metric(
+            "team_parent_cache_hit_ratio",
+            "Share of team parent lookups served from the cache",
+            [({}, report["team_parent_cache"]["hit_rate"])],
+        )
+        add_metric(
+            "slowest_repository_seconds",
+            "Seconds taken to fetch the slowest repositories",
+            [
+                ({"repository": repository["name"]}, repository["seconds"])
+                for repository in report["slowest_repositories"]
+            ],
+        )
+        add_metric(
+            "last_run_timestamp_seconds",
+            "Unix time the run finished",
+            [({}, time.time())],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write(
+        self, report_path: str | None = None, prometheus_path: str | None = None
+    ) -> dict:
+        report = self.get_report()
+        if report_path:
+            self.__write_atomically(report_path, json.dumps(report, indent=2))
+        if prometheus_path:
+            # The node exporter may read the textfile at any time, so never leave it half written
+            self.__write_atomically(prometheus_path, self.get_prometheus_text(report))
+        return report
+
+    def __write_atomically(self, path: str, content: str) -> None:
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Callable, List
+
+from app.main.repositories.asset_repository import AssetView
+
+logger = logging.getLogger(__name__)
+
+
+def is_owner_authoritative_for_repository(repository: AssetView, owner: str) -> bool:
+    """
+    An owner is authoritative for a repository if it has admin access, or has other access
+    and no owner has admin access.
+    """
+    return owner in repository.admin_owner_names or (
+        owner in repository.owner_names and not repository.admin_owner_names
+    )
+
+
+class OwnershipIndex:
+    """
+    A read-only view of every repository grouped by authoritative owner. It is built once from
+    the stored relationships, so looking up the repositories of an owner does not go to the
+    database.
+    """
+
+    def __init__(self, repositories: List[AssetView], generation: int = 0):
+        self.generation = generation
+        self.repositories = repositories
+        self.authoritative_repositories_by_owner: dict[str, list[AssetView]] = {}
+        self.repositories_missing_admin_access_by_owner: dict[str, list[AssetView]] = {}
+
+        for repository in repositories:
+            # An owner with several relationships to a repository lists it once
+            for owner in dict.fromkeys(repository.owner_names):
+                if not is_owner_authoritative_for_repository(repository, owner):
+                    continue
+                self.authoritative_repositories_by_owner.setdefault(owner, []).append(
+                    repository
+                )
+                if owner not in repository.admin_owner_names:
+                    self.repositories_missing_admin_access_by_owner.setdefault(
+                        owner, []
+                    ).append(repository)
+
+    def get_repositories_by_authoritative_owner(self, owner: str) -> list[AssetView]:
+        return self.authoritative_repositories_by_owner.get(owner, [])
+
+    def get_repositories_missing_admin_access(self, owner: str) -> list[AssetView]:
+        return self.repositories_missing_admin_access_by_owner.get(owner, [])
+
+
+class OwnershipIndexCache:
+    """
+    Holds the ownership index of a web process. The data generation the job bumps is checked
+    at most once every check_interval_seconds, and a new index is only built when it has
+    changed. Requests keep using the current index while a new one is built, which then
+    replaces it in a single assignment.
+    """
+
+    def __init__(
+        self,
+        find_generation: Callable[[], int],
+        find_repositories: Callable[[], List[AssetView]],
+        check_interval_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.find_generation = find_generation
+        self.find_repositories = find_repositories
+        self.check_interval_seconds = check_interval_seconds
+        self.clock = clock
+        self.builds = 0
+        self.__index: OwnershipIndex | None = None
+        self.__checked_at: float | None = None
+        self.__lock = threading.Lock()
+
+    def get(self) -> OwnershipIndex:
+        if not self.__is_check_due():
+            return self.__index
+        # Only the first request waits for an index, later ones use the current index
+        # while another request checks for a new one
+        if not self.__lock.acquire(blocking=self.__index is None):
+            return self.__index
+        try:
+            if self.__is_check_due():
+                self.__refresh()
+        finally:
+            self.__lock.release()
+        return self.__index
+
+    def __is_check_due(self) -> bool:
+        checked_at = self.__checked_at
+        return (
+            self.__index is None
+            or checked_at is None
+            or self.clock() - checked_at >= self.check_interval_seconds
+        )
+
+    def __refresh(self):
+        checked_at = self.clock()
+        generation = self.find_generation()
+        index = self.__index
+        if index is None or index.generation != generation:
+            index = OwnershipIndex(self.find_repositories(), generation)
+            self.builds += 1
+            logger.info(
+                f"Built ownership index of [ {len(index.repositories)} ] repositories for data generation [ {generation} ]"
+            )
+        # Requests read both without the lock, so the check time is set before a new index
+        # is published
+        self.__checked_at = checked_at
+        self.__index = index
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class RepositoryUpdateQueue:
+    """
+    Collects repository updates from webhook events and applies them in batches on a
+    background thread.
+
+    Updates are keyed by asset name, so a burst of events about the same repository, such as
+    a team being granted access to it and then renamed, is applied once with the latest
+    update. Each batch waits delay_seconds after its first update to let a burst coalesce.
+    """
+
+    def __init__(
+        self,
+        apply_updates: Callable[[dict[str, str]], None],
+        delay_seconds: float = 5.0,
+    ):
+        self.apply_updates = apply_updates
+        self.delay_seconds = delay_seconds
+        self.pending: dict[str, str] = {}
+        self.updates_received = 0
+        self.updates_applied = 0
+        self.__condition = threading.Condition()
+        self.__apply_lock = threading.Lock()
+        self.__thread: threading.Thread | None = None
+
+    def add(self, updates: dict[str, str]):
+        if not updates:
+            return
+        with self.__condition:
+            self.pending.update(updates)
+            self.updates_received += len(updates)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def flush(self):
+        """Applies the pending updates now, on the calling thread."""
+        with self.__apply_lock:
+            with self.__condition:
+                updates, self.pending = self.pending, {}
+            self.__apply(updates)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.pending)
+            # Events that arrive while waiting are coalesced into the same batch
+            time.sleep(self.delay_seconds)
+            self.flush()
+
+    def __apply(self, updates: dict[str, str]):
+        if not updates:
+            return
+        try:
+            self.apply_updates(updates)
+            self.updates_applied += len(updates)
+        except Exception:
+            logger.exception(
+                f"Failed to apply updates to [ {len(updates)} ] repositories"
+            )
@@ -0,0 +1,468 @@
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from app.main.services.github_graphql_service import (
+    QUERY_NAMES,
+    REPOSITORY_PERMISSIONS,
+)
+from app.main.services.job_metrics import get_endpoint_name
+from benchmark.synthetic_org import SyntheticOrg, SyntheticRepository, SyntheticTeam
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+GRAPHQL_PAGE_SIZE = 100
+
+# The same instant for every repository, so incremental runs see nothing has changed
+REPOSITORY_CHANGED_AT = "2024-01-01T00:00:00Z"
+
+PERMISSION_LEVELS = ["pull", "triage", "push", "maintain", "admin"]
+GRAPHQL_PERMISSIONS = {
+    rest_permission: graphql_permission
+    for graphql_permission, rest_permission in REPOSITORY_PERMISSIONS.items()
+}
+
+
+def get_permissions(permission: str) -> dict[str, bool]:
+    level = PERMISSION_LEVELS.index(permission)
+    return {name: level >= PERMISSION_LEVELS.index(name) for name in PERMISSION_LEVELS}
+
+
+class RateLimitWindow:
+    def __init__(self, limit: int, window_seconds: float, started_at: float):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.started_at = started_at
+        self.used_by_token: dict[tuple[str, int], int] = {}
+
+    def use(self, token: str, now: float) -> tuple[int, int, bool]:
+        """Returns the remaining requests, the reset time and whether the request is allowed."""
+        window = int((now - self.started_at) // self.window_seconds)
+        reset_at = math.ceil(self.started_at + (window + 1) * self.window_seconds)
+        used = self.used_by_token.get((token, window), 0)
+        if used >= self.limit:
+            return 0, reset_at, False
+        self.used_by_token[(token, window)] = used + 1
+        return self.limit - used - 1, reset_at, True
+
+
+class FakeGithubServer:
+    """
+    A local HTTP server that answers the REST and GraphQL requests the job makes from a
+    synthetic organisation, so the job can be run against organisations of any size.
+
+    Every response waits latency_seconds first and carries rate limit headers for the token
+    it was made with. Each token gets rate_limit requests every rate_limit_window_seconds, as
+    GitHub does, after which requests fail with a rate limit error until the window resets.
+    Responses have an ETag, and conditional requests that match are answered with a 304
+    that does not count against the rate limit.
+    """
+
+    def __init__(
+        self,
+        org: SyntheticOrg,
+        latency_seconds: float = 0.0,
+        rate_limit: int = 1_000_000,
+        rate_limit_window_seconds: float = 3600,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.org = org
+        self.latency_seconds = latency_seconds
+        started_at = time.time()
+        self.rate_limits = {
+            "core": RateLimitWindow(rate_limit, rate_limit_window_seconds, started_at),
+            "graphql": RateLimitWindow(
+                rate_limit, rate_limit_window_seconds, started_at
+            ),
+        }
+        self.requests_by_endpoint: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.http_server = ThreadingHTTPServer((host, port), FakeGithubRequestHandler)
+        self.http_server.daemon_threads = True
+        self.http_server.fake_github_server = self
+        self.url = f"http://{host}:{self.http_server.server_port}"
+        self.__thread: threading.Thread | None = None
+
+    def start(self) -> "FakeGithubServer":
+        self.__thread = threading.Thread(
+            target=self.http_server.serve_forever, daemon=True
+        )
+        self.__thread.start()
+        logger.info(f"Fake GitHub serving {self.org.describe()} at [ {self.url} ]")
+        return self
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        if self.__thread:
+            self.__thread.join()
+
+    def __enter__(self) -> "FakeGithubServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def get_requests_made(self) -> int:
+        with self.lock:
+            return sum(self.requests_by_endpoint.values())
+
+    def record_request(self, endpoint: str):
+        with self.lock:
+            self.requests_by_endpoint[endpoint] = (
+                self.requests_by_endpoint.get(endpoint, 0) + 1
+            )
+
+    def use_rate_limit(self, resource: str, token: str) -> tuple[dict, bool]:
+        rate_limit = self.rate_limits[resource]
+        with self.lock:
+            remaining, reset_at, allowed = rate_limit.use(token, time.time())
+        return {
+            "X-RateLimit-Limit": str(rate_limit.limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Used": str(rate_limit.limit - remaining),
+            "X-RateLimit-Reset": str(reset_at),
+            "X-RateLimit-Resource": resource,
+        }, allowed
+
+    def get_rate_limit_status(self, token: str) -> dict:
+        now = time.time()
+        resources = {}
+        with self.lock:
+            for resource, rate_limit in self.rate_limits.items():
+                window = int((now - rate_limit.started_at) // rate_limit.window_seconds)
+                used = rate_limit.used_by_token.get((token, window), 0)
+                resources[resource] = {
+                    "limit": rate_limit.limit,
+                    "remaining": rate_limit.limit - used,
+                    "used": used,
+                    "reset": math.ceil(
+                        rate_limit.started_at + (window + 1) * rate_limit.window_seconds
+                    ),
+                }
+        return {"resources": resources, "rate": resources["core"]}
+
+    def get_organisation_json(self) -> dict:
+        return {
+            "login": self.org.name,
+            "id": self.org.id,
+            "url": f"{self.url}/orgs/{self.org.name}",
+            "repos_url": f"{self.url}/orgs/{self.org.name}/repos",
+        }
+
+    def get_team_url(self, team: SyntheticTeam) -> str:
+        return f"{self.url}/organizations/{self.org.id}/team/{team.id}"
+
+    def get_team_json(self, team: SyntheticTeam, permission: str | None = None) -> dict:
+        team_json = {
+            "id": team.id,
+            "name": team.name,
+            "slug": team.slug,
+            "url": self.get_team_url(team),
+            "privacy": "closed",
+            "permission": permission or "pull",
+            "parent": (
+                {
+                    "id": team.parent.id,
+                    "name": team.parent.name,
+                    "slug": team.parent.slug,
+                    "url": self.get_team_url(team.parent),
+                }
+                if team.parent
+                else None
+            ),
+        }
+        if permission:
+            team_json["permissions"] = get_permissions(permission)
+        return team_json
+
+    def get_repository_json(
+        self, repository: SyntheticRepository, permission: str | None = None
+    ) -> dict:
+        full_name = f"{self.org.name}/{repository.name}"
+        repository_json = {
+            "id": repository.id,
+            "name": repository.name,
+            "full_name": full_name,
+            "url": f"{self.url}/repos/{full_name}",
+            "owner": {"login": self.org.name},
+            "private": False,
+            "visibility": "public",
+            "archived": repository.archived,
+            "fork": repository.fork,
+            "pushed_at": REPOSITORY_CHANGED_AT,
+            "updated_at": REPOSITORY_CHANGED_AT,
+        }
+        if permission:
+            repository_json["permissions"] = get_permissions(permission)
+        return repository_json
+
+    def handle_rest(self, path: str):
+        """Returns the response body for a REST path, or None when it is not found."""
+        organisation_path = f"/orgs/{self.org.name}"
+        repository_path = re.fullmatch(
+            rf"/repos/{self.org.name}/([^/]+)(/teams)?", path
+        )
+        team_path = re.fullmatch(
+            rf"/organizations/{self.org.id}/team/(\d+)(/repos(?:/{self.org.name}/([^/]+))?)?",
+            path,
+        )
+
+        if path == organisation_path:
+            return self.get_organisation_json()
+        if path == f"{organisation_path}/repos":
+            return [
+                self.get_repository_json(repository)
+                for repository in self.org.repositories
+            ]
+        if path == f"{organisation_path}/teams":
+            return [self.get_team_json(team) for team in self.org.teams]
+        if repository_path:
+            repository = self.org.repositories_by_name.get(repository_path.group(1))
+            if not repository:
+                return None
+            if not repository_path.group(2):
+                return self.get_repository_json(repository)
+            return [
+                self.get_team_json(self.org.teams_by_name[team_name], permission)
+                for team_name, permission in repository.team_permissions.items()
+            ]
+        if team_path:
+            team = self.org.teams_by_id.get(int(team_path.group(1)))
+            if not team:
+                return None
+            if not team_path.group(2):
+                return self.get_team_json(team)
+            if not team_path.group(3):
+                return [
+                    self.get_repository_json(
+                        repository, repository.team_permissions[team.name]
+                    )
+                    for repository in self.org.get_team_repositories(team)
+                ]
+            repository = self.org.repositories_by_name.get(team_path.group(3))
+            if not repository or team.name not in repository.team_permissions:
+                return None
+            return self.get_repository_json(
+                repository, repository.team_permissions[team.name]
+            )
+        return None
+
+    def __get_graphql_page(self, items: list, cursor: str | None) -> tuple[list, dict]:
+        start = int(cursor or 0)
+        end = start + GRAPHQL_PAGE_SIZE
+        return items[start:end], {
+            "hasNextPage": end < len(items),
+            "endCursor": str(end),
+        }
+
+    def __get_graphql_team_repositories(
+        self, team: SyntheticTeam, cursor: str | None
+    ) -> dict:
+        repositories, page_info = self.__get_graphql_page(
+            self.org.get_team_repositories(team), cursor
+        )
+        return {
+            "pageInfo": page_info,
+            "edges": [
+                {
+                    "permission": GRAPHQL_PERMISSIONS[
+                        repository.team_permissions[team.name]
+                    ],
+                    "node": {"name": repository.name},
+                }
+                for repository in repositories
+            ],
+        }
+
+    def handle_graphql(self, query: str, variables: dict) -> dict:
+        query_name = QUERY_NAMES.get(query)
+        if variables.get("organisation") != self.org.name:
+            return {"errors": [{"message": "Could not resolve to an Organization"}]}
+
+        if query_name == "repositories":
+            repositories, page_info = self.__get_graphql_page(
+                self.org.repositories, variables.get("cursor")
+            )
+            organisation = {
+                "repositories": {
+                    "pageInfo": page_info,
+                    "nodes": [
+                        {
+                            "name": repository.name,
+                            "isArchived": repository.archived,
+                            "isFork": repository.fork,
+                        }
+                        for repository in repositories
+                    ],
+                }
+            }
+        elif query_name == "teams":
+            teams, page_info = self.__get_graphql_page(
+                self.org.teams, variables.get("cursor")
+            )
+            organisation = {
+                "teams": {
+                    "pageInfo": page_info,
+                    "nodes": [
+                        {
+                            "name": team.name,
+                            "slug": team.slug,
+                            "parentTeam": (
+                                {"name": team.parent.name} if team.parent else None
+                            ),
+                            "repositories": self.__get_graphql_team_repositories(
+                                team, None
+                            ),
+                        }
+                        for team in teams
+                    ],
+                }
+            }
+        elif query_name == "team_repositories":
+            team = self.org.teams_by_slug.get(variables.get("slug"))
+            organisation = {
+                "team": team
+                and {
+                    "repositories": self.__get_graphql_team_repositories(
+                        team, variables.get("cursor")
+                    )
+                }
+            }
+        else:
+            return {"errors": [{"message": "Unknown query"}]}
+        return {"data": {"organization": organisation}}
+
+
+class FakeGithubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send the headers and body of each response together, or delayed acknowledgements on
+    # the kept alive connection add tens of milliseconds to every request
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    @property
+    def fake_github_server(self) -> FakeGithubServer:
+        return self.server.fake_github_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def get_token(self) -> str:
+        authorization = self.headers.get("Authorization", "")
+        return authorization.split(" ", 1)[-1]
+
+    def send_json(self, status: int, body, headers: dict | None = None):
+        self.send_content(status, json.dumps(body).encode(), headers)
+
+    def send_content(self, status: int, content: bytes, headers: dict | None = None):
+        etag = f'"{hashlib.sha256(content).hexdigest()}"'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_not_modified(self, etag: str):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_rate_limited(self, headers: dict):
+        self.send_json(
+            403,
+            {
+                "message": "API rate limit exceeded for token.",
+                "documentation_url": "https://docs.github.com/rest/overview/resources-in-the-rest-api#rate-limiting",
+            },
+            headers,
+        )
+
+    def do_GET(self):
+        time.sleep(self.fake_github_server.latency_seconds)
+        url = urlsplit(self.path)
+        self.fake_github_server.record_request(get_endpoint_name("GET", url.path))
+
+        if url.path == "/rate_limit":
+            self.send_json(
+                200, self.fake_github_server.get_rate_limit_status(self.get_token())
+            )
+            return
+
+        body = self.fake_github_server.handle_rest(url.path)
+        if body is None:
+            self.send_json(404, {"message": "Not Found"})
+            return
+
+        headers = {}
+        if isinstance(body, list):
+            body, headers = self.get_page(url.path, parse_qs(url.query), body)
+        content = json.dumps(body).encode()
+        etag = f'"{hashlib.sha256(content).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_not_modified(etag)
+            return
+
+        rate_limit_headers, allowed = self.fake_github_server.use_rate_limit(
+            "core", self.get_token()
+        )
+        if not allowed:
+            self.send_rate_limited(rate_limit_headers)
+            return
+        self.send_content(200, content, {**headers, **rate_limit_headers})
+
+    def do_POST(self):
+        time.sleep(self.fake_github_server.latency_seconds)
+        url = urlsplit(self.path)
+        self.fake_github_server.record_request(get_endpoint_name("POST", url.path))
+        request_body = json.loads(
+            self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}"
+        )
+        if url.path != "/graphql":
+            self.send_json(404, {"message": "Not Found"})
+            return
+
+        rate_limit_headers, allowed = self.fake_github_server.use_rate_limit(
+            "graphql", self.get_token()
+        )
+        if not allowed:
+            self.send_rate_limited(rate_limit_headers)
+            return
+        self.send_json(
+            200,
+            self.fake_github_server.handle_graphql(
+                request_body.get("query", ""), request_body.get("variables") or {}
+            ),
+            rate_limit_headers,
+        )
+
+    def get_page(
+        self, path: str, query: dict[str, list[str]], items: list
+    ) -> tuple[list, dict]:
+        page = int(query.get("page", ["1"])[0])
+        per_page = min(
+            int(query.get("per_page", [str(DEFAULT_PAGE_SIZE)])[0]), MAX_PAGE_SIZE
+        )
+        headers = {}
+        if page * per_page < len(items):
+            next_query = {
+                name: values[0] for name, values in query.items() if name != "page"
+            }
+            next_query["page"] = str(page + 1)
+            headers["Link"] = (
+                f'<{self.fake_github_server.url}{quote(path)}?{"&".join(f"{name}={quote(value)}" for name, value in next_query.items())}>; rel="next"'
+            )
+        return items[(page - 1) * per_page : page * per_page], headers
@@ -0,0 +1,283 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+from benchmark.fake_github_server import FakeGithubServer
+from benchmark.synthetic_org import generate_synthetic_org
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.jsonl")
+
+
+def run_job(database_url: str, job_config: dict) -> dict:
+    """
+    Runs the job once against an emptied database. Called in a fresh process for each run, so
+    the peak RSS it reports belongs to that run alone.
+    """
+    from app.app import create_app
+    from app.jobs.map_github_repositories_to_owners import main
+    from app.jobs.owner_rules import load_owner_rules
+    from app.main.config.app_config import app_config
+    from app.main.migrations.migrate import migrate
+    from app.main.models import db
+    from app.main.repositories.owner_repository import OwnerRepository
+
+    app_config.postgres.sql_alchemy_database_url = database_url
+    app_config.logging_level = job_config["logging_level"]
+    app_config.github.token = "benchmark-token"
+    app_config.github.additional_tokens = {}
+    app_config.github.app_id = None
+    app_config.github.cache_directory = None
+    app_config.github.api_url = job_config["api_url"]
+    app_config.github.graphql_url = f"{job_config['api_url']}/graphql"
+    app_config.github.fetch_strategy = job_config["fetch_strategy"]
+    app_config.github.client = job_config["client"]
+    app_config.github.max_workers = job_config["max_workers"]
+    app_config.incremental_sync.enabled = False
+    app_config.run_report.path = job_config["run_report_path"]
+    app_config.run_report.prometheus_textfile_path = None
+
+    app = create_app(is_rate_limit_enabled=False)
+    with app.app_context():
+        db.drop_all()
+        migrate(db.engine)
+        owner_repository = OwnerRepository()
+        for owner in load_owner_rules():
+            owner_repository.add_owner(owner["name"])
+
+        started_at = time.perf_counter()
+        main()
+        seconds = time.perf_counter() - started_at
+
+    with open(job_config["run_report_path"], encoding="utf-8") as file:
+        run_report = json.load(file)
+    return {
+        "seconds": seconds,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "run_report": run_report,
+    }
+
+
+def run_benchmark(
+    parameters: dict, database_url: str | None = None, runs: int = 3
+) -> dict:
+    org = generate_synthetic_org(
+        repositories=parameters["repositories"],
+        teams=parameters["teams"],
+        nesting_depth=parameters["nesting_depth"],
+        teams_per_repository=parameters["teams_per_repository"],
+        seed=parameters["seed"],
+    )
+    results = []
+    with tempfile.TemporaryDirectory() as directory, FakeGithubServer(
+        org,
+        latency_seconds=parameters["latency_ms"] / 1000,
+        rate_limit=parameters["rate_limit"],
+        rate_limit_window_seconds=parameters["rate_limit_window_seconds"],
+    ) as server:
+        for run in range(runs):
+            requests_before = server.get_requests_made()
+            job_config = {
+                "api_url": server.url,
+                "fetch_strategy": parameters["fetch_strategy"],
+                "client": parameters["client"],
+                "max_workers": parameters["max_workers"],
+                "logging_level": parameters["logging_level"],
+                "run_report_path": os.path.join(directory, f"run-{run}.json"),
+            }
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(
+                    run_job,
+                    database_url
+                    or f"sqlite:///{os.path.join(directory, f'run-{run}.db')}",
+                    job_config,
+                ).result()
+
+            run_report = result["run_report"]
+            results.append(
+                {
+                    "seconds": result["seconds"],
+                    "repositories": run_report["repositories"],
+                    "repositories_per_second": run_report["repositories"]
+                    / result["seconds"],
+                    "api_calls": server.get_requests_made() - requests_before,
+                    "peak_rss_mb": result["peak_rss_mb"],
+                    "phase_seconds": run_report["phase_seconds"],
+                    "rate_limit_sleep_seconds": run_report["rate_limit_sleep_seconds"],
+                }
+            )
+            logger.info(
+                f"Run [ {run + 1} ] of [ {runs} ] mapped [ {run_report['repositories']} ] repositories in [ {result['seconds']:.2f} ] seconds"
+            )
+
+    return {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "commit": get_commit(),
+        "parameters": parameters,
+        "runs": results,
+        "median": {
+            name: statistics.median(result[name] for result in results)
+            for name in [
+                "seconds",
+                "repositories_per_second",
+                "api_calls",
+                "peak_rss_mb",
+            ]
+        },
+    }
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def save_result(path: str, result: dict):
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(result) + "\n")
+
+
+def find_regressions(
+    result: dict, previous_results: list[dict], threshold: float
+) -> list[str]:
+    """
+    Compares a result with the latest previous result for the same parameters, and describes
+    each median that got worse by more than the threshold.
+    """
+    comparable = [
+        previous
+        for previous in previous_results
+        if previous["parameters"] == result["parameters"]
+    ]
+    if not comparable:
+        return []
+
+    previous = comparable[-1]
+    regressions = []
+    # Throughput regresses when it falls, everything else when it rises
+    for name, higher_is_better in [
+        ("repositories_per_second", True),
+        ("api_calls", False),
+        ("peak_rss_mb", False),
+    ]:
+        before, after = previous["median"][name], result["median"][name]
+        if not before:
+            continue
+        change = (after - before) / before
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(
+                f"{name} went from [ {before:.1f} ] to [ {after:.1f} ] ({change:+.0%}) since [ {previous['commit']} ]"
+            )
+    return regressions
+
+
+def print_result(result: dict):
+    median = result["median"]
+    print(
+        f"{result['parameters']['repositories']} repositories, {result['parameters']['fetch_strategy']} strategy with {result['parameters']['client']}, {result['parameters']['max_workers']} workers: "
+        f"{median['repositories_per_second']:.1f} repositories/second, {median['seconds']:.2f} seconds, "
+        f"{median['api_calls']:.0f} API calls, {median['peak_rss_mb']:.1f} MB peak RSS"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the job against a synthetic organisation served locally"
+    )
+    parser.add_argument("--repositories", type=int, default=1000)
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--nesting-depth", type=int, default=3)
+    parser.add_argument("--teams-per-repository", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--fetch-strategy", choices=["rest", "teams", "graphql"], default="rest"
+    )
+    parser.add_argument(
+        "--client",
+        choices=["pygithub", "async"],
+        default="pygithub",
+        help="GitHub client the rest strategy crawls with",
+    )
+    parser.add_argument("--max-workers", type=int, default=1)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0,
+        help="milliseconds the fake GitHub waits before each response",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=1_000_000,
+        help="requests allowed per token in each rate limit window",
+    )
+    parser.add_argument("--rate-limit-window-seconds", type=float, default=3600)
+    parser.add_argument(
+        "--database-url",
+        help="database to run against, emptied before each run; a temporary SQLite database by default",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH)
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=0.1,
+        help="fail when a median is this much worse than the last comparable result",
+    )
+    parser.add_argument("--logging-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_benchmark(
+        {
+            "repositories": args.repositories,
+            "teams": args.teams,
+            "nesting_depth": args.nesting_depth,
+            "teams_per_repository": args.teams_per_repository,
+            "seed": args.seed,
+            "fetch_strategy": args.fetch_strategy,
+            "client": args.client,
+            "max_workers": args.max_workers,
+            "latency_ms": args.latency_ms,
+            "rate_limit": args.rate_limit,
+            "rate_limit_window_seconds": args.rate_limit_window_seconds,
+            "database": (args.database_url or "sqlite").split(":")[0],
+            "logging_level": args.logging_level,
+        },
+        args.database_url,
+        args.runs,
+    )
+    regressions = find_regressions(
+        result, load_results(args.results), args.regression_threshold
+    )
+    save_result(args.results, result)
+    print_result(result)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    sys.exit(1 if regressions else 0)
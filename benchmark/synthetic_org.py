@@ -0,0 +1,135 @@
+import random
+
+from app.jobs.owner_rules import load_owner_rules
+
+# Weighted towards read and write access, as team grants are in the real organisation
+PERMISSIONS = ["admin", "maintain", "push", "triage", "pull"]
+PERMISSION_WEIGHTS = [2, 1, 4, 1, 4]
+
+UNOWNED_REPOSITORY_PREFIX = "service-"
+
+
+class SyntheticTeam:
+    def __init__(self, id: int, name: str, parent: "SyntheticTeam | None" = None):
+        self.id = id
+        self.name = name
+        self.slug = name.lower().replace(" ", "-")
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+
+
+class SyntheticRepository:
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        archived: bool = False,
+        fork: bool = False,
+        team_permissions: dict[str, str] | None = None,
+    ):
+        self.id = id
+        self.name = name
+        self.archived = archived
+        self.fork = fork
+        self.team_permissions = team_permissions or {}
+
+
+class SyntheticOrg:
+    def __init__(
+        self,
+        name: str,
+        teams: list[SyntheticTeam],
+        repositories: list[SyntheticRepository],
+        id: int = 1,
+    ):
+        self.name = name
+        self.id = id
+        self.teams = teams
+        self.repositories = repositories
+        self.teams_by_id = {team.id: team for team in teams}
+        self.teams_by_name = {team.name: team for team in teams}
+        self.teams_by_slug = {team.slug: team for team in teams}
+        self.repositories_by_name = {
+            repository.name: repository for repository in repositories
+        }
+
+    def get_active_repositories(self) -> list[SyntheticRepository]:
+        return [
+            repository
+            for repository in self.repositories
+            if not (repository.archived or repository.fork)
+        ]
+
+    def get_team_repositories(self, team: SyntheticTeam) -> list[SyntheticRepository]:
+        return [
+            repository
+            for repository in self.repositories
+            if team.name in repository.team_permissions
+        ]
+
+    def describe(self) -> str:
+        return f"[ {len(self.repositories)} ] repositories, [ {len(self.teams)} ] teams nested up to [ {max((team.depth for team in self.teams), default=0)} ] deep"
+
+
+def generate_synthetic_org(
+    repositories: int = 1000,
+    teams: int = 100,
+    nesting_depth: int = 3,
+    teams_per_repository: int = 3,
+    archived_ratio: float = 0.05,
+    fork_ratio: float = 0.05,
+    seed: int = 0,
+    organisation_name: str = "ministryofjustice",
+) -> SyntheticOrg:
+    """
+    Generates an organisation shaped like the real one, the same for the same arguments.
+
+    Team and repository names are drawn from the default owner rules first, so the job maps
+    a realistic share of repositories to owners, and the rest are numbered. Each team's parent
+    is picked from the teams above it, so chains are at most nesting_depth parents long.
+    """
+    random_generator = random.Random(seed)
+    owner_rules = load_owner_rules()
+    rule_team_names = [
+        team_name for owner in owner_rules for team_name in owner.get("teams", [])
+    ]
+    rule_prefixes = [
+        prefix for owner in owner_rules for prefix in owner.get("prefixes", [])
+    ]
+
+    synthetic_teams = []
+    team_names = list(dict.fromkeys(rule_team_names))[:teams]
+    team_names += [f"team-{index}" for index in range(len(team_names), teams)]
+    for index, team_name in enumerate(team_names):
+        possible_parents = [
+            team for team in synthetic_teams if team.depth < nesting_depth
+        ]
+        parent = (
+            random_generator.choice(possible_parents)
+            if possible_parents and random_generator.random() < 0.7
+            else None
+        )
+        synthetic_teams.append(SyntheticTeam(index + 1, team_name, parent))
+
+    synthetic_repositories = []
+    prefixes = rule_prefixes + [UNOWNED_REPOSITORY_PREFIX]
+    for index in range(repositories):
+        granted_teams = random_generator.sample(
+            synthetic_teams, min(teams_per_repository, len(synthetic_teams))
+        )
+        synthetic_repositories.append(
+            SyntheticRepository(
+                index + 1,
+                f"{random_generator.choice(prefixes)}{index}",
+                archived=random_generator.random() < archived_ratio,
+                fork=random_generator.random() < fork_ratio,
+                team_permissions={
+                    team.name: random_generator.choices(
+                        PERMISSIONS, PERMISSION_WEIGHTS
+                    )[0]
+                    for team in granted_teams
+                },
+            )
+        )
+
+    return SyntheticOrg(organisation_name, synthetic_teams, synthetic_repositories)
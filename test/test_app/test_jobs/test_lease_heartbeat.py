@@ -0,0 +1,42 @@
+import threading
+import time
+import unittest
+
+from app.jobs.lease_heartbeat import LeaseHeartbeat
+
+
+class TestLeaseHeartbeat(unittest.TestCase):
+    def test_renews_until_the_batch_is_done(self):
+        renewed = threading.Semaphore(0)
+        renewals = []
+
+        def renew():
+            renewals.append(len(renewals))
+            renewed.release()
+
+        with LeaseHeartbeat(renew, interval_seconds=0.01):
+            self.assertTrue(renewed.acquire(timeout=5))
+            self.assertTrue(renewed.acquire(timeout=5))
+        renewals_when_done = len(renewals)
+        time.sleep(0.05)
+
+        self.assertGreaterEqual(renewals_when_done, 2)
+        self.assertEqual(len(renewals), renewals_when_done)
+
+    def test_a_failed_renewal_does_not_stop_the_heartbeat(self):
+        renewed = threading.Event()
+        attempts = []
+
+        def renew():
+            attempts.append(True)
+            if len(attempts) == 1:
+                raise ConnectionError("database unavailable")
+            renewed.set()
+
+        with self.assertLogs("app.jobs.lease_heartbeat", level="ERROR"):
+            with LeaseHeartbeat(renew, interval_seconds=0.01):
+                self.assertTrue(renewed.wait(timeout=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
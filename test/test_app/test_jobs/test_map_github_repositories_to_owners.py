@@ -1,15 +1,50 @@
+import os
+import tempfile
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, call, patch
-from app.jobs.map_github_repositories_to_owners import main
+from app.jobs.map_github_repositories_to_owners import (
+    finalize_repositories,
+    get_additional_github_credentials,
+    main,
+    update_repositories,
+    work_on_repositories,
+)
 from flask import Flask
-from app.main.models import db
+from app.main.models import (
+    Asset,
+    AuthoritativeOwnership,
+    GithubTeam,
+    GithubTeamRepositoryGrant,
+    Owner,
+    Relationship,
+    db,
+)
+from app.main.repositories.asset_repository import AssetRepository, RelationshipPlan
+from app.main.repositories.checkpoint_repository import CheckpointRepository
+from app.main.repositories.data_generation_repository import (
+    OWNERSHIP_GENERATION_NAME,
+    DataGenerationRepository,
+)
+from app.main.repositories.team_repository import TeamRepository
+from app.main.repositories.work_queue_repository import WorkQueueRepository
 
 test_owner_id = 1
 
 
-@patch("app.main.services.github_service.GithubService.__new__")
-@patch("app.main.services.asset_service.AssetService.__new__")
-@patch("app.main.repositories.owner_repository.OwnerRepository.__new__")
+def repository(name: str, teams: list[str]) -> dict:
+    return {
+        "name": name,
+        "github_teams_with_admin_access": teams,
+        "github_teams_with_any_access": teams,
+        "github_teams_with_admin_access_parents": [],
+        "github_teams_with_any_access_parents": [],
+    }
+
+
+@patch("app.jobs.map_github_repositories_to_owners.GithubService")
+@patch("app.jobs.map_github_repositories_to_owners.AssetService")
+@patch("app.jobs.map_github_repositories_to_owners.OwnerRepository")
 class TestMain(unittest.TestCase):
     def setUp(self):
         self.app = Flask(__name__)
@@ -20,13 +55,34 @@ class TestMain(unittest.TestCase):
         with self.app.app_context():
             db.create_all()
 
+    def assert_relationships_applied(
+        self,
+        mock_asset_service: MagicMock,
+        relationships_by_asset_name: dict[str, dict[str, str]],
+        owners: list,
+    ):
+        mock_asset_service.return_value.apply_relationship_plan.assert_called_once()
+        plan, applied_owners = (
+            mock_asset_service.return_value.apply_relationship_plan.call_args.args
+        )
+        self.assertEqual(plan.assets_to_add, sorted(relationships_by_asset_name))
+        self.assertEqual(
+            plan.relationships_to_insert,
+            sorted(
+                (asset_name, owner_name, relationship_type)
+                for asset_name, relationships in relationships_by_asset_name.items()
+                for owner_name, relationship_type in relationships.items()
+            ),
+        )
+        self.assertEqual(applied_owners, owners)
+
     def test_when_team_has_direct_admin_access_then_admin_relationship_created(
         self,
         mock_owner_repository: MagicMock,
         mock_asset_service: MagicMock,
         mock_github_service: MagicMock,
     ):
-        mock_github_service.return_value.get_all_repositories.return_value = [
+        mock_github_service.return_value.iter_all_repositories.return_value = [
             {
                 "name": "Test Repository",
                 "github_teams_with_admin_access": ["Admin Team"],
@@ -35,13 +91,13 @@ class TestMain(unittest.TestCase):
                 "github_teams_with_any_access_parents": [],
             },
         ]
-        mock_asset = MagicMock()
         mock_owner = MagicMock()
         mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
-        mock_asset_service.return_value.add_if_name_does_not_exist.return_value = (
-            mock_asset
-        )
 
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
         with self.app.app_context():
             main(
                 owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
@@ -50,11 +106,10 @@ class TestMain(unittest.TestCase):
         mock_owner_repository.return_value.find_by_name.assert_has_calls(
             [call("Test Owners")]
         )
-        mock_asset_service.return_value.add_if_name_does_not_exist.assert_has_calls(
-            [call("Test Repository")]
-        )
-        mock_asset_service.return_value.update_relationships_with_owner.assert_has_calls(
-            [call(mock_asset, mock_owner, "ADMIN_ACCESS")]
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"Test Repository": {"Test Owners": "ADMIN_ACCESS"}},
+            [mock_owner],
         )
 
     def test_when_parent_team_has_admin_access_then_admin_relationship_created(
@@ -63,7 +118,7 @@ class TestMain(unittest.TestCase):
         mock_asset_service: MagicMock,
         mock_github_service: MagicMock,
     ):
-        mock_github_service.return_value.get_all_repositories.return_value = [
+        mock_github_service.return_value.iter_all_repositories.return_value = [
             {
                 "name": "Test Repository",
                 "github_teams_with_admin_access": [],
@@ -72,13 +127,13 @@ class TestMain(unittest.TestCase):
                 "github_teams_with_any_access_parents": [],
             },
         ]
-        mock_asset = MagicMock()
         mock_owner = MagicMock()
         mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
-        mock_asset_service.return_value.add_if_name_does_not_exist.return_value = (
-            mock_asset
-        )
 
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
         with self.app.app_context():
             main(
                 owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
@@ -87,11 +142,10 @@ class TestMain(unittest.TestCase):
         mock_owner_repository.return_value.find_by_name.assert_has_calls(
             [call("Test Owners")]
         )
-        mock_asset_service.return_value.add_if_name_does_not_exist.assert_has_calls(
-            [call("Test Repository")]
-        )
-        mock_asset_service.return_value.update_relationships_with_owner.assert_has_calls(
-            [call(mock_asset, mock_owner, "ADMIN_ACCESS")]
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"Test Repository": {"Test Owners": "ADMIN_ACCESS"}},
+            [mock_owner],
         )
 
     def test_when_team_has_any_access_then_default_relationship_created(
@@ -100,7 +154,7 @@ class TestMain(unittest.TestCase):
         mock_asset_service: MagicMock,
         mock_github_service: MagicMock,
     ):
-        mock_github_service.return_value.get_all_repositories.return_value = [
+        mock_github_service.return_value.iter_all_repositories.return_value = [
             {
                 "name": "Test Repository",
                 "github_teams_with_admin_access": [],
@@ -109,13 +163,13 @@ class TestMain(unittest.TestCase):
                 "github_teams_with_any_access_parents": [],
             },
         ]
-        mock_asset = MagicMock()
         mock_owner = MagicMock()
         mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
-        mock_asset_service.return_value.add_if_name_does_not_exist.return_value = (
-            mock_asset
-        )
 
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
         with self.app.app_context():
             main(
                 owners=[{"name": "Test Owners", "teams": ["Test Team"]}],
@@ -124,11 +178,10 @@ class TestMain(unittest.TestCase):
         mock_owner_repository.return_value.find_by_name.assert_has_calls(
             [call("Test Owners")]
         )
-        mock_asset_service.return_value.add_if_name_does_not_exist.assert_has_calls(
-            [call("Test Repository")]
-        )
-        mock_asset_service.return_value.update_relationships_with_owner.assert_has_calls(
-            [call(mock_asset, mock_owner, "OTHER")]
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"Test Repository": {"Test Owners": "OTHER"}},
+            [mock_owner],
         )
 
     def test_when_parent_team_has_any_access_then_default_relationship_created(
@@ -137,7 +190,7 @@ class TestMain(unittest.TestCase):
         mock_asset_service: MagicMock,
         mock_github_service: MagicMock,
     ):
-        mock_github_service.return_value.get_all_repositories.return_value = [
+        mock_github_service.return_value.iter_all_repositories.return_value = [
             {
                 "name": "Test Repository",
                 "github_teams_with_admin_access": [],
@@ -147,13 +200,13 @@ class TestMain(unittest.TestCase):
             },
         ]
 
-        mock_asset = MagicMock()
         mock_owner = MagicMock()
         mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
-        mock_asset_service.return_value.add_if_name_does_not_exist.return_value = (
-            mock_asset
-        )
 
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
         with self.app.app_context():
             main(
                 owners=[{"name": "Test Owners", "teams": ["Test Team"]}],
@@ -162,11 +215,10 @@ class TestMain(unittest.TestCase):
         mock_owner_repository.return_value.find_by_name.assert_has_calls(
             [call("Test Owners")]
         )
-        mock_asset_service.return_value.add_if_name_does_not_exist.assert_has_calls(
-            [call("Test Repository")]
-        )
-        mock_asset_service.return_value.update_relationships_with_owner.assert_has_calls(
-            [call(mock_asset, mock_owner, "OTHER")]
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"Test Repository": {"Test Owners": "OTHER"}},
+            [mock_owner],
         )
 
     def test_when_prefix_matches_repository_name_then_default_relationship_created(
@@ -175,7 +227,7 @@ class TestMain(unittest.TestCase):
         mock_asset_service: MagicMock,
         mock_github_service: MagicMock,
     ):
-        mock_github_service.return_value.get_all_repositories.return_value = [
+        mock_github_service.return_value.iter_all_repositories.return_value = [
             {
                 "name": "test-prefix-Test Repository",
                 "github_teams_with_admin_access": [],
@@ -184,20 +236,20 @@ class TestMain(unittest.TestCase):
                 "github_teams_with_any_access_parents": [],
             },
         ]
-        mock_asset = MagicMock()
         mock_owner = MagicMock()
         mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
-        mock_asset_service.return_value.add_if_name_does_not_exist.return_value = (
-            mock_asset
-        )
 
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
         with self.app.app_context():
             main(
                 owners=[
                     {
                         "name": "Test Owners",
                         "teams": ["Test Team"],
-                        "prefix": "test-prefix-",
+                        "prefixes": ["test-prefix-"],
                     }
                 ],
             )
@@ -205,13 +257,790 @@ class TestMain(unittest.TestCase):
         mock_owner_repository.return_value.find_by_name.assert_has_calls(
             [call("Test Owners")]
         )
-        mock_asset_service.return_value.add_if_name_does_not_exist.assert_has_calls(
-            [call("test-prefix-Test Repository")]
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"test-prefix-Test Repository": {"Test Owners": "OTHER"}},
+            [mock_owner],
+        )
+
+    def test_when_multiple_owners_match_then_admin_access_takes_precedence_per_owner(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        mock_github_service.return_value.iter_all_repositories.return_value = [
+            {
+                "name": "test-prefix-Test Repository",
+                "github_teams_with_admin_access": ["Admin Team"],
+                "github_teams_with_any_access": ["Admin Team"],
+                "github_teams_with_admin_access_parents": [],
+                "github_teams_with_any_access_parents": [],
+            },
+            {
+                "name": "Another Repository",
+                "github_teams_with_admin_access": [],
+                "github_teams_with_any_access": [],
+                "github_teams_with_admin_access_parents": [],
+                "github_teams_with_any_access_parents": [],
+            },
+        ]
+        mock_admin_owner = MagicMock()
+        mock_prefix_owner = MagicMock()
+        mock_owner_repository.return_value.find_by_name.side_effect = [
+            [mock_admin_owner],
+            [mock_prefix_owner],
+        ]
+
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
         )
-        mock_asset_service.return_value.update_relationships_with_owner.assert_has_calls(
-            [call(mock_asset, mock_owner, "OTHER")]
+        with self.app.app_context():
+            main(
+                owners=[
+                    {"name": "Admin Owners", "teams": ["Admin Team"]},
+                    {
+                        "name": "Prefix Owners",
+                        "teams": ["Test Team"],
+                        "prefixes": ["test-prefix-"],
+                    },
+                ],
+            )
+
+        self.assertEqual(mock_owner_repository.return_value.find_by_name.call_count, 2)
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {
+                "test-prefix-Test Repository": {
+                    "Admin Owners": "ADMIN_ACCESS",
+                    "Prefix Owners": "OTHER",
+                },
+                "Another Repository": {},
+            },
+            [mock_admin_owner, mock_prefix_owner],
         )
 
+    def test_when_checkpoint_exists_then_checkpointed_repositories_are_not_fetched_again(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        checkpointed_repository = {
+            "name": "Checkpointed Repository",
+            "github_teams_with_admin_access": ["Admin Team"],
+            "github_teams_with_any_access": [],
+            "github_teams_with_admin_access_parents": [],
+            "github_teams_with_any_access_parents": [],
+        }
+        mock_github_service.return_value.iter_all_repositories.return_value = [
+            {
+                "name": "Test Repository",
+                "github_teams_with_admin_access": [],
+                "github_teams_with_any_access": ["Admin Team"],
+                "github_teams_with_admin_access_parents": [],
+                "github_teams_with_any_access_parents": [],
+            },
+        ]
+        mock_owner = MagicMock()
+        mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
+
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
+        with self.app.app_context():
+            CheckpointRepository(db.session).save(
+                [checkpointed_repository], datetime.now(timezone.utc)
+            )
+            main(
+                owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+            )
+            checkpoint_status = CheckpointRepository(db.session).get_status()
+
+        mock_github_service.return_value.iter_all_repositories.assert_called_once_with(
+            previous_repositories=None,
+            since=None,
+            repository_names_to_skip={"Checkpointed Repository"},
+        )
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"Test Repository": {"Test Owners": "OTHER"}},
+            [mock_owner],
+        )
+        self.assertEqual(checkpoint_status["repositories"], 0)
+
+    def test_when_planning_then_changes_are_printed_and_not_applied(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        mock_github_service.return_value.iter_all_repositories.return_value = [
+            {
+                "name": "Test Repository",
+                "github_teams_with_admin_access": ["Admin Team"],
+                "github_teams_with_any_access": ["Admin Team"],
+                "github_teams_with_admin_access_parents": [],
+                "github_teams_with_any_access_parents": [],
+            },
+        ]
+        mock_owner_repository.return_value.find_by_name.return_value = [MagicMock()]
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {
+                ("Test Repository", "Test Owners"): (1, "OTHER"),
+                ("Test Repository", "Other Owners"): (2, "OTHER"),
+            },
+            {"Test Repository"},
+        )
+
+        with self.app.app_context(), patch("builtins.print") as mock_print:
+            main(
+                owners=[
+                    {"name": "Test Owners", "teams": ["Admin Team"]},
+                    {"name": "Other Owners", "teams": ["Other Team"]},
+                ],
+                plan_only=True,
+            )
+            checkpoint_status = CheckpointRepository(db.session).get_status()
+
+        mock_asset_service.return_value.apply_relationship_plan.assert_not_called()
+        self.assertEqual(checkpoint_status["repositories"], 0)
+        printed_plan = mock_print.call_args.args[0]
+        self.assertIn(
+            "~ Test Repository -> Test Owners [ OTHER ] => [ ADMIN_ACCESS ]",
+            printed_plan,
+        )
+        self.assertIn("- Test Repository -> Other Owners [ OTHER ]", printed_plan)
+
+    def test_when_mapping_from_snapshot_then_github_is_not_crawled(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        repository = {
+            "name": "Test Repository",
+            "github_teams_with_admin_access": ["Admin Team"],
+            "github_teams_with_any_access": ["Admin Team"],
+            "github_teams_with_admin_access_parents": [],
+            "github_teams_with_any_access_parents": [],
+        }
+        mock_github_service.return_value.iter_all_repositories.return_value = [
+            repository
+        ]
+        mock_github_service.return_value.organisation_name = "ministryofjustice"
+        mock_owner = MagicMock()
+        mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
+        owners = [{"name": "Test Owners", "teams": ["Admin Team"]}]
+
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, "snapshot.jsonl.gz")
+            mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+                {},
+                set(),
+            )
+            with self.app.app_context():
+                main(owners=owners, plan_only=True, snapshot_output=snapshot_path)
+                mock_github_service.reset_mock()
+                main(owners=owners, snapshot_input=snapshot_path)
+
+        mock_github_service.assert_not_called()
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {"Test Repository": {"Test Owners": "ADMIN_ACCESS"}},
+            [mock_owner],
+        )
+
+    def test_when_worker_runs_then_enqueued_repositories_are_mapped_and_finalized(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        mock_github_service.return_value.get_repositories_by_name.side_effect = (
+            lambda names: [
+                {
+                    "name": name,
+                    "github_teams_with_admin_access": ["Admin Team"],
+                    "github_teams_with_any_access": ["Admin Team"],
+                    "github_teams_with_admin_access_parents": [],
+                    "github_teams_with_any_access_parents": [],
+                }
+                for name in names
+            ]
+        )
+        mock_asset_service.return_value.apply_relationship_plan.return_value = {
+            "inserted": 2,
+            "updated": 0,
+            "deleted": 0,
+            "unchanged": 0,
+        }
+        mock_owner = MagicMock()
+        mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
+        sleep = MagicMock()
+
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
+        with self.app.app_context():
+            WorkQueueRepository(db.session).enqueue(
+                ["repository-one", "repository-two"]
+            )
+            work_on_repositories(
+                "worker-1",
+                owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+                sleep=sleep,
+            )
+            status_after_work = WorkQueueRepository(db.session).get_status()
+            finalize_repositories(sleep=sleep)
+            status_after_finalize = WorkQueueRepository(db.session).get_status()
+
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {
+                "repository-one": {"Test Owners": "ADMIN_ACCESS"},
+                "repository-two": {"Test Owners": "ADMIN_ACCESS"},
+            },
+            [mock_owner],
+        )
+        sleep.assert_not_called()
+        self.assertEqual(
+            status_after_work, {"PENDING": 0, "CLAIMED": 0, "DONE": 2, "FAILED": 0}
+        )
+        self.assertEqual(
+            status_after_finalize, {"PENDING": 0, "CLAIMED": 0, "DONE": 0, "FAILED": 0}
+        )
+
+    @patch(
+        "app.jobs.map_github_repositories_to_owners.app_config.github.organisations",
+        ["ministryofjustice", "moj-analytical-services"],
+    )
+    def test_when_several_organisations_are_configured_then_each_is_crawled(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        def create_github_service(*args, organisation_name: str, **kwargs):
+            github_service = MagicMock()
+            github_service.organisation_name = organisation_name
+            github_service.iter_all_repositories.return_value = [
+                {
+                    "name": (
+                        "data-repository"
+                        if organisation_name == "ministryofjustice"
+                        else f"{organisation_name}/data-repository"
+                    ),
+                    "github_teams_with_admin_access": [],
+                    "github_teams_with_any_access": [],
+                    "github_teams_with_admin_access_parents": [],
+                    "github_teams_with_any_access_parents": [],
+                },
+            ]
+            return github_service
+
+        mock_github_service.side_effect = create_github_service
+        mock_owner = MagicMock()
+        mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {},
+            set(),
+        )
+
+        with self.app.app_context():
+            main(owners=[{"name": "Data Owners", "prefixes": ["data-"]}])
+
+        self.assertEqual(
+            [
+                (
+                    service_call.kwargs["organisation_name"],
+                    service_call.kwargs["primary_organisation_name"],
+                )
+                for service_call in mock_github_service.call_args_list
+            ],
+            [
+                ("ministryofjustice", "ministryofjustice"),
+                ("moj-analytical-services", "ministryofjustice"),
+            ],
+        )
+        self.assert_relationships_applied(
+            mock_asset_service,
+            {
+                "data-repository": {"Data Owners": "OTHER"},
+                "moj-analytical-services/data-repository": {"Data Owners": "OTHER"},
+            },
+            [mock_owner],
+        )
+
+    def test_when_updating_repositories_then_only_those_are_mapped_or_removed(
+        self,
+        mock_owner_repository: MagicMock,
+        mock_asset_service: MagicMock,
+        mock_github_service: MagicMock,
+    ):
+        mock_github_service.return_value.get_repositories_by_name.return_value = [
+            {
+                "name": "laa-apply-for-civil-legal-aid",
+                "github_teams_with_admin_access": ["LAA Admins"],
+                "github_teams_with_any_access": ["LAA Admins"],
+                "github_teams_with_admin_access_parents": [],
+                "github_teams_with_any_access_parents": [],
+            }
+        ]
+        mock_github_service.return_value.organisation_name = "ministryofjustice"
+        mock_github_service.return_value.get_team_parents.return_value = {
+            "LAA Admins": None
+        }
+        mock_asset_service.return_value.apply_relationship_plan.return_value = {
+            "inserted": 1,
+            "updated": 0,
+            "deleted": 1,
+            "unchanged": 0,
+        }
+        mock_owner = MagicMock()
+        mock_owner_repository.return_value.find_by_name.return_value = [mock_owner]
+        mock_asset_service.return_value.find_relationships_with_owners.return_value = (
+            {
+                ("laa-apply-for-legal-aid", "LAA"): (7, "ADMIN_ACCESS"),
+                ("laa-crime-apply", "LAA"): (8, "ADMIN_ACCESS"),
+            },
+            {"laa-apply-for-legal-aid", "laa-crime-apply"},
+        )
+
+        with self.app.app_context():
+            update_repositories(
+                {
+                    "laa-apply-for-legal-aid": "REMOVE",
+                    "laa-apply-for-civil-legal-aid": "REFRESH",
+                    "laa-never-mapped": "REMOVE",
+                },
+                owners=[{"name": "LAA", "teams": ["LAA Admins"]}],
+            )
+            repository_names = TeamRepository(
+                db.session
+            ).find_repository_names_with_access_by_team_or_descendants("LAA Admins")
+            generation = DataGenerationRepository(db.session).find_generation(
+                OWNERSHIP_GENERATION_NAME
+            )
+
+        mock_github_service.return_value.get_repositories_by_name.assert_called_once_with(
+            ["laa-apply-for-civil-legal-aid"]
+        )
+        plan, _ = mock_asset_service.return_value.apply_relationship_plan.call_args.args
+        self.assertEqual(plan.assets_to_add, ["laa-apply-for-civil-legal-aid"])
+        self.assertEqual(
+            plan.relationships_to_insert,
+            [("laa-apply-for-civil-legal-aid", "LAA", "ADMIN_ACCESS")],
+        )
+        self.assertEqual(plan.relationships_to_delete, [])
+        mock_asset_service.return_value.delete_assets_by_name.assert_called_once_with(
+            ["laa-apply-for-legal-aid", "laa-never-mapped"]
+        )
+        self.assertEqual(repository_names, ["laa-apply-for-civil-legal-aid"])
+        self.assertEqual(generation, 1)
+
+
+@patch("app.jobs.map_github_repositories_to_owners.GithubService")
+class TestMappingWrites(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.owner = Owner(name="Test Owners")
+        db.session.add(self.owner)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_when_a_batch_is_written_twice_then_the_second_write_changes_nothing(
+        self, mock_github_service: MagicMock
+    ):
+        relationships_by_asset_name = {
+            "repository-one": {"Test Owners": "ADMIN_ACCESS"},
+            "repository-two": {"Test Owners": "ADMIN_ACCESS"},
+        }
+
+        def get_repositories_by_name(names: list[str]):
+            # Another worker writes the same batch while this one fetches it
+            AssetRepository(db.session).apply_relationship_plan(
+                RelationshipPlan.from_relationships(
+                    {}, set(), relationships_by_asset_name
+                ),
+                [self.owner],
+            )
+            return [
+                {
+                    "name": name,
+                    "github_teams_with_admin_access": ["Admin Team"],
+                    "github_teams_with_any_access": ["Admin Team"],
+                    "github_teams_with_admin_access_parents": [],
+                    "github_teams_with_any_access_parents": [],
+                }
+                for name in names
+            ]
+
+        mock_github_service.return_value.get_repositories_by_name.side_effect = (
+            get_repositories_by_name
+        )
+        WorkQueueRepository(db.session).enqueue(list(relationships_by_asset_name))
+
+        with self.assertLogs(
+            "app.jobs.map_github_repositories_to_owners", level="INFO"
+        ) as logs:
+            work_on_repositories(
+                "worker-1",
+                owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+                sleep=MagicMock(),
+            )
+
+        self.assertIn(
+            "relationships inserted [ 0 ] updated [ 0 ] deleted [ 0 ] unchanged [ 2 ]",
+            "\n".join(logs.output),
+        )
+        self.assertEqual(
+            sorted(
+                (relationship.asset.name, relationship.type)
+                for relationship in db.session.query(Relationship).all()
+            ),
+            [("repository-one", "ADMIN_ACCESS"), ("repository-two", "ADMIN_ACCESS")],
+        )
+
+    @patch(
+        "app.jobs.map_github_repositories_to_owners.app_config.checkpoint.chunk_size", 1
+    )
+    def test_when_running_then_the_changes_of_every_batch_are_counted(
+        self, mock_github_service: MagicMock
+    ):
+        mock_github_service.return_value.iter_all_repositories.return_value = [
+            repository("repository-one", ["Admin Team"]),
+            repository("repository-two", ["Admin Team"]),
+        ]
+        mock_github_service.return_value.organisation_name = "ministryofjustice"
+
+        with self.assertLogs(
+            "app.jobs.map_github_repositories_to_owners", level="INFO"
+        ) as logs, patch.object(RelationshipPlan, "extend") as mock_extend:
+            main(owners=[{"name": "Test Owners", "teams": ["Admin Team"]}])
+
+        self.assertIn(
+            "Relationships inserted [ 2 ] updated [ 0 ] deleted [ 0 ] unchanged [ 0 ]",
+            "\n".join(logs.output),
+        )
+        mock_extend.assert_not_called()
+
+    def test_when_a_repository_is_no_longer_crawled_then_a_full_run_removes_it(
+        self, mock_github_service: MagicMock
+    ):
+        mock_github_service.return_value.iter_all_repositories.return_value = [
+            repository("repository-one", ["Admin Team"])
+        ]
+        mock_github_service.return_value.organisation_name = "ministryofjustice"
+        AssetRepository(db.session).apply_relationship_plan(
+            RelationshipPlan.from_relationships(
+                {}, set(), {"archived-repository": {"Test Owners": "ADMIN_ACCESS"}}
+            ),
+            [self.owner],
+        )
+
+        with patch("builtins.print") as mock_print:
+            main(
+                owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+                plan_only=True,
+            )
+        printed_plan = mock_print.call_args.args[0]
+        with self.assertLogs(
+            "app.jobs.map_github_repositories_to_owners", level="INFO"
+        ) as logs:
+            main(owners=[{"name": "Test Owners", "teams": ["Admin Team"]}])
+
+        self.assertIn("- asset archived-repository", printed_plan)
+        self.assertIn(
+            "- archived-repository -> Test Owners [ ADMIN_ACCESS ]", printed_plan
+        )
+        self.assertIn(
+            "Assets to add [ 1 ] delete [ 1 ] relationships to insert [ 1 ] update [ 0 ] delete [ 1 ] unchanged [ 0 ]",
+            printed_plan,
+        )
+        self.assertIn(
+            "Removed [ 1 ] repositories no longer mapped, relationships deleted [ 1 ]",
+            "\n".join(logs.output),
+        )
+        self.assertEqual(
+            [asset.name for asset in db.session.query(Asset).all()], ["repository-one"]
+        )
+        self.assertEqual(
+            [
+                (relationship.asset.name, relationship.type)
+                for relationship in db.session.query(Relationship).all()
+            ],
+            [("repository-one", "ADMIN_ACCESS")],
+        )
+        self.assertEqual(
+            [
+                ownership.asset_id
+                for ownership in db.session.query(AuthoritativeOwnership).all()
+            ],
+            [db.session.query(Asset).one().id],
+        )
+
+    def test_when_finalizing_then_grants_and_teams_of_repositories_not_mapped_are_removed(
+        self, mock_github_service: MagicMock
+    ):
+        mock_github_service.return_value.get_repositories_by_name.side_effect = (
+            lambda names: [repository(name, ["Admin Team"]) for name in names]
+        )
+        mock_github_service.return_value.organisation_name = "ministryofjustice"
+        mock_github_service.return_value.get_team_parents.return_value = {
+            "Admin Team": None
+        }
+        team_repository = TeamRepository(db.session)
+        team_repository.save_teams({"Admin Team": None, "Archived Team": None})
+        team_repository.save_repository_grants(
+            [repository("archived-repository", ["Archived Team"])]
+        )
+        WorkQueueRepository(db.session).enqueue(["repository-one"])
+
+        work_on_repositories(
+            "worker-1",
+            owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+            sleep=MagicMock(),
+        )
+        generation_after_work = DataGenerationRepository(db.session).find_generation(
+            OWNERSHIP_GENERATION_NAME
+        )
+        finalize_repositories(
+            owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+            sleep=MagicMock(),
+        )
+
+        self.assertEqual(
+            sorted(
+                grant.repository_name
+                for grant in db.session.query(GithubTeamRepositoryGrant).all()
+            ),
+            ["repository-one"],
+        )
+        self.assertEqual(
+            [team.name for team in db.session.query(GithubTeam).all()], ["Admin Team"]
+        )
+        self.assertEqual(generation_after_work, 0)
+        self.assertEqual(
+            DataGenerationRepository(db.session).find_generation(
+                OWNERSHIP_GENERATION_NAME
+            ),
+            1,
+        )
+
+    def test_when_a_repository_is_not_found_then_the_worker_removes_it(
+        self, mock_github_service: MagicMock
+    ):
+        mock_github_service.return_value.get_repositories_by_name.return_value = [
+            repository("repository-one", ["Admin Team"])
+        ]
+        mock_github_service.return_value.organisation_name = "ministryofjustice"
+        AssetRepository(db.session).apply_relationship_plan(
+            RelationshipPlan.from_relationships(
+                {}, set(), {"deleted-repository": {"Test Owners": "OTHER"}}
+            ),
+            [self.owner],
+        )
+        TeamRepository(db.session).save_repository_grants(
+            [repository("deleted-repository", ["Admin Team"])]
+        )
+        WorkQueueRepository(db.session).enqueue(
+            ["repository-one", "deleted-repository"]
+        )
+
+        work_on_repositories(
+            "worker-1",
+            owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+            sleep=MagicMock(),
+        )
+
+        self.assertEqual(
+            [
+                (relationship.asset.name, relationship.type)
+                for relationship in db.session.query(Relationship).all()
+            ],
+            [("repository-one", "ADMIN_ACCESS")],
+        )
+        self.assertEqual(
+            [
+                grant.repository_name
+                for grant in db.session.query(GithubTeamRepositoryGrant).all()
+            ],
+            ["repository-one"],
+        )
+        self.assertEqual(
+            WorkQueueRepository(db.session).get_status(),
+            {"PENDING": 0, "CLAIMED": 0, "DONE": 2, "FAILED": 0},
+        )
+
+    def test_when_an_updated_repository_is_not_found_then_it_is_removed_and_the_rest_mapped(
+        self, mock_github_service: MagicMock
+    ):
+        github_service = MagicMock()
+        github_service.organisation_name = "ministryofjustice"
+        github_service.get_team_parents.return_value = {}
+        github_service.get_repositories_by_name.return_value = [
+            repository("repository-one", ["Admin Team"])
+        ]
+        AssetRepository(db.session).apply_relationship_plan(
+            RelationshipPlan.from_relationships(
+                {}, set(), {"deleted-repository": {"Test Owners": "OTHER"}}
+            ),
+            [self.owner],
+        )
+        TeamRepository(db.session).save_repository_grants(
+            [repository("deleted-repository", ["Admin Team"])]
+        )
+
+        update_repositories(
+            {"repository-one": "REFRESH", "deleted-repository": "REFRESH"},
+            owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+            github_services={"ministryofjustice": github_service},
+        )
+
+        mock_github_service.assert_not_called()
+        self.assertEqual(
+            [
+                (relationship.asset.name, relationship.type)
+                for relationship in db.session.query(Relationship).all()
+            ],
+            [("repository-one", "ADMIN_ACCESS")],
+        )
+        self.assertEqual(
+            [
+                grant.repository_name
+                for grant in db.session.query(GithubTeamRepositoryGrant).all()
+            ],
+            ["repository-one"],
+        )
+
+    @patch(
+        "app.jobs.map_github_repositories_to_owners.app_config.work_queue.max_attempts",
+        1,
+    )
+    def test_when_finalizing_then_failed_repositories_are_reported_and_kept(
+        self, mock_github_service: MagicMock
+    ):
+        TeamRepository(db.session).save_repository_grants(
+            [
+                repository("repository-one", ["Admin Team"]),
+                repository("failing-repository", ["Admin Team"]),
+            ]
+        )
+        work_queue_repository = WorkQueueRepository(db.session)
+        work_queue_repository.enqueue(["repository-one", "failing-repository"])
+        # The worker crashes after the first repository, and its lease has since expired
+        work_queue_repository.claim_batch(
+            "worker-1", 2, timedelta(minutes=-1), datetime.now(timezone.utc)
+        )
+        work_queue_repository.complete("worker-1", ["repository-one"])
+
+        with self.assertLogs(
+            "app.jobs.map_github_repositories_to_owners", level="WARNING"
+        ) as logs:
+            finalize_repositories(
+                owners=[{"name": "Test Owners", "teams": ["Admin Team"]}],
+                sleep=MagicMock(),
+            )
+
+        self.assertIn(
+            "Failed to map [ 1 ] repositories after [ 1 ] attempts",
+            "\n".join(logs.output),
+        )
+        self.assertEqual(
+            sorted(
+                grant.repository_name
+                for grant in db.session.query(GithubTeamRepositoryGrant).all()
+            ),
+            ["failing-repository", "repository-one"],
+        )
+        self.assertEqual(
+            work_queue_repository.get_status(),
+            {"PENDING": 0, "CLAIMED": 0, "DONE": 0, "FAILED": 0},
+        )
+
+
+@patch(
+    "app.jobs.map_github_repositories_to_owners.app_config.github.organisations",
+    ["ministryofjustice", "moj-analytical-services", "ministryofjustice-test"],
+)
+@patch(
+    "app.jobs.map_github_repositories_to_owners.app_config.github.additional_tokens",
+    {None: ["primary-token"], "moj-analytical-services": ["analytical-token"]},
+)
+@patch(
+    "app.jobs.map_github_repositories_to_owners.app_config.github.app_installation_ids",
+    {"moj-analytical-services": ["42"]},
+)
+@patch("app.jobs.map_github_repositories_to_owners.app_config.github.app_id", "1")
+@patch(
+    "app.jobs.map_github_repositories_to_owners.app_config.github.app_private_key",
+    "private-key",
+)
+@patch("app.jobs.map_github_repositories_to_owners.find_app_installation_id")
+class TestGithubCredentials(unittest.TestCase):
+    def credentials_of(self, organisation_name: str) -> list[tuple[str, str]]:
+        return [
+            (
+                type(credential).__name__,
+                getattr(credential, "token", None)
+                or str(getattr(credential, "installation_id", "")),
+            )
+            for credential in get_additional_github_credentials(organisation_name)
+        ]
+
+    def test_each_organisation_only_gets_its_own_credentials(
+        self, mock_find_app_installation_id: MagicMock
+    ):
+        mock_find_app_installation_id.side_effect = (
+            lambda app_id, private_key, organisation_name, api_url: (
+                7 if organisation_name == "ministryofjustice" else None
+            )
+        )
+
+        self.assertEqual(
+            self.credentials_of("ministryofjustice"),
+            [
+                ("GithubTokenCredential", "primary-token"),
+                ("GithubAppInstallationCredential", "7"),
+            ],
+        )
+        self.assertEqual(
+            self.credentials_of("moj-analytical-services"),
+            [
+                ("GithubTokenCredential", "analytical-token"),
+                ("GithubAppInstallationCredential", "42"),
+            ],
+        )
+        self.assertEqual(self.credentials_of("ministryofjustice-test"), [])
+        self.assertEqual(
+            [lookup.args[2] for lookup in mock_find_app_installation_id.call_args_list],
+            ["ministryofjustice", "ministryofjustice-test"],
+        )
+
+    def test_several_installations_for_one_organisation_are_rejected(
+        self, mock_find_app_installation_id: MagicMock
+    ):
+        with patch(
+            "app.jobs.map_github_repositories_to_owners.app_config.github.app_installation_ids",
+            {None: ["7"], "ministryofjustice": ["8"]},
+        ), self.assertRaises(ValueError):
+            get_additional_github_credentials("ministryofjustice")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+
+from app.jobs.owner_rules import CombinedRegexes, OwnerMatcher, load_owner_rules
+
+
+def repository(name: str, admin_teams: list[str] = [], any_teams: list[str] = []):
+    return {
+        "name": name,
+        "github_teams_with_admin_access": admin_teams,
+        "github_teams_with_admin_access_parents": [],
+        "github_teams_with_any_access": any_teams,
+        "github_teams_with_any_access_parents": [],
+    }
+
+
+class TestOwnerMatcher(unittest.TestCase):
+    def setUp(self):
+        self.owner_matcher = OwnerMatcher(
+            [
+                {
+                    "name": "LAA",
+                    "teams": ["LAA Admins"],
+                    "team_globs": ["LAA Crime *"],
+                    "prefixes": ["laa-", "cla-"],
+                },
+                {"name": "Platforms", "suffixes": ["-platform"]},
+                {"name": "Data", "regexes": ["^data-(catalogue|engineering)"]},
+            ]
+        )
+
+    def test_reports_the_rule_that_matched_each_owner(self):
+        matches = self.owner_matcher.match_repository(
+            repository("cla-data-engineering-platform")
+        )
+
+        self.assertEqual(
+            matches,
+            {
+                "LAA": ("OTHER", "prefix:cla-"),
+                "Platforms": ("OTHER", "suffix:-platform"),
+            },
+        )
+
+    def test_team_glob_and_regex_rules_match(self):
+        self.assertEqual(
+            self.owner_matcher.match_repository(
+                repository("data-catalogue", any_teams=["LAA Crime Apply"])
+            ),
+            {
+                "LAA": ("OTHER", "team_glob:LAA Crime *"),
+                "Data": ("OTHER", "regex:^data-(catalogue|engineering)"),
+            },
+        )
+
+    def test_name_rules_ignore_the_organisation_qualifier(self):
+        self.assertEqual(
+            self.owner_matcher.match_repository(
+                repository("moj-analytical-services/data-engineering")
+            ),
+            {"Data": ("OTHER", "regex:^data-(catalogue|engineering)")},
+        )
+
+    def test_admin_access_takes_precedence_over_name_rules(self):
+        self.assertEqual(
+            self.owner_matcher.match_repository(
+                repository("laa-apply", admin_teams=["LAA Admins"])
+            ),
+            {"LAA": ("ADMIN_ACCESS", "team:LAA Admins")},
+        )
+
+
+class TestCombinedRegexes(unittest.TestCase):
+    def test_finds_every_regex_that_a_single_search_would_find(self):
+        patterns = [
+            "^data-(catalogue|engineering)",
+            "engineering",
+            "-platform$",
+            "(?i)^DATA",
+            "(?P<word>[a-z]+)-(?P=word)",
+            r"(a)\1",
+            "^platform",
+        ]
+        combined_regexes = CombinedRegexes(patterns)
+
+        for name in ["data-engineering-platform", "aa-aa", "platform-tools", ""]:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    combined_regexes.find_matching_indexes(name),
+                    [
+                        index
+                        for index, pattern in enumerate(patterns)
+                        if re.search(pattern, name)
+                    ],
+                )
+
+
+class TestLoadOwnerRules(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "owner_rules.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_rules(self, rules: dict):
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(rules, file)
+
+    def test_default_rules_file_is_valid(self):
+        owners = load_owner_rules()
+
+        self.assertIn("HMPPS", [owner["name"] for owner in owners])
+        OwnerMatcher(owners)
+
+    def test_rejects_unsupported_version(self):
+        self.write_rules({"version": 2, "owners": [{"name": "OPG"}]})
+
+        with self.assertRaises(ValueError):
+            load_owner_rules(self.path)
+
+    def test_rejects_invalid_rules(self):
+        for owners in [
+            [{"name": "OPG", "prefix": "opg-"}],
+            [{"name": "OPG", "prefixes": "opg-"}],
+            [{"name": "OPG", "regexes": ["opg-("]}],
+            [{"name": "OPG"}, {"name": "OPG"}],
+        ]:
+            with self.subTest(owners=owners):
+                self.write_rules({"version": 1, "owners": owners})
+                with self.assertRaises(ValueError):
+                    load_owner_rules(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
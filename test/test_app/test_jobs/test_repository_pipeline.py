@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+
+from app.jobs.repository_pipeline import RepositoryPipeline, iter_concurrently
+
+
+class TestRepositoryPipeline(unittest.TestCase):
+    def test_when_repositories_are_fetched_then_they_are_written_in_batches(self):
+        repositories = ({"name": f"repository-{index}"} for index in range(5))
+        batches = []
+
+        pipeline = RepositoryPipeline(queue_size=2, batch_size=2)
+        pipeline.run(
+            repositories, lambda repository: repository["name"], batches.append
+        )
+
+        self.assertEqual(
+            batches,
+            [
+                ["repository-0", "repository-1"],
+                ["repository-2", "repository-3"],
+                ["repository-4"],
+            ],
+        )
+        self.assertEqual(pipeline.fetch_stage.items, 5)
+        self.assertEqual(pipeline.classify_stage.items, 5)
+        self.assertEqual(pipeline.write_stage.items, 5)
+
+    def test_when_fetching_fails_then_the_error_is_raised_after_earlier_batches_are_written(
+        self,
+    ):
+        def repositories():
+            yield {"name": "repository-0"}
+            yield {"name": "repository-1"}
+            raise ValueError("GitHub is down")
+
+        batches = []
+
+        with self.assertRaises(ValueError):
+            RepositoryPipeline(batch_size=1).run(
+                repositories(), lambda repository: repository["name"], batches.append
+            )
+
+        self.assertEqual(batches, [["repository-0"], ["repository-1"]])
+
+    def test_when_writing_fails_then_fetching_stops(self):
+        repositories = ({"name": f"repository-{index}"} for index in range(1000))
+
+        def write_batch(batch: list):
+            raise ValueError("Database is down")
+
+        pipeline = RepositoryPipeline(queue_size=2, batch_size=1)
+        thread_count = threading.active_count()
+        with self.assertRaises(ValueError):
+            pipeline.run(
+                repositories, lambda repository: repository["name"], write_batch
+            )
+
+        self.assertEqual(threading.active_count(), thread_count)
+        self.assertLess(pipeline.fetch_stage.items, 1000)
+        self.assertEqual(pipeline.write_stage.items, 0)
+
+    def test_when_writing_fails_then_a_blocked_fetch_is_not_waited_for(self):
+        release = threading.Event()
+        closed = threading.Event()
+
+        def repositories():
+            try:
+                yield {"name": "repository-0"}
+                # Stands in for a GitHub request or a wait for a rate limit reset
+                release.wait()
+                yield {"name": "repository-1"}
+            finally:
+                closed.set()
+
+        def write_batch(batch: list):
+            raise ValueError("Database is down")
+
+        pipeline = RepositoryPipeline(batch_size=1, stop_timeout_seconds=0.1)
+        with self.assertLogs("app.jobs.repository_pipeline", level="WARNING") as logs:
+            with self.assertRaises(ValueError):
+                pipeline.run(
+                    repositories(), lambda repository: repository["name"], write_batch
+                )
+
+        self.assertIn("did not stop within", "\n".join(logs.output))
+        self.assertFalse(closed.is_set())
+        release.set()
+        self.assertTrue(closed.wait(timeout=5))
+
+
+class TestIterConcurrently(unittest.TestCase):
+    def test_iterables_run_at_the_same_time(self):
+        def slow_repositories(organisation_name: str):
+            for index in range(3):
+                time.sleep(0.1)
+                yield {"name": f"{organisation_name}/repository-{index}"}
+
+        started_at = time.monotonic()
+        repositories = list(
+            iter_concurrently([slow_repositories("one"), slow_repositories("two")])
+        )
+
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertEqual(
+            sorted(repository["name"] for repository in repositories),
+            [
+                f"{name}/repository-{index}"
+                for name in ["one", "two"]
+                for index in range(3)
+            ],
+        )
+
+    def test_when_one_iterable_fails_then_the_error_is_raised(self):
+        def failing_repositories():
+            yield {"name": "repository-0"}
+            raise ValueError("GitHub is down")
+
+        def endless_repositories():
+            while True:
+                yield {"name": "repository"}
+
+        with self.assertRaises(ValueError):
+            list(
+                iter_concurrently(
+                    [failing_repositories(), endless_repositories()], queue_size=1
+                )
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
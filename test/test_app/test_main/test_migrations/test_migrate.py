@@ -0,0 +1,99 @@
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.main.migrations.migrate import MIGRATIONS, migrate
+from app.main.models import db
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def query(self, statement: str) -> list[tuple]:
+        with self.engine.connect() as connection:
+            return connection.execute(text(statement)).all()
+
+    def test_applies_each_migration_once(self):
+        self.assertEqual(
+            migrate(self.engine), [migration.VERSION for migration in MIGRATIONS]
+        )
+        self.assertEqual(migrate(self.engine), [])
+
+        self.assertEqual(
+            self.query("SELECT version, name FROM schema_migration ORDER BY version"),
+            [
+                (1, "Initial schema"),
+                (2, "Job state tables"),
+                (3, "Indexes and unique constraints"),
+                (4, "Authoritative ownership"),
+                (5, "Backfill authoritative ownership"),
+            ],
+        )
+
+    def test_migrated_schema_matches_the_models(self):
+        migrate(self.engine)
+
+        inspector = inspect(self.engine)
+        self.assertEqual(
+            sorted(inspector.get_table_names()), sorted(db.metadata.tables)
+        )
+        for table in db.metadata.sorted_tables:
+            self.assertEqual(
+                sorted(column["name"] for column in inspector.get_columns(table.name)),
+                sorted(column.name for column in table.columns),
+            )
+            self.assertLessEqual(
+                {index.name for index in table.indexes},
+                {index["name"] for index in inspector.get_indexes(table.name)},
+            )
+
+    def test_merges_duplicates_and_backfills_a_schema_created_before_migrations(
+        self,
+    ):
+        with self.engine.begin() as connection:
+            for statement in [
+                "CREATE TABLE owner (id INTEGER PRIMARY KEY, name VARCHAR)",
+                "CREATE TABLE asset (id INTEGER PRIMARY KEY, name VARCHAR, type VARCHAR)",
+                "CREATE TABLE relationship (id INTEGER PRIMARY KEY, type VARCHAR, "
+                "asset_id INTEGER, owner_id INTEGER)",
+                "INSERT INTO owner VALUES (1, 'LAA'), (2, 'LAA'), (3, 'OPG')",
+                "INSERT INTO asset VALUES (1, 'laa-apply', 'REPOSITORY'), "
+                "(2, 'laa-apply', 'REPOSITORY'), (3, 'opg-data', 'REPOSITORY')",
+                "INSERT INTO relationship VALUES (1, 'ADMIN_ACCESS', 1, 1), "
+                "(2, 'OTHER', 2, 2), (3, 'OTHER', 3, 3)",
+            ]:
+                connection.execute(text(statement))
+
+        migrate(self.engine)
+
+        self.assertEqual(
+            self.query("SELECT id, name FROM owner"), [(1, "LAA"), (3, "OPG")]
+        )
+        self.assertEqual(
+            self.query("SELECT id, name FROM asset"),
+            [(1, "laa-apply"), (3, "opg-data")],
+        )
+        self.assertEqual(
+            self.query("SELECT id, asset_id, owner_id FROM relationship"),
+            [(1, 1, 1), (3, 3, 3)],
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT asset_id, owner_name, has_admin, is_authoritative "
+                "FROM authoritative_ownership ORDER BY asset_id"
+            ),
+            [(1, "LAA", 1, 1), (3, "OPG", 0, 1)],
+        )
+        with self.assertRaises(IntegrityError), self.engine.begin() as connection:
+            connection.execute(
+                text("INSERT INTO asset (name, type) VALUES ('opg-data', 'REPOSITORY')")
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
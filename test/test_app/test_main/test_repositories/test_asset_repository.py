@@ -0,0 +1,335 @@
+import unittest
+
+from flask import Flask
+from sqlalchemy import event
+
+from app.main.models import AuthoritativeOwnership, Asset, Owner, Relationship, db
+from app.main.repositories.asset_repository import AssetRepository, RelationshipPlan
+
+
+class TestApplyRelationshipPlan(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.asset_repository = AssetRepository(db.session)
+        self.owner = Owner(name="Test Owner")
+        db.session.add(self.owner)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def sync(self, relationships_by_asset_name: dict[str, dict[str, str]]):
+        current_relationships, current_asset_names = (
+            self.asset_repository.find_relationships_with_owners([self.owner])
+        )
+        plan = RelationshipPlan.from_relationships(
+            current_relationships, current_asset_names, relationships_by_asset_name
+        )
+        return plan, self.asset_repository.apply_relationship_plan(
+            plan, [self.owner], chunk_size=1
+        )
+
+    def test_creates_missing_assets_and_relationships(self):
+        plan, counts = self.sync(
+            {"repository-one": {"Test Owner": "ADMIN_ACCESS"}, "repository-two": {}}
+        )
+
+        self.assertEqual(plan.assets_to_add, ["repository-one", "repository-two"])
+        self.assertEqual(
+            counts, {"inserted": 1, "updated": 0, "deleted": 0, "unchanged": 0}
+        )
+        self.assertEqual(
+            sorted(asset.name for asset in db.session.query(Asset).all()),
+            ["repository-one", "repository-two"],
+        )
+        relationship = db.session.query(Relationship).one()
+        self.assertEqual(relationship.owner_id, self.owner.id)
+        self.assertEqual(relationship.type, "ADMIN_ACCESS")
+
+    def test_applies_only_changed_and_removed_relationships(self):
+        self.sync(
+            {
+                "repository-one": {"Test Owner": "OTHER"},
+                "repository-two": {"Test Owner": "OTHER"},
+                "repository-three": {"Test Owner": "OTHER"},
+            }
+        )
+
+        plan, counts = self.sync(
+            {
+                "repository-one": {"Test Owner": "ADMIN_ACCESS"},
+                "repository-two": {"Test Owner": "OTHER"},
+                "repository-three": {},
+            }
+        )
+
+        self.assertEqual(plan.assets_to_add, [])
+        self.assertEqual(
+            counts, {"inserted": 0, "updated": 1, "deleted": 1, "unchanged": 1}
+        )
+        self.assertEqual(db.session.query(Asset).count(), 3)
+        self.assertEqual(
+            sorted(
+                (relationship.asset.name, relationship.type)
+                for relationship in db.session.query(Relationship).all()
+            ),
+            [("repository-one", "ADMIN_ACCESS"), ("repository-two", "OTHER")],
+        )
+
+    def test_relationships_of_assets_not_in_the_target_are_kept(self):
+        self.sync({"repository-one": {"Test Owner": "OTHER"}})
+
+        plan, counts = self.sync({"repository-two": {}})
+
+        self.assertEqual(plan.relationships_to_delete, [])
+        self.assertEqual(db.session.query(Relationship).count(), 1)
+
+    def test_empty_plan_is_not_written(self):
+        self.sync({"repository-one": {"Test Owner": "OTHER"}})
+
+        plan, counts = self.sync({"repository-one": {"Test Owner": "OTHER"}})
+
+        self.assertTrue(plan.is_empty())
+        self.assertEqual(
+            counts, {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 1}
+        )
+
+    def test_a_plan_applied_again_after_its_relationships_were_written_updates_them(
+        self,
+    ):
+        stale_plan = RelationshipPlan.from_relationships(
+            {}, set(), {"repository-one": {"Test Owner": "OTHER"}}
+        )
+        self.asset_repository.apply_relationship_plan(stale_plan, [self.owner])
+        self.sync({"repository-one": {"Test Owner": "ADMIN_ACCESS"}})
+
+        self.asset_repository.apply_relationship_plan(stale_plan, [self.owner])
+
+        relationship = db.session.query(Relationship).one()
+        self.assertEqual(relationship.type, "OTHER")
+
+    def test_authoritative_ownership_follows_admin_access_of_other_owners(self):
+        other_owner = Owner(name="Other Owner")
+        db.session.add(other_owner)
+        db.session.commit()
+        owners = [self.owner, other_owner]
+
+        def sync(relationships: dict[str, str]):
+            current_relationships, current_asset_names = (
+                self.asset_repository.find_relationships_with_owners(owners)
+            )
+            self.asset_repository.apply_relationship_plan(
+                RelationshipPlan.from_relationships(
+                    current_relationships,
+                    current_asset_names,
+                    {"repository-one": relationships},
+                ),
+                owners,
+            )
+            return sorted(
+                (row.owner_name, row.has_admin, row.is_authoritative)
+                for row in db.session.query(AuthoritativeOwnership).all()
+            )
+
+        self.assertEqual(
+            sync({"Test Owner": "ADMIN_ACCESS", "Other Owner": "OTHER"}),
+            [("Other Owner", False, False), ("Test Owner", True, True)],
+        )
+        self.assertEqual(sync({"Other Owner": "OTHER"}), [("Other Owner", False, True)])
+        self.assertEqual(
+            [
+                view.name
+                for view in self.asset_repository.find_all_by_authoritative_owner(
+                    "Other Owner", missing_admin_access_only=True
+                )
+            ],
+            ["repository-one"],
+        )
+
+    def test_deleted_assets_lose_their_relationships_and_ownership(self):
+        self.sync(
+            {
+                "repository-one": {"Test Owner": "ADMIN_ACCESS"},
+                "repository-two": {"Test Owner": "OTHER"},
+            }
+        )
+
+        deleted = self.asset_repository.delete_assets_by_name(
+            ["repository-one", "never-mapped"]
+        )
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(
+            [asset.name for asset in db.session.query(Asset).all()], ["repository-two"]
+        )
+        self.assertEqual(db.session.query(Relationship).count(), 1)
+        self.assertEqual(db.session.query(AuthoritativeOwnership).count(), 1)
+
+    def test_adding_an_existing_asset_or_relationship_updates_it_in_place(self):
+        asset = self.asset_repository.add_asset_if_name_does_not_exist(
+            "repository-one", "REPOSITORY"
+        )
+        self.asset_repository.update_relationship_with_owner(asset, self.owner, "OTHER")
+
+        same_asset = self.asset_repository.add_asset_if_name_does_not_exist(
+            "repository-one", "REPOSITORY"
+        )
+        relationship = self.asset_repository.update_relationship_with_owner(
+            same_asset, self.owner, "ADMIN_ACCESS"
+        )
+
+        self.assertEqual(same_asset.id, asset.id)
+        self.assertEqual(db.session.query(Asset).count(), 1)
+        self.assertEqual(db.session.query(Relationship).count(), 1)
+        self.assertEqual(relationship.type, "ADMIN_ACCESS")
+
+
+class TestFindAssetViews(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.asset_repository = AssetRepository(db.session)
+        owners = [Owner(name=f"Owner {index}") for index in range(3)]
+        db.session.add_all(owners)
+        for index in range(20):
+            asset = Asset(name=f"repository-{index}", type="REPOSITORY")
+            db.session.add(asset)
+            for owner in owners[: index % 4]:
+                db.session.add(
+                    Relationship(
+                        asset=asset,
+                        owner=owner,
+                        type="ADMIN_ACCESS" if owner is owners[0] else "OTHER",
+                    )
+                )
+        db.session.commit()
+        self.asset_repository.refresh_authoritative_ownership()
+        db.session.expire_all()
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self.record_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, "before_cursor_execute", self.record_statement)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def record_statement(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_views_are_built_within_the_query_budget(self):
+        for find_views in [
+            self.asset_repository.find_all,
+            lambda: self.asset_repository.find_all_by_owner("Owner 1"),
+            lambda: self.asset_repository.find_all_by_owners(["Owner 0", "Owner 2"]),
+            lambda: self.asset_repository.find_all_by_authoritative_owner("Owner 1"),
+        ]:
+            self.statements.clear()
+            find_views()
+            self.assertLessEqual(len(self.statements), 1)
+
+    def test_views_list_every_owner_of_each_asset(self):
+        views = self.asset_repository.find_all()
+
+        self.assertEqual(len(views), 20)
+        self.assertEqual(
+            [
+                (view.name, view.owner_names, view.admin_owner_names)
+                for view in views[:4]
+            ],
+            [
+                ("repository-0", [], []),
+                ("repository-1", ["Owner 0"], ["Owner 0"]),
+                ("repository-2", ["Owner 0", "Owner 1"], ["Owner 0"]),
+                ("repository-3", ["Owner 0", "Owner 1", "Owner 2"], ["Owner 0"]),
+            ],
+        )
+
+    def test_views_by_owner_keep_the_other_owners_of_each_asset(self):
+        views = self.asset_repository.find_all_by_owner("Owner 2")
+
+        self.assertEqual(
+            [view.name for view in views],
+            [
+                "repository-3",
+                "repository-7",
+                "repository-11",
+                "repository-15",
+                "repository-19",
+            ],
+        )
+        self.assertEqual(views[0].owner_names, ["Owner 0", "Owner 1", "Owner 2"])
+
+    def test_views_by_authoritative_owner_skip_assets_administered_by_others(self):
+        self.assertEqual(
+            self.asset_repository.find_all_by_authoritative_owner("Owner 1"), []
+        )
+        self.assertEqual(
+            [
+                view.name
+                for view in self.asset_repository.find_all_by_authoritative_owner(
+                    "Owner 0"
+                )
+            ][:3],
+            ["repository-1", "repository-2", "repository-3"],
+        )
+        self.assertEqual(
+            self.asset_repository.find_all_by_authoritative_owner(
+                "Owner 0", missing_admin_access_only=True
+            ),
+            [],
+        )
+
+    def test_pages_through_an_owners_assets_by_name_within_the_query_budget(self):
+        names = []
+        after = None
+        while True:
+            self.statements.clear()
+            page = self.asset_repository.find_page("Owner 0", after=after, page_size=4)
+            self.assertLessEqual(len(self.statements), 3)
+            self.assertEqual(page.total, 15)
+            names.extend(view.name for view in page.assets)
+            if page.next_after is None:
+                break
+            after = page.next_after
+
+        self.assertEqual(len(names), 15)
+        self.assertEqual(names, sorted(names))
+
+    def test_page_filters_are_applied_in_the_query(self):
+        def names(page):
+            return [view.name for view in page.assets]
+
+        without_owner = self.asset_repository.find_page(None, name_contains="1")
+        self.assertEqual(names(without_owner), ["repository-12", "repository-16"])
+        self.assertEqual(without_owner.total, 2)
+        self.assertIsNone(without_owner.next_after)
+
+        self.assertEqual(
+            self.asset_repository.find_page("Owner 1", has_admin=False).total, 10
+        )
+        self.assertEqual(
+            self.asset_repository.find_page("Owner 1", has_admin=True).total, 0
+        )
+        self.assertEqual(
+            self.asset_repository.find_page("Owner 1", authoritative_only=True).total, 0
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+
+from flask import Flask
+
+from app.main.models import GithubTeam, db
+from app.main.repositories.team_repository import TeamRepository
+
+
+def repository(name: str, admin_teams: list[str] = [], any_teams: list[str] = []):
+    return {
+        "name": name,
+        "github_teams_with_admin_access": admin_teams,
+        "github_teams_with_admin_access_parents": [],
+        "github_teams_with_any_access": admin_teams + any_teams,
+        "github_teams_with_any_access_parents": [],
+    }
+
+
+class TestTeamRepository(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.team_repository = TeamRepository(db.session)
+        self.team_repository.save_teams(
+            {
+                "Platforms": None,
+                "Cloud Platform": "Platforms",
+                "Cloud Platform Admins": "Cloud Platform",
+                "Modernisation Platform": "Platforms",
+                "LAA": None,
+            }
+        )
+        self.team_repository.save_repository_grants(
+            [
+                repository("cloud-platform", admin_teams=["Cloud Platform Admins"]),
+                repository(
+                    "modernisation-platform", any_teams=["Modernisation Platform"]
+                ),
+                repository("laa-apply", admin_teams=["LAA"]),
+            ]
+        )
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_finds_ancestors_and_descendants_of_a_team(self):
+        self.assertEqual(
+            self.team_repository.find_ancestor_names("Cloud Platform Admins"),
+            ["Cloud Platform", "Platforms"],
+        )
+        self.assertEqual(
+            self.team_repository.find_descendant_names("Platforms"),
+            ["Cloud Platform", "Modernisation Platform", "Cloud Platform Admins"],
+        )
+
+    def test_finds_repositories_administered_by_any_descendant(self):
+        self.assertEqual(
+            self.team_repository.find_repository_names_with_access_by_team_or_descendants(
+                "Platforms", admin_only=True
+            ),
+            ["cloud-platform"],
+        )
+        self.assertEqual(
+            self.team_repository.find_repository_names_with_access_by_team_or_descendants(
+                "Platforms"
+            ),
+            ["cloud-platform", "modernisation-platform"],
+        )
+
+    def test_moving_a_team_updates_the_closure(self):
+        self.team_repository.save_teams({"Cloud Platform": "LAA"})
+
+        self.assertEqual(
+            self.team_repository.find_ancestor_names("Cloud Platform Admins"),
+            ["Cloud Platform", "LAA"],
+        )
+        self.assertEqual(
+            self.team_repository.find_repository_names_with_access_by_team_or_descendants(
+                "LAA", admin_only=True
+            ),
+            ["cloud-platform", "laa-apply"],
+        )
+
+    def test_teams_are_deleted_once_nothing_below_them_has_grants(self):
+        self.team_repository.save_repository_grants(
+            [repository("cloud-platform", any_teams=["LAA"])]
+        )
+        self.team_repository.delete_repository_grants_except(
+            {"cloud-platform", "laa-apply"}
+        )
+        self.team_repository.delete_teams_without_grants()
+
+        self.assertEqual(
+            db.session.query(GithubTeam.name).order_by(GithubTeam.name).all(),
+            [("LAA",)],
+        )
+        self.assertEqual(self.team_repository.find_descendant_names("Platforms"), [])
+
+    def test_teams_of_the_same_name_in_another_organisation_are_kept_apart(self):
+        self.team_repository.save_teams(
+            {"moj-analytical-services/LAA": "moj-analytical-services/Analysts"}
+        )
+        self.team_repository.save_repository_grants(
+            [repository("moj-analytical-services/laa-data", admin_teams=["LAA"])]
+        )
+
+        self.assertEqual(self.team_repository.find_ancestor_names("LAA"), [])
+        self.assertEqual(
+            self.team_repository.find_repository_names_with_access_by_team_or_descendants(
+                "LAA"
+            ),
+            ["laa-apply"],
+        )
+        self.assertEqual(
+            self.team_repository.find_repository_names_with_access_by_team_or_descendants(
+                "moj-analytical-services/Analysts"
+            ),
+            ["moj-analytical-services/laa-data"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
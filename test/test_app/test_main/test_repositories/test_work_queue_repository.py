@@ -0,0 +1,145 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask
+
+from app.main.models import db
+from app.main.repositories.work_queue_repository import WorkQueueRepository
+
+lease_duration = timedelta(minutes=15)
+
+
+class TestWorkQueueRepository(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.work_queue_repository = WorkQueueRepository(db.session)
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_workers_claim_disjoint_batches(self):
+        self.work_queue_repository.enqueue(["one", "two", "three"])
+
+        first_batch = self.work_queue_repository.claim_batch(
+            "worker-1", 2, lease_duration, self.now
+        )
+        second_batch = self.work_queue_repository.claim_batch(
+            "worker-2", 2, lease_duration, self.now
+        )
+        third_batch = self.work_queue_repository.claim_batch(
+            "worker-1", 2, lease_duration, self.now
+        )
+
+        self.assertEqual(first_batch, ["one", "two"])
+        self.assertEqual(second_batch, ["three"])
+        self.assertEqual(third_batch, [])
+        self.assertEqual(
+            self.work_queue_repository.get_status(),
+            {"PENDING": 0, "CLAIMED": 3, "DONE": 0, "FAILED": 0},
+        )
+
+    def test_expired_lease_is_reclaimed_by_another_worker(self):
+        self.work_queue_repository.enqueue(["one"])
+        self.work_queue_repository.claim_batch(
+            "crashed-worker", 1, lease_duration, self.now
+        )
+
+        before_expiry = self.work_queue_repository.claim_batch(
+            "worker-2", 1, lease_duration, self.now + timedelta(minutes=10)
+        )
+        after_expiry = self.work_queue_repository.claim_batch(
+            "worker-2", 1, lease_duration, self.now + timedelta(minutes=20)
+        )
+
+        self.assertEqual(before_expiry, [])
+        self.assertEqual(after_expiry, ["one"])
+
+    def test_completed_items_are_not_claimed_again(self):
+        self.work_queue_repository.enqueue(["one", "two"])
+        self.work_queue_repository.claim_batch("worker-1", 2, lease_duration, self.now)
+
+        self.work_queue_repository.complete("worker-1", ["one", "two"])
+
+        self.assertEqual(
+            self.work_queue_repository.claim_batch(
+                "worker-2", 2, lease_duration, self.now + timedelta(hours=1)
+            ),
+            [],
+        )
+        self.assertEqual(
+            self.work_queue_repository.get_status(),
+            {"PENDING": 0, "CLAIMED": 0, "DONE": 2, "FAILED": 0},
+        )
+
+    def test_renewed_lease_is_not_reclaimed(self):
+        self.work_queue_repository.enqueue(["one"])
+        self.work_queue_repository.claim_batch("worker-1", 1, lease_duration, self.now)
+
+        held = self.work_queue_repository.renew_leases(
+            "worker-1", ["one"], lease_duration, self.now + timedelta(minutes=10)
+        )
+
+        self.assertEqual(held, 1)
+        self.assertEqual(
+            self.work_queue_repository.claim_batch(
+                "worker-2", 1, lease_duration, self.now + timedelta(minutes=20)
+            ),
+            [],
+        )
+
+    def test_worker_that_lost_its_lease_does_not_complete_the_items(self):
+        self.work_queue_repository.enqueue(["one"])
+        self.work_queue_repository.claim_batch("worker-1", 1, lease_duration, self.now)
+        self.work_queue_repository.claim_batch(
+            "worker-2", 1, lease_duration, self.now + timedelta(minutes=20)
+        )
+
+        self.assertEqual(
+            self.work_queue_repository.renew_leases(
+                "worker-1", ["one"], lease_duration, self.now + timedelta(minutes=21)
+            ),
+            0,
+        )
+        self.assertEqual(self.work_queue_repository.complete("worker-1", ["one"]), 0)
+        self.assertEqual(
+            self.work_queue_repository.get_status(),
+            {"PENDING": 0, "CLAIMED": 1, "DONE": 0, "FAILED": 0},
+        )
+        self.assertEqual(self.work_queue_repository.complete("worker-2", ["one"]), 1)
+
+
+    def test_item_whose_last_attempt_expired_is_failed_instead_of_claimed(self):
+        self.work_queue_repository.enqueue(["one"])
+        for attempt in range(2):
+            self.work_queue_repository.claim_batch(
+                f"crashed-worker-{attempt}",
+                1,
+                lease_duration,
+                self.now + attempt * lease_duration * 2,
+                max_attempts=2,
+            )
+
+        claimed = self.work_queue_repository.claim_batch(
+            "worker-3", 1, lease_duration, self.now + lease_duration * 4, max_attempts=2
+        )
+
+        self.assertEqual(claimed, [])
+        self.assertEqual(
+            self.work_queue_repository.get_status(),
+            {"PENDING": 0, "CLAIMED": 0, "DONE": 0, "FAILED": 1},
+        )
+        self.assertEqual(self.work_queue_repository.find_names("FAILED"), {"one"})
+
+
+if __name__ == "__main__":
+    unittest.main()
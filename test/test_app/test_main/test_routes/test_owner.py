@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlsplit
+
+from flask import Flask
+
+from app.main.repositories.asset_repository import AssetPage, AssetView
+from app.main.routes.owner import owner_route
+from app.main.services.asset_service import AssetService
+
+
+@patch("app.main.middleware.auth.app_config.auth_enabled", False)
+@patch("app.main.routes.owner.get_owner_repository")
+@patch("app.main.routes.owner.get_asset_service")
+@patch("app.main.routes.owner.render_template", return_value="")
+class TestOwnerIndexRoute(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.register_blueprint(owner_route, url_prefix="/owner")
+        self.client = self.app.test_client()
+        self.asset_repository = MagicMock()
+        self.asset_repository.find_page.return_value = AssetPage(
+            [AssetView("laa-apply", ["LAA"], ["LAA"])], 51, "laa-apply"
+        )
+
+    def get(
+        self,
+        query_string: dict,
+        mock_render_template: MagicMock,
+        mock_get_asset_service: MagicMock,
+        mock_get_owner_repository: MagicMock,
+    ) -> dict:
+        mock_get_asset_service.return_value = AssetService(self.asset_repository)
+        mock_get_owner_repository.return_value.find_all_names.return_value = ["LAA"]
+
+        response = self.client.get("/owner/", query_string=query_string)
+
+        self.assertEqual(response.status_code, 200)
+        return mock_render_template.call_args.kwargs
+
+    def query(self, url: str) -> dict[str, list[str]]:
+        return parse_qs(urlsplit(url).query)
+
+    def test_first_page_links_to_the_next_page_only(self, *mocks: MagicMock):
+        context = self.get({"owner": "LAA", "access-levels": ["ADMIN"]}, *mocks)
+
+        self.asset_repository.find_page.assert_called_once_with(
+            "LAA", True, False, None, None, 50
+        )
+        self.assertEqual(context["repository_count"], 51)
+        self.assertIsNone(context["first_page_url"])
+        self.assertEqual(
+            self.query(context["next_page_url"]),
+            {"owner": ["LAA"], "access-levels": ["ADMIN"], "after": ["laa-apply"]},
+        )
+
+    def test_later_pages_link_back_to_the_first_page(self, *mocks: MagicMock):
+        context = self.get(
+            {"owner": "LAA", "access-levels": ["OTHER"], "after": "cla-public"},
+            *mocks,
+        )
+
+        self.asset_repository.find_page.assert_called_once_with(
+            "LAA", False, False, None, "cla-public", 50
+        )
+        self.assertEqual(
+            self.query(context["first_page_url"]),
+            {"owner": ["LAA"], "access-levels": ["OTHER"]},
+        )
+        self.assertEqual(self.query(context["next_page_url"])["after"], ["laa-apply"])
+
+    def test_both_access_levels_and_no_owner_are_not_filtered(self, *mocks: MagicMock):
+        self.asset_repository.find_page.return_value = AssetPage([], 0, None)
+
+        context = self.get(
+            {"access-levels": ["ADMIN", "OTHER"], "repository-name": "laa"}, *mocks
+        )
+
+        self.asset_repository.find_page.assert_called_once_with(
+            None, None, False, "laa", None, 50
+        )
+        self.assertIsNone(context["next_page_url"])
+        self.assertIsNone(context["first_page_url"])
+
+
+if __name__ == "__main__":
+    unittest.main()
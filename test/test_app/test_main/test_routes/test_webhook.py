@@ -0,0 +1,202 @@
+import hashlib
+import hmac
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+
+from app.main.config.limiter_config import configure_limiter
+from app.main.models import db
+from app.main.repositories.team_repository import TeamRepository
+from app.main.routes.webhook import get_repository_update_queue, webhook_route
+from app.main.services.github_webhook_service import REFRESH, REMOVE
+from app.main.services.repository_update_queue import RepositoryUpdateQueue
+
+PAYLOADS_DIRECTORY = os.path.join(os.path.dirname(__file__), "payloads")
+
+SECRET = "webhook-secret"
+
+
+def read_payload(name: str) -> bytes:
+    with open(os.path.join(PAYLOADS_DIRECTORY, f"{name}.json"), "rb") as file:
+        return file.read()
+
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def repository(name: str, any_teams: list[str]):
+    return {
+        "name": name,
+        "github_teams_with_admin_access": [],
+        "github_teams_with_admin_access_parents": [],
+        "github_teams_with_any_access": any_teams,
+        "github_teams_with_any_access_parents": [],
+    }
+
+
+@patch("app.main.routes.webhook.app_config.webhook.secret", SECRET)
+@patch(
+    "app.main.routes.webhook.app_config.github.organisations",
+    ["ministryofjustice"],
+)
+@patch("app.main.routes.webhook.app_config.github.repository_visibilities", ["public"])
+class TestWebhookRoute(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app.register_blueprint(webhook_route, url_prefix="/webhook")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        team_repository = TeamRepository(db.session)
+        team_repository.save_teams(
+            {"LAA Developers": None, "LAA Crime Apps Team": "LAA Developers"}
+        )
+        team_repository.save_repository_grants(
+            [
+                repository("laa-crime-apply", ["LAA Crime Apps Team"]),
+                repository("laa-apply-for-legal-aid", ["LAA Developers"]),
+                repository("cla_public", ["LAA Developers"]),
+            ]
+        )
+        self.apply_updates = MagicMock()
+        self.app.extensions["repository_update_queue"] = RepositoryUpdateQueue(
+            self.apply_updates
+        )
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, event: str, body: bytes, signature: str | None = None):
+        return self.client.post(
+            "/webhook/github",
+            data=body,
+            content_type="application/json",
+            headers={
+                "X-GitHub-Event": event,
+                "X-GitHub-Delivery": "72d3162e-cc78-11e3-81ab-4c9367dc0958",
+                "X-Hub-Signature-256": signature or sign(body),
+            },
+        )
+
+    def queued_updates(self) -> dict[str, str]:
+        return dict(get_repository_update_queue().pending)
+
+    def test_rejects_a_delivery_with_an_invalid_signature(self):
+        body = read_payload("repository_archived")
+
+        response = self.post("repository", body, sign(body, "another-secret"))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.queued_updates(), {})
+
+    def test_renamed_repository_removes_the_old_name(self):
+        response = self.post("repository", read_payload("repository_renamed"))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            self.queued_updates(),
+            {
+                "laa-apply-for-legal-aid": REMOVE,
+                "laa-apply-for-civil-legal-aid": REFRESH,
+            },
+        )
+
+    def test_archived_repository_is_removed(self):
+        response = self.post("repository", read_payload("repository_archived"))
+
+        self.assertEqual(response.get_json(), {"repositories": ["cla_public"]})
+        self.assertEqual(self.queued_updates(), {"cla_public": REMOVE})
+
+    def test_team_added_to_a_repository_refreshes_it(self):
+        self.post("team_add", read_payload("team_add"))
+
+        self.assertEqual(self.queued_updates(), {"laa-crime-apply": REFRESH})
+
+    def test_renamed_team_refreshes_repositories_of_the_team_and_teams_below_it(self):
+        response = self.post("team", read_payload("team_edited"))
+
+        self.assertEqual(
+            response.get_json(),
+            {
+                "repositories": [
+                    "cla_public",
+                    "laa-apply-for-legal-aid",
+                    "laa-crime-apply",
+                ]
+            },
+        )
+
+    def test_membership_and_unmapped_organisation_events_update_nothing(self):
+        self.post("membership", read_payload("membership_added"))
+        self.post("team_add", read_payload("team_add_other_organisation"))
+
+        self.assertEqual(self.queued_updates(), {})
+
+    def test_events_are_coalesced_into_one_update_per_repository(self):
+        self.post("team_add", read_payload("team_add"))
+        self.post("team", read_payload("team_edited"))
+        self.post("repository", read_payload("repository_archived"))
+
+        get_repository_update_queue().flush()
+
+        self.apply_updates.assert_called_once_with(
+            {
+                "laa-crime-apply": REFRESH,
+                "laa-apply-for-legal-aid": REFRESH,
+                "cla_public": REMOVE,
+            }
+        )
+        self.assertEqual(get_repository_update_queue().updates_received, 5)
+        self.assertEqual(get_repository_update_queue().updates_applied, 3)
+
+    @patch("app.jobs.map_github_repositories_to_owners.update_repositories")
+    @patch(
+        "app.jobs.map_github_repositories_to_owners.create_github_services_by_organisation"
+    )
+    def test_github_services_are_created_once_for_every_batch(
+        self,
+        mock_create_github_services: MagicMock,
+        mock_update_repositories: MagicMock,
+    ):
+        github_services = {"ministryofjustice": MagicMock()}
+        mock_create_github_services.return_value = github_services
+        del self.app.extensions["repository_update_queue"]
+
+        for event, payload in [
+            ("team_add", "team_add"),
+            ("repository", "repository_archived"),
+        ]:
+            self.post(event, read_payload(payload))
+            get_repository_update_queue().flush()
+
+        mock_create_github_services.assert_called_once_with()
+        self.assertEqual(mock_update_repositories.call_count, 2)
+        first_call, second_call = mock_update_repositories.call_args_list
+        self.assertEqual(first_call.kwargs["github_services"], github_services)
+        self.assertIs(
+            second_call.kwargs["github_services"], first_call.kwargs["github_services"]
+        )
+
+    def test_deliveries_are_not_rate_limited(self):
+        configure_limiter(self.app)
+
+        statuses = {
+            self.post("team_add", read_payload("team_add")).status_code
+            for _ in range(20)
+        }
+
+        self.assertEqual(statuses, {202})
+
+
+if __name__ == "__main__":
+    unittest.main()
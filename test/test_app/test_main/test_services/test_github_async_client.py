@@ -0,0 +1,224 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.main.services.github_async_client import (
+    GithubAsyncClient,
+    GithubRequestError,
+)
+from app.main.services.github_service import GithubService
+from app.main.services.github_token_pool import GithubTokenCredential, GithubTokenPool
+from benchmark.fake_github_server import FakeGithubServer
+from benchmark.synthetic_org import generate_synthetic_org
+
+
+class StubGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    responses = []
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.client_address[1]))
+        status, headers, body = self.responses.pop(0)
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if headers.get("Transfer-Encoding") == "chunked":
+            self.end_headers()
+            middle = len(content) // 2
+            for chunk in [content[:middle], content[middle:], b""]:
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            return
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestGithubAsyncClient(unittest.TestCase):
+    def setUp(self):
+        StubGithubHandler.responses = []
+        StubGithubHandler.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGithubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.now = time.time()
+        self.token_pool = GithubTokenPool(
+            [GithubTokenCredential("test-token", name="test")], clock=lambda: self.now
+        )
+        self.sleeps = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def run_with_client(self, use_client):
+        async def run():
+            async with GithubAsyncClient(
+                self.token_pool, self.base_url, sleep=self.sleep
+            ) as client:
+                return await use_client(client), client
+
+        return asyncio.run(run())
+
+    def test_pages_are_followed_over_one_kept_alive_connection(self):
+        StubGithubHandler.responses = [
+            (
+                200,
+                {"Link": f'<{self.base_url}/orgs/test/repos?page=2>; rel="next"'},
+                [{"name": "one"}],
+            ),
+            (200, {"Transfer-Encoding": "chunked"}, [{"name": "two"}]),
+        ]
+
+        repositories, client = self.run_with_client(
+            lambda client: client.get_all_pages("/orgs/test/repos")
+        )
+
+        self.assertEqual(repositories, [{"name": "one"}, {"name": "two"}])
+        self.assertEqual(
+            [path for path, _ in StubGithubHandler.requests],
+            ["/orgs/test/repos?per_page=100", "/orgs/test/repos?page=2"],
+        )
+        # Both pages are requested from the same client port
+        self.assertEqual(len({port for _, port in StubGithubHandler.requests}), 1)
+        self.assertEqual(
+            client.metrics.get_report()["api_calls"],
+            [{"api": "rest", "endpoint": "GET /orgs/{org}/repos", "calls": 2}],
+        )
+
+    def test_server_errors_are_retried_with_backoff(self):
+        StubGithubHandler.responses = [
+            (502, {}, {"message": "Bad Gateway"}),
+            (503, {}, {"message": "Unavailable"}),
+            (200, {}, {"login": "test"}),
+        ]
+
+        organisation, _ = self.run_with_client(
+            lambda client: client.get_json("/orgs/test")
+        )
+
+        self.assertEqual(organisation, {"login": "test"})
+        self.assertEqual(self.sleeps, [1.0, 2.0])
+
+    def test_rate_limited_requests_wait_for_the_reset(self):
+        reset = self.now + 60
+        StubGithubHandler.responses = [
+            (
+                403,
+                {
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Limit": "5000",
+                    "X-RateLimit-Reset": str(reset),
+                },
+                {"message": "API rate limit exceeded"},
+            ),
+            (200, {}, {"login": "test"}),
+        ]
+
+        organisation, _ = self.run_with_client(
+            lambda client: client.get_json("/orgs/test")
+        )
+
+        self.assertEqual(organisation, {"login": "test"})
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertAlmostEqual(self.sleeps[0], 65, delta=1)
+        self.assertAlmostEqual(self.token_pool.seconds_spent_waiting, 65, delta=1)
+
+    def test_missing_team_permissions_are_none(self):
+        StubGithubHandler.responses = [(404, {}, {"message": "Not Found"})]
+
+        permissions, _ = self.run_with_client(
+            lambda client: client.get_team_repository_permissions(
+                {"url": f"{self.base_url}/organizations/1/team/2"}, "test/repository"
+            )
+        )
+
+        self.assertIsNone(permissions)
+        self.assertEqual(
+            StubGithubHandler.requests[0][0],
+            "/organizations/1/team/2/repos/test/repository",
+        )
+
+    def test_redirects_are_followed(self):
+        StubGithubHandler.responses = [
+            (301, {"Location": "/repositories/42/teams"}, {"message": "Moved"}),
+            (200, {}, [{"name": "LAA Developers"}]),
+        ]
+
+        teams, _ = self.run_with_client(
+            lambda client: client.get_repository_teams("test/renamed-repository")
+        )
+
+        self.assertEqual(teams, [{"name": "LAA Developers"}])
+        self.assertEqual(
+            [path for path, _ in StubGithubHandler.requests],
+            [
+                "/repos/test/renamed-repository/teams?per_page=100",
+                "/repositories/42/teams",
+            ],
+        )
+
+    def test_responses_that_are_not_successful_raise(self):
+        StubGithubHandler.responses = [
+            (301, {}, {"message": "Moved Permanently"}),
+            (422, {}, {"message": "Validation Failed"}),
+        ]
+
+        with self.assertRaisesRegex(GithubRequestError, "301"):
+            self.run_with_client(
+                lambda client: client.get_team_repository_permissions(
+                    {"url": f"{self.base_url}/organizations/1/team/2"},
+                    "test/repository",
+                )
+            )
+        with self.assertRaisesRegex(GithubRequestError, "422"):
+            self.run_with_client(
+                lambda client: client.get_all_pages("/orgs/test/repos")
+            )
+
+
+class TestGithubServiceWithAsyncClient(unittest.TestCase):
+    def test_produces_the_same_repositories_as_pygithub(self):
+        org = generate_synthetic_org(
+            repositories=16, teams=8, nesting_depth=3, teams_per_repository=3
+        )
+        with FakeGithubServer(org) as server:
+            async_repositories = GithubService(
+                "test-token", max_workers=4, api_url=server.url, use_async_client=True
+            ).get_all_repositories()
+            repositories = GithubService(
+                "test-token", max_workers=4, api_url=server.url
+            ).get_all_repositories()
+            repositories_by_name = GithubService(
+                "test-token", max_workers=4, api_url=server.url, use_async_client=True
+            ).get_repositories_by_name(
+                [repository["name"] for repository in repositories[:3]]
+            )
+
+        def sort_teams(repositories: list[dict]) -> list[dict]:
+            return [
+                {
+                    key: sorted(value) if isinstance(value, list) else value
+                    for key, value in repository.items()
+                }
+                for repository in repositories
+            ]
+
+        self.assertEqual(len(async_repositories), len(org.get_active_repositories()))
+        self.assertEqual(sort_teams(async_repositories), sort_teams(repositories))
+        self.assertEqual(sort_teams(repositories_by_name), sort_teams(repositories[:3]))
+
+
+if __name__ == "__main__":
+    unittest.main()
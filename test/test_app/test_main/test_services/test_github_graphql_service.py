@@ -0,0 +1,158 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.main.services.github_graphql_service import (
+    REPOSITORIES_QUERY,
+    TEAM_REPOSITORIES_QUERY,
+    TEAMS_QUERY,
+    GithubGraphqlService,
+)
+
+
+def page(has_next_page: bool, end_cursor: str | None = None) -> dict:
+    return {"hasNextPage": has_next_page, "endCursor": end_cursor}
+
+
+RESPONSES = {
+    (REPOSITORIES_QUERY, None): {
+        "organization": {
+            "repositories": {
+                "pageInfo": page(True, "repositories-1"),
+                "nodes": [
+                    {"name": "repository-one", "isArchived": False, "isFork": False},
+                    {"name": "archived", "isArchived": True, "isFork": False},
+                ],
+            }
+        }
+    },
+    (REPOSITORIES_QUERY, "repositories-1"): {
+        "organization": {
+            "repositories": {
+                "pageInfo": page(False),
+                "nodes": [
+                    {"name": "repository-two", "isArchived": False, "isFork": False}
+                ],
+            }
+        }
+    },
+    (TEAMS_QUERY, None): {
+        "organization": {
+            "teams": {
+                "pageInfo": page(False),
+                "nodes": [
+                    {
+                        "name": "Parent Team",
+                        "slug": "parent-team",
+                        "parentTeam": None,
+                        "repositories": {"pageInfo": page(False), "edges": []},
+                    },
+                    {
+                        "name": "Child Team",
+                        "slug": "child-team",
+                        "parentTeam": {"name": "Parent Team"},
+                        "repositories": {
+                            "pageInfo": page(True, "child-team-1"),
+                            "edges": [
+                                {
+                                    "permission": "ADMIN",
+                                    "node": {"name": "repository-one"},
+                                }
+                            ],
+                        },
+                    },
+                    {
+                        "name": "organisation-security-auditor",
+                        "slug": "organisation-security-auditor",
+                        "parentTeam": None,
+                        "repositories": {
+                            "pageInfo": page(False),
+                            "edges": [
+                                {
+                                    "permission": "ADMIN",
+                                    "node": {"name": "repository-two"},
+                                }
+                            ],
+                        },
+                    },
+                ],
+            }
+        }
+    },
+    (TEAM_REPOSITORIES_QUERY, "child-team-1"): {
+        "organization": {
+            "team": {
+                "repositories": {
+                    "pageInfo": page(False),
+                    "edges": [
+                        {"permission": "READ", "node": {"name": "repository-two"}},
+                        {"permission": "WRITE", "node": {"name": "archived"}},
+                    ],
+                }
+            }
+        }
+    },
+}
+
+
+class StubGraphqlHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = RESPONSES[(body["query"], body["variables"]["cursor"])]
+        response = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGithubGraphqlService(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphqlHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.github_graphql_service = GithubGraphqlService(
+            "test-token", f"http://127.0.0.1:{self.server.server_port}/graphql"
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_all_repositories_returns_team_access_by_repository(self):
+        repositories = self.github_graphql_service.get_all_repositories()
+
+        self.assertEqual(
+            repositories,
+            [
+                {
+                    "name": "repository-one",
+                    "github_teams_with_admin_access": ["Child Team"],
+                    "github_teams_with_admin_access_parents": ["Parent Team"],
+                    "github_teams_with_any_access": ["Child Team"],
+                    "github_teams_with_any_access_parents": ["Parent Team"],
+                },
+                {
+                    "name": "repository-two",
+                    "github_teams_with_admin_access": [],
+                    "github_teams_with_admin_access_parents": [],
+                    "github_teams_with_any_access": ["Child Team"],
+                    "github_teams_with_any_access_parents": ["Parent Team"],
+                },
+            ],
+        )
+
+    def test_get_all_repositories_respects_limit(self):
+        repositories = self.github_graphql_service.get_all_repositories(limit=1)
+
+        self.assertEqual(
+            [repository["name"] for repository in repositories], ["repository-one"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
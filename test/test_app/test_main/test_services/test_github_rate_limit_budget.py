@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import MagicMock
+
+from app.main.services.github_rate_limit_budget import GithubRateLimitBudget
+
+
+class TestGithubRateLimitBudget(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.sleep = MagicMock(side_effect=self.advance_clock)
+        self.budget = GithubRateLimitBudget(
+            reserve=2, wait_time_buffer=5, clock=lambda: self.now, sleep=self.sleep
+        )
+
+    def advance_clock(self, seconds: float):
+        self.now += seconds
+
+    def test_does_not_wait_while_budget_remains(self):
+        self.budget.observe_headers(
+            {
+                "X-RateLimit-Remaining": "10",
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": "1060",
+            }
+        )
+
+        self.budget.acquire()
+
+        self.sleep.assert_not_called()
+        self.assertEqual(self.budget.remaining, 9)
+        self.assertEqual(self.budget.requests_made, 1)
+
+    def test_waits_for_reset_when_reserve_is_reached(self):
+        self.budget.observe(remaining=3, limit=5000, reset_timestamp=1060)
+
+        self.budget.acquire()
+        self.budget.acquire()
+
+        self.sleep.assert_called_once_with(65.0)
+        self.assertEqual(self.budget.seconds_spent_waiting, 65.0)
+        self.assertEqual(self.budget.requests_made, 2)
+        self.assertIsNone(self.budget.remaining)
+
+    def test_keeps_lowest_remaining_within_the_same_window(self):
+        self.budget.observe(remaining=50, limit=5000, reset_timestamp=1060)
+        self.budget.observe(remaining=60, limit=5000, reset_timestamp=1060)
+
+        self.assertEqual(self.budget.remaining, 50)
+
+        self.budget.observe(remaining=5000, limit=5000, reset_timestamp=4660)
+
+        self.assertEqual(self.budget.remaining, 5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
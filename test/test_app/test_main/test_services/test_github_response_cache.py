@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from github import Github
+
+from app.main.services.github_http_adapter import use_github_http_adapter
+from app.main.services.github_response_cache import GithubResponseCache
+from app.main.services.github_token_pool import GithubTokenCredential, GithubTokenPool
+
+
+class StubConditionalRequestHandler(BaseHTTPRequestHandler):
+    requests_received = []
+
+    def do_GET(self):
+        self.requests_received.append(self.headers.get("If-None-Match"))
+        body = json.dumps(
+            {"login": "ministryofjustice", "url": "/orgs/ministryofjustice"}
+        ).encode()
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("X-RateLimit-Remaining", "4999")
+            self.send_header("X-RateLimit-Limit", "5000")
+            self.send_header("X-RateLimit-Reset", "9999999999")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("X-RateLimit-Remaining", "4998")
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Reset", "9999999999")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGithubResponseCache(unittest.TestCase):
+    def setUp(self):
+        StubConditionalRequestHandler.requests_received = []
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), StubConditionalRequestHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_directory.cleanup()
+
+    def create_github_client(self, response_cache: GithubResponseCache) -> Github:
+        return use_github_http_adapter(
+            Github(base_url=f"http://127.0.0.1:{self.server.server_port}"),
+            GithubTokenPool([GithubTokenCredential("test-token", name="test")]),
+            response_cache,
+        )
+
+    def test_not_modified_response_is_served_from_cache_across_clients(self):
+        first_cache = GithubResponseCache(self.cache_directory.name)
+        first_login = (
+            self.create_github_client(first_cache)
+            .get_organization("ministryofjustice")
+            .login
+        )
+        second_cache = GithubResponseCache(self.cache_directory.name)
+        second_login = (
+            self.create_github_client(second_cache)
+            .get_organization("ministryofjustice")
+            .login
+        )
+
+        self.assertEqual(first_login, "ministryofjustice")
+        self.assertEqual(second_login, "ministryofjustice")
+        self.assertEqual(
+            StubConditionalRequestHandler.requests_received,
+            [None, '"/orgs/ministryofjustice"'],
+        )
+        self.assertEqual((first_cache.hits, first_cache.misses), (0, 1))
+        self.assertEqual((second_cache.hits, second_cache.misses), (1, 0))
+
+    def test_least_recently_used_entries_are_evicted_when_full(self):
+        response_cache = GithubResponseCache(
+            self.cache_directory.name, max_size_bytes=400
+        )
+        github_client = self.create_github_client(response_cache)
+
+        for organisation in ["first", "second", "third"]:
+            github_client.get_organization(organisation)
+
+        self.assertGreater(response_cache.evictions, 0)
+        self.assertLessEqual(
+            sum(
+                os.path.getsize(os.path.join(self.cache_directory.name, file_name))
+                for file_name in os.listdir(self.cache_directory.name)
+            ),
+            400,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
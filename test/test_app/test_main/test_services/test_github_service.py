@@ -0,0 +1,285 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from github import RateLimitExceededException, UnknownObjectException
+
+from app.main.services.github_service import (
+    GithubService,
+    get_fingerprint_of_team_grants,
+    get_team_grants_fingerprint,
+)
+
+
+def mock_repository(
+    name: str, archived: bool = False, fork: bool = False, visibility: str = "public"
+):
+    repository = MagicMock()
+    repository.name = name
+    repository.archived = archived
+    repository.fork = fork
+    repository.visibility = visibility
+    return repository
+
+
+def mock_team(name: str, parent=None, repositories=[]):
+    team = MagicMock()
+    team.name = name
+    team.parent = parent
+    team.get_repos.return_value = repositories
+    return team
+
+
+def mock_team_repository(name: str, admin: bool = False, pull: bool = True):
+    repository = mock_repository(name)
+    repository.permissions.admin = admin
+    repository.permissions.maintain = False
+    repository.permissions.push = False
+    repository.permissions.triage = False
+    repository.permissions.pull = pull
+    return repository
+
+
+@patch("app.main.services.github_service.Github")
+class TestGetAllRepositories(unittest.TestCase):
+    def test_concurrent_workers_return_repositories_in_listing_order(
+        self, mock_github: MagicMock
+    ):
+        repositories = [mock_repository(f"repository-{i}") for i in range(10)]
+        for repository in repositories:
+            repository.full_name = f"ministryofjustice/{repository.name}"
+        organisation = mock_github.return_value.get_organization.return_value
+        organisation.get_repos.return_value = repositories
+        admin_team = mock_team("Admin Team")
+        admin_team.get_repo_permission.return_value.admin = True
+        mock_github.return_value.get_repo.return_value.get_teams.return_value = [
+            admin_team
+        ]
+
+        response = GithubService("test-token", max_workers=4).get_all_repositories(
+            limit=8
+        )
+
+        self.assertEqual(
+            [repository["name"] for repository in response],
+            [f"repository-{i}" for i in range(8)],
+        )
+        self.assertTrue(
+            all(
+                repository["github_teams_with_admin_access"] == ["Admin Team"]
+                for repository in response
+            )
+        )
+        mock_github.return_value.get_repo.assert_any_call(
+            "ministryofjustice/repository-7", lazy=True
+        )
+
+    def test_unchanged_repositories_reuse_previous_team_access(
+        self, mock_github: MagicMock
+    ):
+        unchanged_repository = mock_repository("unchanged-repository")
+        changed_repository = mock_repository("changed-repository")
+        for repository in [unchanged_repository, changed_repository]:
+            repository.full_name = f"ministryofjustice/{repository.name}"
+            repository.pushed_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+            repository.updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        changed_repository.pushed_at = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        organisation = mock_github.return_value.get_organization.return_value
+        organisation.get_repos.return_value = [unchanged_repository, changed_repository]
+        team = mock_team("Test Team")
+        team.permission = "pull"
+        mock_github.return_value.get_repo.return_value.get_teams.return_value = [team]
+        previous_repository = {
+            "name": "unchanged-repository",
+            "github_teams_with_admin_access": ["Previous Team"],
+            "github_teams_with_admin_access_parents": [],
+            "github_teams_with_any_access": ["Previous Team"],
+            "github_teams_with_any_access_parents": [],
+            "team_grants_fingerprint": get_team_grants_fingerprint([team]),
+        }
+        github_service = GithubService("test-token")
+
+        response = github_service.get_all_repositories(
+            previous_repositories={"unchanged-repository": previous_repository},
+            since=datetime(2024, 2, 1, tzinfo=timezone.utc),
+        )
+
+        self.assertEqual(response[0], previous_repository)
+        self.assertEqual(response[1]["name"], "changed-repository")
+        self.assertEqual(response[1]["github_teams_with_any_access"], ["Test Team"])
+        self.assertEqual(
+            response[1]["team_grants_fingerprint"],
+            get_team_grants_fingerprint([team]),
+        )
+        self.assertEqual(github_service.repositories_skipped, 1)
+        self.assertEqual(github_service.repositories_refreshed, 1)
+        team.get_repo_permission.assert_called_once_with(
+            "ministryofjustice/changed-repository"
+        )
+
+    def test_other_organisations_yield_qualified_names_of_selected_visibilities(
+        self, mock_github: MagicMock
+    ):
+        repositories = [
+            mock_repository("internal-repository", visibility="internal"),
+            mock_repository("private-repository", visibility="private"),
+            mock_repository("public-repository"),
+            mock_repository("skipped-repository", visibility="internal"),
+        ]
+        for repository in repositories:
+            repository.full_name = f"moj-analytical-services/{repository.name}"
+        organisation = mock_github.return_value.get_organization.return_value
+        organisation.get_repos.return_value = repositories
+        mock_github.return_value.get_repo.return_value.get_teams.return_value = []
+
+        response = list(
+            GithubService(
+                "test-token",
+                organisation_name="moj-analytical-services",
+                primary_organisation_name="ministryofjustice",
+                repository_visibilities=["internal", "public"],
+            ).iter_all_repositories(
+                repository_names_to_skip={"moj-analytical-services/skipped-repository"}
+            )
+        )
+
+        mock_github.return_value.get_organization.assert_called_with(
+            "moj-analytical-services"
+        )
+        organisation.get_repos.assert_called_once_with(type="all")
+        self.assertEqual(
+            [repository["name"] for repository in response],
+            [
+                "moj-analytical-services/internal-repository",
+                "moj-analytical-services/public-repository",
+            ],
+        )
+
+    @patch("app.main.services.github_service.gmtime")
+    @patch("app.main.services.github_service.sleep")
+    def test_rate_limit_retry_sleep_is_recorded(
+        self, mock_sleep: MagicMock, mock_gmtime: MagicMock, mock_github: MagicMock
+    ):
+        repository = mock_repository("test-repository")
+        repository.full_name = "ministryofjustice/test-repository"
+        organisation = mock_github.return_value.get_organization.return_value
+        organisation.get_repos.return_value = [repository]
+        mock_github.return_value.get_repo.return_value.get_teams.side_effect = [
+            RateLimitExceededException(403, {}, {}),
+            [],
+        ]
+        mock_github.return_value.get_rate_limit.return_value.core.reset = datetime(
+            2024, 1, 1, 0, 1, tzinfo=timezone.utc
+        )
+        mock_gmtime.return_value = datetime(2024, 1, 1, tzinfo=timezone.utc).timetuple()
+        github_service = GithubService("test-token")
+
+        github_service.get_all_repositories(previous_repositories={})
+
+        mock_sleep.assert_called_once_with(65)
+        self.assertEqual(github_service.metrics.rate_limit_sleep_seconds, 65)
+
+    def test_repositories_not_found_by_name_are_left_out(self, mock_github: MagicMock):
+        def get_repo(full_name: str, lazy: bool):
+            repository = MagicMock()
+            if full_name == "ministryofjustice/deleted-repository":
+                repository.get_teams.side_effect = UnknownObjectException(404, {}, {})
+            else:
+                repository.get_teams.return_value = []
+            return repository
+
+        mock_github.return_value.get_repo.side_effect = get_repo
+
+        repositories = GithubService("test-token").get_repositories_by_name(
+            ["deleted-repository", "test-repository"]
+        )
+
+        self.assertEqual(
+            [repository["name"] for repository in repositories], ["test-repository"]
+        )
+
+    def test_rejects_unknown_visibilities(self, mock_github: MagicMock):
+        with self.assertRaises(ValueError):
+            GithubService("test-token", repository_visibilities=["secret"])
+
+
+class TestGetTeamGrantsFingerprint(unittest.TestCase):
+    def test_moving_a_team_to_another_parent_changes_the_fingerprint(self):
+        team = mock_team("Test Team", parent=mock_team("LAA Developers"))
+        team.permission = "pull"
+        fingerprint = get_team_grants_fingerprint([team])
+
+        team.parent = mock_team("OPG Developers")
+
+        self.assertNotEqual(get_team_grants_fingerprint([team]), fingerprint)
+        self.assertEqual(
+            fingerprint,
+            get_fingerprint_of_team_grants([("Test Team", "pull", "LAA Developers")]),
+        )
+
+
+@patch("app.main.services.github_service.Github")
+class TestGetAllRepositoriesByTeam(unittest.TestCase):
+    def test_inverts_team_repositories_into_repository_access(
+        self, mock_github: MagicMock
+    ):
+        organisation = mock_github.return_value.get_organization.return_value
+        organisation.get_repos.return_value = [
+            mock_repository("repository-one"),
+            mock_repository("repository-two"),
+            mock_repository("forked-repository", fork=True),
+        ]
+        parent_team = mock_team("Parent Team")
+        organisation.get_teams.return_value = [
+            parent_team,
+            mock_team(
+                "Child Team",
+                parent=parent_team,
+                repositories=[
+                    mock_team_repository("repository-one", admin=True),
+                    mock_team_repository("repository-two"),
+                    mock_team_repository("forked-repository", admin=True),
+                ],
+            ),
+            mock_team(
+                "organisation-security-auditor",
+                repositories=[mock_team_repository("repository-two", admin=True)],
+            ),
+        ]
+
+        github_service = GithubService("test-token")
+
+        repositories = github_service.get_all_repositories_by_team()
+
+        organisation.get_repos.assert_called_once_with(type="public")
+        self.assertEqual(
+            repositories,
+            [
+                {
+                    "name": "repository-one",
+                    "github_teams_with_admin_access": ["Child Team"],
+                    "github_teams_with_admin_access_parents": ["Parent Team"],
+                    "github_teams_with_any_access": ["Child Team"],
+                    "github_teams_with_any_access_parents": ["Parent Team"],
+                },
+                {
+                    "name": "repository-two",
+                    "github_teams_with_admin_access": [],
+                    "github_teams_with_admin_access_parents": [],
+                    "github_teams_with_any_access": ["Child Team"],
+                    "github_teams_with_any_access_parents": ["Parent Team"],
+                },
+            ],
+        )
+        self.assertEqual(
+            github_service.get_team_parents(),
+            {
+                "Parent Team": None,
+                "Child Team": "Parent Team",
+                "organisation-security-auditor": None,
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from app.main.services.github_snapshot import read_snapshot, write_snapshot
+
+repositories = [
+    {
+        "name": "repository-one",
+        "github_teams_with_admin_access": ["Admin Team"],
+        "github_teams_with_admin_access_parents": [],
+        "github_teams_with_any_access": ["Admin Team"],
+        "github_teams_with_any_access_parents": [],
+    },
+    {
+        "name": "repository-two",
+        "github_teams_with_admin_access": [],
+        "github_teams_with_admin_access_parents": [],
+        "github_teams_with_any_access": [],
+        "github_teams_with_any_access_parents": [],
+    },
+]
+
+
+class TestGithubSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.jsonl.gz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_written_snapshot_is_read_back_in_order(self):
+        written = list(write_snapshot(self.path, repositories, "ministryofjustice"))
+
+        self.assertEqual(written, repositories)
+        self.assertEqual(list(read_snapshot(self.path)), repositories)
+
+    def test_failed_crawl_does_not_leave_a_snapshot(self):
+        def failing_crawl():
+            yield repositories[0]
+            raise ValueError("GitHub is down")
+
+        with self.assertRaises(ValueError):
+            list(write_snapshot(self.path, failing_crawl(), "ministryofjustice"))
+
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_snapshot_with_unsupported_version_is_rejected(self):
+        with gzip.open(self.path, "wt", encoding="utf-8") as file:
+            file.write(
+                json.dumps({"format": "github-repository-snapshot", "version": 99})
+                + "\n"
+            )
+
+        with self.assertRaises(ValueError):
+            list(read_snapshot(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from github import Github
+
+from app.main.services.github_http_adapter import use_github_http_adapter
+from app.main.services.github_token_pool import (
+    GithubAppInstallationCredential,
+    GithubTokenCredential,
+    GithubTokenPool,
+)
+
+
+class StubTokenServerHandler(BaseHTTPRequestHandler):
+    remaining_by_token = {}
+    tokens_issued = []
+
+    def do_POST(self):
+        if self.path != "/app/installations/42/access_tokens":
+            self.send_error(404)
+            return
+        self.tokens_issued.append(self.headers.get("Authorization"))
+        self.send_json(
+            201,
+            {"token": "installation-token", "expires_at": "2099-01-01T00:00:00Z"},
+            {},
+        )
+
+    def do_GET(self):
+        token = self.headers.get("Authorization").removeprefix("token ")
+        self.remaining_by_token[token] -= 1
+        self.send_json(
+            200,
+            {"login": "ministryofjustice", "url": "/orgs/ministryofjustice"},
+            {
+                "X-RateLimit-Remaining": str(self.remaining_by_token[token]),
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": "9999999999",
+            },
+        )
+
+    def send_json(self, status: int, body: dict, headers: dict):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGithubTokenPool(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.sleep = MagicMock(side_effect=self.advance_clock)
+        self.first = GithubTokenCredential("first-token", name="first")
+        self.second = GithubTokenCredential("second-token", name="second")
+        self.token_pool = GithubTokenPool(
+            [self.first, self.second],
+            reserve=2,
+            clock=lambda: self.now,
+            sleep=self.sleep,
+        )
+
+    def advance_clock(self, seconds: float):
+        self.now += seconds
+
+    def observe(self, credential: GithubTokenCredential, remaining: int):
+        self.token_pool.observe_headers(
+            credential,
+            {
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": "1060",
+            },
+        )
+
+    def test_requests_go_to_the_credential_with_the_most_remaining_quota(self):
+        self.observe(self.first, 100)
+        self.observe(self.second, 4000)
+
+        credential = self.token_pool.acquire()
+
+        self.assertIs(credential, self.second)
+
+    def test_exhausted_credential_is_taken_out_of_rotation(self):
+        self.observe(self.first, 2)
+        self.observe(self.second, 3)
+
+        credentials = [self.token_pool.acquire() for _ in range(2)]
+
+        self.assertEqual(credentials, [self.second, self.first])
+        self.assertEqual(self.token_pool.budgets[self.second.name].requests_made, 1)
+        self.sleep.assert_called_once_with(65.0)
+
+    def test_waits_for_earliest_reset_when_every_credential_is_exhausted(self):
+        self.observe(self.first, 2)
+        self.token_pool.observe_headers(
+            self.second,
+            {
+                "X-RateLimit-Remaining": "2",
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": "1030",
+            },
+        )
+
+        credential = self.token_pool.acquire()
+
+        self.sleep.assert_called_once_with(35.0)
+        self.assertEqual(self.token_pool.seconds_spent_waiting, 35.0)
+        self.assertIs(credential, self.second)
+
+    def test_adapter_fails_loudly_when_pygithub_internals_have_changed(self):
+        github_client = Github()
+        del github_client._Github__requester._Requester__connectionClass
+
+        with self.assertRaisesRegex(RuntimeError, "_Requester__connectionClass"):
+            use_github_http_adapter(github_client, self.token_pool)
+
+
+class TestGithubTokenPoolWithStubServer(unittest.TestCase):
+    def setUp(self):
+        StubTokenServerHandler.remaining_by_token = {
+            "personal-token": 500,
+            "installation-token": 5000,
+        }
+        StubTokenServerHandler.tokens_issued = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTokenServerHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.private_key = (
+            rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            .private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+            .decode()
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_are_spread_across_personal_and_installation_tokens(self):
+        token_pool = GithubTokenPool(
+            [
+                GithubTokenCredential("personal-token", name="personal"),
+                GithubAppInstallationCredential(
+                    "1234", self.private_key, 42, base_url=self.base_url
+                ),
+            ]
+        )
+        github_client = use_github_http_adapter(
+            Github(base_url=self.base_url), token_pool
+        )
+
+        for _ in range(4):
+            github_client.get_organization("ministryofjustice")
+
+        usage = token_pool.get_usage()
+        self.assertEqual(len(StubTokenServerHandler.tokens_issued), 1)
+        self.assertTrue(StubTokenServerHandler.tokens_issued[0].startswith("Bearer "))
+        self.assertEqual(usage["personal"]["requests_made"], 1)
+        self.assertEqual(usage["app-installation-42"]["requests_made"], 3)
+        self.assertEqual(usage["app-installation-42"]["remaining"], 4997)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import unittest
+
+from app.main.services.job_metrics import JobMetrics, get_endpoint_name
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestGetEndpointName(unittest.TestCase):
+    def test_resource_names_are_replaced_with_placeholders(self):
+        self.assertEqual(
+            get_endpoint_name("GET", "/repos/ministryofjustice/repository-one/teams"),
+            "GET /repos/{owner}/{repo}/teams",
+        )
+        self.assertEqual(
+            get_endpoint_name("GET", "/orgs/ministryofjustice/teams/admin-team/repos"),
+            "GET /orgs/{org}/teams/{team}/repos",
+        )
+        self.assertEqual(
+            get_endpoint_name(
+                "GET", "/organizations/123/team/456/repos/ministryofjustice/repo"
+            ),
+            "GET /organizations/{org_id}/team/{team}/repos/{owner}/{repo}",
+        )
+
+
+class TestJobMetrics(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = JobMetrics(slowest_repositories_count=2, clock=self.clock)
+
+    def test_phases_accumulate_seconds(self):
+        with self.metrics.phase("resolve_teams"):
+            self.clock.now += 2
+        with self.metrics.phase("resolve_teams"):
+            self.clock.now += 3
+        self.metrics.add_phase_seconds("db_sync", 1.5)
+
+        self.assertEqual(
+            self.metrics.get_report()["phase_seconds"],
+            {"db_sync": 1.5, "resolve_teams": 5.0},
+        )
+
+    def test_only_the_slowest_repositories_are_kept(self):
+        self.metrics.record_repository("fast", 1)
+        self.metrics.record_repository("slowest", 9)
+        self.metrics.record_repository("slow", 5)
+
+        self.assertEqual(self.metrics.repositories, 3)
+        self.assertEqual(
+            self.metrics.get_slowest_repositories(),
+            [{"name": "slowest", "seconds": 9}, {"name": "slow", "seconds": 5}],
+        )
+
+    def test_report_counts_api_calls_and_cache_hits(self):
+        self.metrics.record_api_call("rest", "GET /repos/{owner}/{repo}/teams")
+        self.metrics.record_api_call("rest", "GET /repos/{owner}/{repo}/teams")
+        self.metrics.record_api_call("graphql", "repositories")
+        self.metrics.record_team_parent_cache(hit=True)
+        self.metrics.record_team_parent_cache(hit=True)
+        self.metrics.record_team_parent_cache(hit=False)
+        self.metrics.record_rate_limit_sleep("ministryofjustice", 10)
+        self.metrics.record_rate_limit_sleep("ministryofjustice", 20)
+        self.metrics.record_rate_limit_sleep("moj-analytical-services", 10)
+        self.clock.now = 60
+
+        report = self.metrics.get_report()
+
+        self.assertEqual(report["duration_seconds"], 60)
+        self.assertEqual(
+            report["api_calls"],
+            [
+                {"api": "graphql", "endpoint": "repositories", "calls": 1},
+                {
+                    "api": "rest",
+                    "endpoint": "GET /repos/{owner}/{repo}/teams",
+                    "calls": 2,
+                },
+            ],
+        )
+        self.assertEqual(report["rate_limit_sleep_seconds"], 30)
+        self.assertEqual(
+            report["rate_limit_sleep_seconds_by_organisation"],
+            {"ministryofjustice": 20, "moj-analytical-services": 10},
+        )
+        self.assertEqual(report["team_parent_cache"]["hits"], 2)
+        self.assertAlmostEqual(report["team_parent_cache"]["hit_rate"], 2 / 3)
+
+    def test_prometheus_text_has_labelled_samples(self):
+        self.metrics.record_api_call("rest", 'GET /search?q="x"')
+        self.metrics.add_phase_seconds("list_repositories", 4)
+
+        text = self.metrics.get_prometheus_text(self.metrics.get_report())
+
+        self.assertIn(
+            "# TYPE map_github_repositories_to_owners_phase_seconds gauge", text
+        )
+        self.assertIn(
+            'map_github_repositories_to_owners_phase_seconds{phase="list_repositories"} 4',
+            text,
+        )
+        self.assertIn(
+            'map_github_repositories_to_owners_api_calls{api="rest",endpoint="GET /search?q=\\"x\\""} 1',
+            text,
+        )
+        self.assertTrue(text.endswith("\n"))
+
+    def test_write_creates_report_and_textfile(self):
+        self.metrics.record_repository("repository-one", 1)
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, "report.json")
+            prometheus_path = os.path.join(directory, "job.prom")
+
+            report = self.metrics.write(report_path, prometheus_path)
+
+            with open(report_path) as file:
+                self.assertEqual(json.load(file), report)
+            with open(prometheus_path) as file:
+                self.assertIn(
+                    "map_github_repositories_to_owners_repositories 1", file.read()
+                )
+            self.assertEqual(sorted(os.listdir(directory)), ["job.prom", "report.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
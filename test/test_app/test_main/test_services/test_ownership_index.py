@@ -0,0 +1,156 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from flask import Flask
+
+from app.main.models import db
+from app.main.repositories.asset_repository import AssetView
+from app.main.repositories.data_generation_repository import (
+    OWNERSHIP_GENERATION_NAME,
+    DataGenerationRepository,
+)
+from app.main.services.ownership_index import OwnershipIndex, OwnershipIndexCache
+
+
+def repository(name: str, owner_names: list[str], admin_owner_names: list[str] = []):
+    return AssetView(name, owner_names, admin_owner_names)
+
+
+class TestOwnershipIndex(unittest.TestCase):
+    def setUp(self):
+        self.repositories = [
+            repository("laa-apply", ["LAA", "Platforms"], ["LAA"]),
+            repository("laa-crime", ["LAA"]),
+            repository("cloud-platform", ["Platforms"]),
+            repository("orphan", []),
+        ]
+        self.index = OwnershipIndex(self.repositories)
+
+    def names(self, repositories: list[AssetView]) -> list[str]:
+        return [repository.name for repository in repositories]
+
+    def test_repositories_without_an_authoritative_owner_are_not_grouped(self):
+        self.assertEqual(
+            self.names(self.index.get_repositories_by_authoritative_owner("HMPPS")), []
+        )
+        self.assertEqual(self.index.get_repositories_missing_admin_access("HMPPS"), [])
+        self.assertEqual(
+            self.names(self.index.repositories),
+            ["laa-apply", "laa-crime", "cloud-platform", "orphan"],
+        )
+
+    def test_admin_access_makes_other_owners_not_authoritative(self):
+        self.assertEqual(
+            self.names(self.index.get_repositories_by_authoritative_owner("Platforms")),
+            ["cloud-platform"],
+        )
+        self.assertEqual(
+            self.names(self.index.get_repositories_by_authoritative_owner("LAA")),
+            ["laa-apply", "laa-crime"],
+        )
+        self.assertEqual(
+            self.names(self.index.get_repositories_missing_admin_access("LAA")),
+            ["laa-crime"],
+        )
+
+
+class TestOwnershipIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.generation = 1
+        self.now = 0.0
+        self.find_generation = MagicMock(side_effect=lambda: self.generation)
+        self.find_repositories = MagicMock(
+            side_effect=lambda: [repository(f"repository-{self.generation}", [])]
+        )
+        self.cache = OwnershipIndexCache(
+            self.find_generation,
+            self.find_repositories,
+            check_interval_seconds=30,
+            clock=lambda: self.now,
+        )
+
+    def test_generation_is_not_checked_within_the_interval(self):
+        first = self.cache.get()
+        self.now = 29
+        self.generation = 2
+
+        self.assertIs(self.cache.get(), first)
+        self.assertEqual(self.find_generation.call_count, 1)
+
+    def test_index_is_only_rebuilt_when_the_generation_changes(self):
+        first = self.cache.get()
+        self.now = 30
+
+        self.assertIs(self.cache.get(), first)
+
+        self.generation = 2
+        self.now = 60
+        second = self.cache.get()
+
+        self.assertEqual(second.generation, 2)
+        self.assertEqual(second.repositories[0].name, "repository-2")
+        self.assertEqual(self.find_generation.call_count, 3)
+        self.assertEqual(self.cache.builds, 2)
+
+    def test_requests_during_the_first_build_wait_for_it(self):
+        building = threading.Event()
+        release = threading.Event()
+
+        def find_repositories():
+            building.set()
+            release.wait()
+            return [repository("repository-1", [])]
+
+        self.cache.find_repositories = find_repositories
+        indexes = []
+        requests = [
+            threading.Thread(target=lambda: indexes.append(self.cache.get()))
+            for _ in range(4)
+        ]
+        requests[0].start()
+        building.wait()
+        for request in requests[1:]:
+            request.start()
+        release.set()
+        for request in requests:
+            request.join()
+
+        self.assertEqual(len(indexes), 4)
+        self.assertTrue(all(index is indexes[0] for index in indexes))
+        self.assertEqual(self.cache.builds, 1)
+
+
+class TestDataGenerationRepository(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.data_generation_repository = DataGenerationRepository(db.session)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_bump_increments_the_generation(self):
+        self.assertEqual(
+            self.data_generation_repository.find_generation(OWNERSHIP_GENERATION_NAME),
+            0,
+        )
+
+        self.data_generation_repository.bump(OWNERSHIP_GENERATION_NAME)
+
+        self.assertEqual(
+            self.data_generation_repository.bump(OWNERSHIP_GENERATION_NAME), 2
+        )
+        self.assertEqual(self.data_generation_repository.find_generation("other"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+
+import requests
+
+from app.main.services.github_graphql_service import GithubGraphqlService
+from app.main.services.github_service import GithubService
+from benchmark.fake_github_server import FakeGithubServer
+from benchmark.run_benchmark import find_regressions
+from benchmark.synthetic_org import generate_synthetic_org
+
+
+def sort_repositories(repositories: list[dict]) -> list[dict]:
+    return sorted(
+        (
+            {
+                key: sorted(value) if isinstance(value, list) else value
+                for key, value in repository.items()
+            }
+            for repository in repositories
+        ),
+        key=lambda repository: repository["name"],
+    )
+
+
+class TestGenerateSyntheticOrg(unittest.TestCase):
+    def test_the_same_arguments_generate_the_same_org(self):
+        first = generate_synthetic_org(repositories=50, teams=10, seed=3)
+        second = generate_synthetic_org(repositories=50, teams=10, seed=3)
+
+        self.assertEqual(
+            [
+                (repository.name, repository.team_permissions)
+                for repository in first.repositories
+            ],
+            [
+                (repository.name, repository.team_permissions)
+                for repository in second.repositories
+            ],
+        )
+
+    def test_teams_are_nested_no_deeper_than_asked(self):
+        org = generate_synthetic_org(repositories=10, teams=50, nesting_depth=2)
+
+        self.assertLessEqual(max(team.depth for team in org.teams), 2)
+        self.assertTrue(
+            all(
+                len(repository.team_permissions) == 3 for repository in org.repositories
+            )
+        )
+
+
+class TestFakeGithubServer(unittest.TestCase):
+    def setUp(self):
+        self.org = generate_synthetic_org(
+            repositories=12, teams=6, nesting_depth=2, teams_per_repository=2
+        )
+        self.server = FakeGithubServer(self.org, rate_limit=1000).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_rest_and_graphql_crawls_find_the_same_teams(self):
+        rest_repositories = GithubService(
+            "token", max_workers=4, api_url=self.server.url
+        ).get_all_repositories()
+        graphql_repositories = GithubGraphqlService(
+            "token", f"{self.server.url}/graphql"
+        ).get_all_repositories()
+
+        self.assertEqual(
+            len(rest_repositories), len(self.org.get_active_repositories())
+        )
+        self.assertEqual(
+            sort_repositories(rest_repositories),
+            sort_repositories(graphql_repositories),
+        )
+
+    def test_requests_fail_once_the_rate_limit_is_used_up(self):
+        with FakeGithubServer(self.org, rate_limit=2) as server:
+            url = f"{server.url}/orgs/{self.org.name}"
+            responses = [
+                requests.get(url, headers={"Authorization": "token first"})
+                for _ in range(3)
+            ]
+            other_token_response = requests.get(
+                url, headers={"Authorization": "token second"}
+            )
+
+        self.assertEqual(
+            [response.status_code for response in responses], [200, 200, 403]
+        )
+        self.assertEqual(responses[1].headers["X-RateLimit-Remaining"], "0")
+        self.assertEqual(other_token_response.status_code, 200)
+
+    def test_matching_conditional_requests_are_not_modified(self):
+        url = f"{self.server.url}/orgs/{self.org.name}/teams"
+        response = requests.get(url)
+
+        conditional_response = requests.get(
+            url, headers={"If-None-Match": response.headers["ETag"]}
+        )
+
+        self.assertEqual(conditional_response.status_code, 304)
+
+
+class TestFindRegressions(unittest.TestCase):
+    def test_worse_medians_than_the_last_comparable_result_are_regressions(self):
+        parameters = {"repositories": 100}
+        previous_results = [
+            {
+                "parameters": parameters,
+                "commit": "abc1234",
+                "median": {
+                    "repositories_per_second": 100,
+                    "api_calls": 400,
+                    "peak_rss_mb": 80,
+                },
+            },
+            {
+                "parameters": {"repositories": 200},
+                "commit": "abc1234",
+                "median": {
+                    "repositories_per_second": 1,
+                    "api_calls": 1,
+                    "peak_rss_mb": 1,
+                },
+            },
+        ]
+        result = {
+            "parameters": parameters,
+            "median": {
+                "repositories_per_second": 80,
+                "api_calls": 410,
+                "peak_rss_mb": 120,
+            },
+        }
+
+        regressions = find_regressions(result, previous_results, 0.1)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("repositories_per_second"))
+        self.assertTrue(regressions[1].startswith("peak_rss_mb"))
+
+
+if __name__ == "__main__":
+    unittest.main()